@@ -0,0 +1,123 @@
+import datetime
+import os
+
+# Transactions listed in each Nutmeg month table
+NUTMEG_ROWS_PER_MONTH = 20
+
+# The four header rows above the Shareworks activity rows, the parser skips three
+SHAREWORKS_HEADER_ROWS = 3
+
+
+def _page(body: str) -> str:
+    """Wrap a page body in a minimal HTML document"""
+    return f"<!DOCTYPE html><html><head></head><body>{body}</body></html>"
+
+
+def _dates(rows: int, start=datetime.date(2026, 10, 1)):
+    """Yield one date a day back from the start date, newest first"""
+    for index in range(rows):
+        yield start - datetime.timedelta(days=index)
+
+
+def nutmeg_transactions(rows: int) -> str:
+    """Return a Nutmeg transaction history page with the given number of rows,
+    grouped into month tables newest first"""
+    months = []
+    month_start = datetime.date(2026, 10, 1)
+    for first in range(0, rows, NUTMEG_ROWS_PER_MONTH):
+        count = min(NUTMEG_ROWS_PER_MONTH, rows - first)
+        cells = "".join(
+            f"<tr><td>Day {index % 28 + 1}</td><td>Deposit</td><td>Pot {index % 3}</td>"
+            + f"<td>+£{index + 1:,}.00</td></tr>"
+            for index in range(first, first + count)
+        )
+        months.append(
+            f"<section><section><h1><span>{month_start:%B %Y}</span></h1></section>"
+            + f"<table><tbody>{cells}</tbody></table></section>"
+        )
+        month_start = (month_start - datetime.timedelta(days=1)).replace(day=1)
+
+    return _page(
+        '<div id="root"><section><section></section><section><div><div><div><div>'
+        + "<section><div><section></section><section>"
+        + "".join(months)
+        + "</section></div></section></div></div></div></div></section></section></div>"
+    )
+
+
+def standard_life_transactions(rows: int) -> str:
+    """Return a Standard Life activity tab with the given number of rows"""
+    cells = "".join(
+        f"<tr><td>Regular payment</td><td>{date:%d/%m/%Y}</td><td>£{index + 1:,}.00</td>"
+        + '<td><svg aria-label="Completed"></svg></td><td></td></tr>'
+        for index, date in enumerate(_dates(rows))
+    )
+    return _page(
+        '<div id="tab-transaction"><tcs-transaction-tab><div></div><div>'
+        + "<tcs-transaction-history><div></div><div></div><div>"
+        + f"<table><tbody>{cells}</tbody></table>"
+        + "</div></tcs-transaction-history></div></tcs-transaction-tab></div>"
+    )
+
+
+def shareworks_statement(rows: int) -> str:
+    """Return a Shareworks transaction statement frame with the given number of
+    activity rows below its header rows"""
+    headers = "".join(
+        f"<tr><td>Header {index}</td></tr>" for index in range(SHAREWORKS_HEADER_ROWS)
+    )
+    cells = "".join(
+        f"<tr><td>{date:%d-%b-%Y}</td><td>You bought</td><td>Plan</td><td>Shares</td>"
+        + f"<td>{index % 5 + 1}.0000</td><td>$123.45</td><td>${index + 1:,}.00</td></tr>"
+        for index, date in enumerate(_dates(rows))
+    )
+    return _page(f'<table id="Activity_table"><tbody>{headers}{cells}</tbody></table>')
+
+
+def hargreaves_summary(rows: int) -> str:
+    """Return a Hargreaves account summary page with the given number of holdings"""
+    cells = "".join(
+        f"<tr><td><div><a><span>Fund {index}</span></a></div></td>"
+        + f"<td><span>{index + 1:,}</span></td><td><span>{index + 100}.00</span></td>"
+        + f"<td><span><span>£{index + 1:,}.00</span></span></td>"
+        + f"<td><span>£{index:,}.00</span></td></tr>"
+        for index in range(rows)
+    )
+    return _page(
+        '<span id="account_total_header">£1,234,567.89</span>'
+        + f'<table id="holdings-table"><tbody>{cells}</tbody></table>'
+    )
+
+
+def hargreaves_transactions(rows: int) -> str:
+    """Return a Hargreaves capital transaction history page with the given number
+    of transactions"""
+    cells = "".join(
+        f"<tr><td>{date:%d/%m/%Y}</td><td>{date:%d/%m/%Y}</td><td>B{index}</td>"
+        + f"<td>Fund {index % 7}</td><td>{index + 100}.00</td><td>{index + 1}</td>"
+        + f"<td>£{index + 1:,}.00</td></tr>"
+        for index, date in enumerate(_dates(rows))
+    )
+    return _page(
+        f'<div id="content-body-full"><table><tbody>{cells}</tbody></table></div>'
+    )
+
+
+# The generated pages, named the way the scrapers record them
+GENERATORS = {
+    "nutmeg/transactions.html": nutmeg_transactions,
+    "standardLife/transactions.html": standard_life_transactions,
+    "shareworks/statement.html": shareworks_statement,
+    "hargreaves/summary.html": hargreaves_summary,
+    "hargreaves/transactions.html": hargreaves_transactions,
+}
+
+
+def write_fixtures(directory, rows: int):
+    """Generate every fixture page with the given number of rows into the
+    directory"""
+    for path, generator in GENERATORS.items():
+        full_path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write(generator(rows))
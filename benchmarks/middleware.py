@@ -0,0 +1,423 @@
+"""Benchmark the Moverperfect provider syncs against an in-memory spreadsheet.
+
+Each provider sync runs through the real GoogleSheets connector on a spreadsheet
+holding a synthetic history of the given size, with a few new transactions
+scraped on top. The Sheets API calls, cells read and written and wall time of each
+sync are reported, and the run fails if a sync makes more calls than its budget.
+
+    python -m benchmarks.middleware
+    python -m benchmarks.middleware --sizes 100 1000 --update-budgets
+"""
+
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+
+import gspread
+from gspread.http_client import HTTPClient
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+import connectors.gsheet
+from connectors.gsheet import GoogleSheets, RequestScheduler
+from connectors.mirror import SheetMirror
+from middleware.moverperfect import (
+    HARGREAVES_READ_PLAN,
+    SHEET_READ_PLAN,
+    Moverperfect,
+)
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# Transactions scraped on top of the history already in the sheet
+NEW_TRANSACTIONS = 5
+
+# API call budgets per provider and history size, checked after every run
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "middleware_budgets.json")
+
+# Blank rows below the history, like the headroom of the real worksheets
+SPARE_ROWS = 1000
+
+FUND_NAMES = ["Fund A", "Fund B", "Fund C"]
+
+
+class InMemoryHTTPClient(HTTPClient):
+    """Serves the Sheets API calls gspread makes from in-memory worksheets and
+    counts the calls and the cells they read and write"""
+
+    # The overridden methods keep the parameter names of HTTPClient
+    # pylint: disable=redefined-builtin
+
+    def __init__(self, worksheets):
+        """Serve the worksheets given as {title: {(row, col): value}}"""
+        # The real client authenticates here, the in-memory one has nothing to do
+        # pylint: disable=super-init-not-called
+        self.worksheets = worksheets
+        self.calls = collections.Counter()
+        self.cells_read = 0
+        self.cells_written = 0
+
+    def fetch_sheet_metadata(self, id, params=None):
+        self.calls["metadata"] += 1
+        return {
+            "properties": {"title": "Benchmark"},
+            "sheets": [
+                {
+                    "properties": {
+                        "title": title,
+                        "sheetId": index,
+                        "index": index,
+                        "gridProperties": {
+                            "rowCount": self.__row_count(cells),
+                            "columnCount": 26,
+                        },
+                    }
+                }
+                for index, (title, cells) in enumerate(self.worksheets.items())
+            ],
+        }
+
+    def values_get(self, id, range, params=None):
+        self.calls["values_get"] += 1
+        return self.__read(range)
+
+    def values_batch_get(self, id, ranges, params=None):
+        self.calls["values_batch_get"] += 1
+        return {"valueRanges": [self.__read(range_name) for range_name in ranges]}
+
+    def values_update(self, id, range, params=None, body=None):
+        self.calls["values_update"] += 1
+        self.__write(range, body["values"])
+        return {}
+
+    def values_batch_update(self, id, body=None):
+        self.calls["values_batch_update"] += 1
+        for value_range in body["data"]:
+            self.__write(value_range["range"], value_range["values"])
+        return {}
+
+    def __read(self, range_name) -> dict:
+        """Return a range's values the way the API does, trailing blanks trimmed"""
+        title, grid = self.__grid_range(range_name)
+        cells = self.worksheets[title]
+        top = grid.get("startRowIndex", 0)
+        left = grid.get("startColumnIndex", 0)
+        bottom = grid.get("endRowIndex", self.__row_count(cells))
+        right = grid.get("endColumnIndex", 26)
+
+        values = [
+            [str(cells.get((row + 1, col + 1), "")) for col in range(left, right)]
+            for row in range(top, bottom)
+        ]
+        for row in values:
+            while row and row[-1] == "":
+                row.pop()
+        while values and not values[-1]:
+            values.pop()
+        self.cells_read += sum(len(row) for row in values)
+
+        response = {
+            "range": f"'{title}'!{rowcol_to_a1(top + 1, left + 1)}:"
+            + f"{rowcol_to_a1(bottom, right)}",
+            "majorDimension": "ROWS",
+        }
+        if values:
+            response["values"] = values
+        return response
+
+    def __write(self, range_name, values):
+        """Write a block of values into a worksheet"""
+        title, grid = self.__grid_range(range_name)
+        cells = self.worksheets[title]
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                cells[
+                    (
+                        grid["startRowIndex"] + row_offset + 1,
+                        grid["startColumnIndex"] + col_offset + 1,
+                    )
+                ] = value
+        self.cells_written += sum(len(row) for row in values)
+
+    @staticmethod
+    def __grid_range(range_name):
+        """Split an absolute range name into its worksheet title and grid range"""
+        title, _, address = range_name.rpartition("!")
+        return title.strip("'"), a1_range_to_grid_range(address)
+
+    @staticmethod
+    def __row_count(cells) -> int:
+        """Return a worksheet's row count, its last used row plus the spare rows"""
+        return max((row for row, _ in cells), default=0) + SPARE_ROWS
+
+
+class InMemoryClient:
+    """Stands in for the authorised gspread client"""
+
+    def __init__(self, http_client):
+        """Send every request of the spreadsheets opened to the in-memory client"""
+        self.http_client = http_client
+
+    def open_by_key(self, key):
+        """Open the spreadsheet with the given id"""
+        return gspread.Spreadsheet(self.http_client, {"id": key})
+
+
+@contextlib.contextmanager
+def in_memory_client(http_client):
+    """Make every GoogleSheets created inside the block use the in-memory client"""
+    get_client = connectors.gsheet.get_client
+    connectors.gsheet.get_client = lambda: InMemoryClient(http_client)
+    try:
+        yield
+    finally:
+        connectors.gsheet.get_client = get_client
+
+
+def _days(count: int):
+    """Return count consecutive days, oldest first"""
+    start = datetime.datetime(2000, 1, 1)
+    return [start + datetime.timedelta(days=index) for index in range(count)]
+
+
+def _rows(cells, rows, first_row=2):
+    """Fill worksheet cells with rows of values from the first row down"""
+    for row_offset, row in enumerate(rows):
+        for col_offset, value in enumerate(row):
+            if value != "":
+                cells[(first_row + row_offset, col_offset + 1)] = value
+
+
+def nutmeg_case(size: int):
+    """Return the worksheets and scraped data of a Nutmeg sync"""
+    days = _days(size + NEW_TRANSACTIONS)
+    transactions = [
+        {"date": day, "transaction": "Deposit", "pot": "Pot", "amount": "10.00"}
+        for day in days
+    ]
+
+    history = {(1, 1): "Date"}
+    _rows(
+        history,
+        [
+            [f"{t['date']:%d/%m/%Y}", t["transaction"], t["pot"], t["amount"]]
+            for t in transactions[:size]
+        ],
+    )
+    monthly = {(1, 8): "Net Contributions"}
+    _rows(monthly, [[""] * 7 + [str(index)] for index in range(size // 30 + 1)])
+
+    data = {
+        "transactions": list(reversed(transactions)),
+        "netContributions": "£1,000.00",
+        "currentValue": "£1,100.00",
+    }
+    return {"Nutmeg": history, "Nutmeg Monthly": monthly}, data
+
+
+def shareworks_case(size: int):
+    """Return the worksheets and scraped data of a Shareworks sync"""
+    days = _days(size + NEW_TRANSACTIONS)
+
+    # A purchase row per day, with a valuation row after every thirtieth
+    rows = []
+    for index, day in enumerate(days[:size]):
+        rows.append([f"{day:%d/%m/%Y}", f"{day:%d/%m/%Y}", "PAYROLL PURCHASE"])
+        if index % 30 == 29:
+            rows.append([f"{day:%d/%m/%Y}", f"{day:%d/%m/%Y}", ""])
+    worksheet = {(1, 1): "Date"}
+    _rows(worksheet, rows)
+
+    # The statement lists each purchase twice, newest first
+    purchase = ["You bought", "Plan", "Shares", "1.0000", "$10.00", "$10.00"]
+    data = {
+        "transactionData": [
+            [f"{day:%d-%b-%Y}"] + purchase for day in reversed(days) for _ in range(2)
+        ],
+        "exchangeRate": "0.8",
+        "sharePrice": "$12.00",
+    }
+    return {"Share Purchase Plan": worksheet}, data
+
+
+def standard_life_case(size: int):
+    """Return the worksheets and scraped data of a Standard Life sync"""
+    days = _days(size + NEW_TRANSACTIONS)
+    worksheet = {(1, 1): "Date"}
+    _rows(worksheet, [[f"{day:%d/%m/%Y}", "100.00"] for day in days[:size]])
+
+    data = {
+        "transactionData": [
+            ["Regular payment", f"{day:%d/%m/%Y}", "£100.00"] for day in reversed(days)
+        ],
+        "totalPayments": "£10,000.00",
+        "investmentGrowth": "£500.00",
+    }
+    return {"Pension": worksheet}, data
+
+
+def hargreaves_case(size: int):
+    """Return the worksheets and scraped data of a Hargreaves sync"""
+    days = _days(size + NEW_TRANSACTIONS)
+    transactions = {(1, 1): "Trade date"}
+    _rows(transactions, [[f"{day:%d/%m/%Y}"] for day in days[:size]])
+
+    fund_reference = {}
+    _rows(fund_reference, [[""] * 4 + [name] for name in FUND_NAMES], first_row=3)
+    _rows(fund_reference, [[""] * 4 + ["Unused"]] * 5, first_row=3 + len(FUND_NAMES))
+
+    data = [
+        {
+            "account": "1",
+            "value": "£1,234.56",
+            "stocks": [{"stock": name, "price(p)": "1,234.5"} for name in FUND_NAMES],
+            "transactions": [
+                {
+                    "tradeDate": f"{day:%d/%m/%Y}",
+                    "settleDate": f"{day:%d/%m/%Y}",
+                    "reference": f"B{index}",
+                    "description": FUND_NAMES[index % len(FUND_NAMES)],
+                    "unitCost": "123.45",
+                    "quantity": "1",
+                    "value": "123.45",
+                }
+                for index, day in reversed(list(enumerate(days)))
+            ],
+        }
+    ]
+    return {
+        "Transactions": transactions,
+        "Fund Reference": fund_reference,
+        "Rebalancer": {(17, 4): data[0]["value"]},
+    }, data
+
+
+# For each provider: its sync, the read plan its spreadsheet prefetches and the
+# builder of its worksheets and scraped data
+PROVIDERS = {
+    "nutmeg": ("_Moverperfect__nutmeg", SHEET_READ_PLAN, nutmeg_case),
+    "shareworks": ("_Moverperfect__shareworks", SHEET_READ_PLAN, shareworks_case),
+    "standardLife": (
+        "_Moverperfect__standard_life",
+        SHEET_READ_PLAN,
+        standard_life_case,
+    ),
+    "hargreaves": ("_Moverperfect__hargreaves", HARGREAVES_READ_PLAN, hargreaves_case),
+}
+
+
+def benchmark(provider, size) -> dict:
+    """Run one provider sync on a history of the given size and return its
+    API calls, cells read and written and seconds"""
+    sync_name, read_plan, case = PROVIDERS[provider]
+    worksheets, data = case(size)
+    http_client = InMemoryHTTPClient(worksheets)
+
+    # The spreadsheet is opened, verified and prefetched the way insert_stream does it
+    # for the provider's worksheets, with the quotas lifted so nothing throttles
+    with in_memory_client(http_client), contextlib.redirect_stdout(None):
+        start = time.perf_counter()
+        sheet = GoogleSheets(
+            "benchmark",
+            SheetMirror(":memory:"),
+            RequestScheduler(reads_per_minute=10**9, writes_per_minute=10**9),
+        )
+        sheet.verify_mirror()
+        sheet.prefetch(
+            [(name, columns) for name, columns in read_plan if name in worksheets]
+        )
+        with sheet.batch():
+            getattr(Moverperfect, sync_name)(sheet, data)
+        seconds = time.perf_counter() - start
+
+    return {
+        "calls": sum(http_client.calls.values()),
+        "cellsRead": http_client.cells_read,
+        "cellsWritten": http_client.cells_written,
+        "seconds": seconds,
+    }
+
+
+def read_budgets() -> dict:
+    """Return the recorded call budgets as {provider: {size: calls}}"""
+    try:
+        with open(BUDGETS_PATH, mode="r", encoding="UTF-8") as filereader:
+            return json.loads(filereader.read())
+    except FileNotFoundError:
+        return {}
+
+
+def write_budgets(results):
+    """Record the call counts of the results as the new budgets"""
+    budgets = read_budgets()
+    for (provider, size), result in results.items():
+        budgets.setdefault(provider, {})[str(size)] = result["calls"]
+    with open(BUDGETS_PATH, mode="w", encoding="UTF-8") as filewriter:
+        filewriter.write(json.dumps(budgets, indent=2, sort_keys=True) + "\n")
+
+
+def parse_args():
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="rows of history in the spreadsheet",
+    )
+    parser.add_argument(
+        "--providers",
+        nargs="+",
+        choices=list(PROVIDERS),
+        default=list(PROVIDERS),
+        help="provider syncs to run",
+    )
+    parser.add_argument(
+        "--update-budgets",
+        action="store_true",
+        help="record the call counts of this run as the budgets",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmarks, print the results and check them against the budgets"""
+    args = parse_args()
+    budgets = read_budgets()
+
+    results = {}
+    print(
+        f"{'provider':<14}{'size':>7}{'calls':>7}{'budget':>8}"
+        + f"{'read':>10}{'written':>9}{'seconds':>10}"
+    )
+    for provider in args.providers:
+        for size in args.sizes:
+            result = results[(provider, size)] = benchmark(provider, size)
+            budget = budgets.get(provider, {}).get(str(size), "-")
+            print(
+                f"{provider:<14}{size:>7}{result['calls']:>7}{budget:>8}"
+                + f"{result['cellsRead']:>10}{result['cellsWritten']:>9}"
+                + f"{result['seconds']:>10.4f}"
+            )
+
+    if args.update_budgets:
+        write_budgets(results)
+        return
+
+    over_budget = [
+        f"{provider} at {size} rows made {result['calls']} calls, "
+        + f"budget {budgets[provider][str(size)]}"
+        for (provider, size), result in results.items()
+        if result["calls"] > budgets.get(provider, {}).get(str(size), float("inf"))
+    ]
+    if over_budget:
+        sys.exit("Over budget: " + "; ".join(over_budget))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark the scrapers' table extraction against generated or recorded pages.
+
+Each page is parsed offline with the scrapers' parsers and, with --browser, loaded
+from a local fixture server into a headless Chrome and extracted the way the
+scrapers do it, counting the WebDriver round trips the extraction makes.
+
+    python -m benchmarks.scrapers
+    python -m benchmarks.scrapers --rows 10 1000 --browser
+    python -m benchmarks.scrapers --fixtures ./recorded --browser
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import write_fixtures
+from scrapers.hargreaves import extract_table
+from scrapers.parsers import (
+    HARGREAVES_HOLDINGS_COLUMNS,
+    HARGREAVES_HOLDINGS_ROWS,
+    HARGREAVES_TRANSACTION_COLUMNS,
+    HARGREAVES_TRANSACTION_ROWS,
+    parse_document,
+    parse_hargreaves_summary,
+    parse_nutmeg_transactions,
+    parse_shareworks_transactions,
+    parse_standard_life_transactions,
+    parse_table,
+)
+from utils.browser import create_driver
+from utils.fixtures import FixtureServer
+
+DEFAULT_ROWS = [10, 1000, 10000]
+
+# For each benchmarked extraction: the fixture page pattern, the offline parse of
+# the page source and the extraction the scraper runs on the loaded page
+CASES = {
+    "nutmeg transactions": (
+        "nutmeg/transactions*.html",
+        parse_nutmeg_transactions,
+        lambda driver: parse_nutmeg_transactions(driver.page_source),
+    ),
+    "standardLife transactions": (
+        "standardLife/transactions*.html",
+        parse_standard_life_transactions,
+        lambda driver: parse_standard_life_transactions(driver.page_source),
+    ),
+    "shareworks statement": (
+        "shareworks/statement*.html",
+        parse_shareworks_transactions,
+        lambda driver: parse_shareworks_transactions(driver.page_source),
+    ),
+    "hargreaves holdings": (
+        "hargreaves/summary*.html",
+        parse_hargreaves_summary,
+        lambda driver: extract_table(
+            driver, HARGREAVES_HOLDINGS_ROWS, HARGREAVES_HOLDINGS_COLUMNS
+        ),
+    ),
+    "hargreaves transactions": (
+        "hargreaves/transactions*.html",
+        lambda source: parse_table(
+            parse_document(source),
+            HARGREAVES_TRANSACTION_ROWS,
+            HARGREAVES_TRANSACTION_COLUMNS,
+        ),
+        lambda driver: extract_table(
+            driver, HARGREAVES_TRANSACTION_ROWS, HARGREAVES_TRANSACTION_COLUMNS
+        ),
+    ),
+}
+
+
+class RoundTripCounter:
+    """Counts the WebDriver commands a driver sends while it is installed"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.count = 0
+        self.execute = driver.execute
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return self.execute(*args, **kwargs)
+
+    def __enter__(self):
+        self.driver.execute = self
+        return self
+
+    def __exit__(self, *exc_info):
+        del self.driver.execute
+
+
+def fixture_pages(directory) -> dict:
+    """Return the first fixture page in the directory for each case"""
+    pages = {}
+    for name, (pattern, _, _) in CASES.items():
+        matches = sorted(glob.glob(os.path.join(directory, pattern)))
+        if matches:
+            pages[name] = os.path.relpath(matches[0], directory)
+    return pages
+
+
+def benchmark_parse(directory) -> list:
+    """Time the offline parse of each fixture page. Returns a result per case"""
+    results = []
+    for name, path in fixture_pages(directory).items():
+        with open(os.path.join(directory, path), mode="r", encoding="UTF-8") as file:
+            source = file.read()
+
+        start = time.perf_counter()
+        rows = CASES[name][1](source)
+        seconds = time.perf_counter() - start
+
+        if isinstance(rows, dict):
+            rows = rows["stocks"]
+        results.append((name, "parse", len(rows), seconds, 0))
+    return results
+
+
+def benchmark_browser(directory, driver) -> list:
+    """Time the in-browser extraction of each fixture page served to the driver and
+    count its round trips. Returns a result per case"""
+    results = []
+    with FixtureServer(directory) as server:
+        for name, path in fixture_pages(directory).items():
+            driver.get(server.url(path))
+
+            with RoundTripCounter(driver) as counter:
+                start = time.perf_counter()
+                rows = CASES[name][2](driver)
+                seconds = time.perf_counter() - start
+
+            results.append((name, "browser", len(rows), seconds, counter.count))
+    return results
+
+
+def format_results(results) -> str:
+    """Format the results as a table"""
+    lines = [f"{'extraction':<28}{'mode':<9}{'rows':>7}{'seconds':>10}{'trips':>7}"]
+    lines.extend(
+        f"{name:<28}{mode:<9}{rows:>7}{seconds:>10.4f}{trips:>7}"
+        for name, mode, rows, seconds, trips in results
+    )
+    return "\n".join(lines)
+
+
+def parse_args():
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=DEFAULT_ROWS,
+        help="row counts of the generated pages",
+    )
+    parser.add_argument(
+        "--fixtures",
+        help="benchmark the pages recorded in this directory instead",
+    )
+    parser.add_argument(
+        "--browser",
+        action="store_true",
+        help="also extract in a headless Chrome and count the round trips",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmarks and print the results"""
+    args = parse_args()
+
+    driver = None
+    if args.browser:
+        driver = create_driver("lean")
+
+    try:
+        if args.fixtures:
+            directories = [(args.fixtures, "recorded")]
+        else:
+            directories = []
+            for rows in args.rows:
+                directory = tempfile.mkdtemp(prefix=f"fixtures_{rows}_")
+                write_fixtures(directory, rows)
+                directories.append((directory, f"{rows} rows"))
+
+        for directory, label in directories:
+            results = benchmark_parse(directory)
+            if driver is not None:
+                results.extend(benchmark_browser(directory, driver))
+            print(f"== {label}")
+            print(format_results(results))
+    finally:
+        if driver is not None:
+            driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,611 @@
 # pylint: disable=E1129
+import collections
+import contextlib
+import random
+import threading
+import time
+
 import gspread
+import requests
+from gspread.utils import (
+    a1_range_to_grid_range,
+    absolute_range_name,
+    fill_gaps,
+    rowcol_to_a1,
+)
+
+# Google's published Sheets API quotas per user per project
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+# Status codes of requests worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """A thread-safe token bucket that refills at a steady rate"""
+
+    def __init__(self, capacity, refill_per_second):
+        """Initialize a full bucket with a given capacity and refill rate"""
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting for one if the bucket is empty.
+        Returns the number of seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                # Refill the bucket for the time since the last update
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.refill_per_second,
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.refill_per_second
+
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """Paces Sheets API requests to stay inside the read and write quotas, and
+    retries rate limited or failed requests with jittered exponential backoff"""
+
+    def __init__(
+        self,
+        reads_per_minute=READ_REQUESTS_PER_MINUTE,
+        writes_per_minute=WRITE_REQUESTS_PER_MINUTE,
+        max_retries=5,
+        max_backoff=64.0,
+    ):
+        """Initialize the read and write buckets and the retry policy"""
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, reads_per_minute / 60),
+            "write": TokenBucket(writes_per_minute, writes_per_minute / 60),
+        }
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+
+        # Counters reported by stats()
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+
+    def call(self, kind, function, *args, **kwargs):
+        """Call function as a "read" or "write" request once a token is free"""
+        attempt = 0
+        while True:
+            # Wait in the queue for a token of the right kind
+            with self.lock:
+                self.counters["queueDepth"] += 1
+                self.counters["maxQueueDepth"] = max(
+                    self.counters["maxQueueDepth"], self.counters["queueDepth"]
+                )
+            waited = self.buckets[kind].acquire()
+            with self.lock:
+                self.counters["queueDepth"] -= 1
+                self.counters["throttleSeconds"] += waited
+                self.counters[f"{kind}s"] += 1
+
+            try:
+                return function(*args, **kwargs)
+            except gspread.exceptions.APIError as exception:
+                if (
+                    exception.code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    raise
+
+            # Back off exponentially with random jitter before retrying
+            delay = min(2**attempt + random.random(), self.max_backoff)
+            with self.lock:
+                self.counters["retries"] += 1
+                self.counters["throttleSeconds"] += delay
+            time.sleep(delay)
+            attempt += 1
+
+    def reset(self):
+        """Zero the counters, so stats() covers the requests from now on. Requests
+        still queued keep counting towards the queue depth"""
+        with self.lock:
+            queue_depth = self.counters["queueDepth"]
+            self.counters = collections.Counter(
+                queueDepth=queue_depth, maxQueueDepth=queue_depth
+            )
+
+    def stats(self):
+        """Return the request, retry, queue depth and throttle time counters"""
+        with self.lock:
+            return {
+                "reads": self.counters["reads"],
+                "writes": self.counters["writes"],
+                "retries": self.counters["retries"],
+                "queueDepth": self.counters["queueDepth"],
+                "maxQueueDepth": self.counters["maxQueueDepth"],
+                "throttleSeconds": round(self.counters["throttleSeconds"], 3),
+            }
+
+
+# Quotas are per user, so every GoogleSheets shares one scheduler by default
+DEFAULT_SCHEDULER = RequestScheduler()
+
+# Authorised gspread clients shared by every GoogleSheets in the process, keyed by
+# the credentials and authorized user files they were created from
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(
+    credentials_filename="./credentials.json",
+    authorized_user_filename="./authorized_user.json",
+):
+    """Return the process-wide gspread client, authenticating on first use"""
+    key = (credentials_filename, authorized_user_filename)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            # Authorize the gspread client using credentials and authorized user files
+            client = gspread.oauth(
+                credentials_filename=credentials_filename,
+                authorized_user_filename=authorized_user_filename,
+            )
+
+            # Keep enough keep-alive connections open for the concurrent syncs
+            client.http_client.session.mount(
+                "https://",
+                requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16),
+            )
+            _CLIENTS[key] = client
+        return _CLIENTS[key]
 
 
 class GoogleSheets:
     """A class for read/writing data to a Google Sheet"""
 
-    def __init__(self, spreadsheet_id):
-        """Initialize the class with a given spreadsheet_id"""
+    # Each cache and queue is its own attribute, all guarded by the one lock
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, spreadsheet_id, mirror=None, scheduler=None):
+        """Initialize the class with a given spreadsheet_id, an optional
+        SheetMirror recording the rows written to it and an optional
+        RequestScheduler pacing its API requests"""
         self.spreadsheet_id = spreadsheet_id
+        self.mirror = mirror
+        self.scheduler = scheduler or DEFAULT_SCHEDULER
+
+        # Share one authorised client and HTTP session across the process
+        self.client = get_client()
+
+        # The sheet is opened on first access
+        self.__sheet = None
+
+        # Worksheet handles keyed by title and by sheet id, loaded lazily
+        self.__worksheets_by_title = {}
+        self.__worksheets_by_id = {}
+        self.__worksheets_loaded = False
+
+        # Counters to confirm worksheet lookups are served from the cache
+        self.worksheet_cache_hits = 0
+        self.worksheet_cache_misses = 0
+
+        # Writes queued by batch(), keyed by worksheet title then (row, col), and
+        # the writes of the flush being sent
+        self.__pending_writes = {}
+        self.__flushing = {}
+        self.__batch_depth = 0
+
+        # Ranges prefetched by prefetch(), keyed by worksheet title, and the cells
+        # written since then which can no longer be served from them
+        self.__snapshot = {}
+        self.__stale_cells = {}
+
+        # First empty row found by find_empty_row(), keyed by (worksheet, column)
+        self.__empty_rows = {}
+
+        # Guards the caches and queues above when syncs share the sheet from threads,
+        # and orders the flushes, which send their requests without holding it
+        self.__lock = threading.RLock()
+        self.__flush_lock = threading.Lock()
+
+    @property
+    def sheet(self):
+        """The spreadsheet, opened by its key on first access"""
+        with self.__lock:
+            if self.__sheet is None:
+                self.__sheet = self.scheduler.call(
+                    "read", self.client.open_by_key, self.spreadsheet_id
+                )
+            return self.__sheet
+
+    def worksheet(self, worksheet_name):
+        """Return the cached handle for a worksheet, loading the cache if needed"""
+
+        with self.__lock:
+            # Serve the handle from the cache if it is already known
+            if (
+                self.__worksheets_loaded
+                and worksheet_name in self.__worksheets_by_title
+            ):
+                self.worksheet_cache_hits += 1
+                return self.__worksheets_by_title[worksheet_name]
+
+            # Otherwise (re)load every handle with a single metadata fetch
+            self.worksheet_cache_misses += 1
+            self.__load_worksheets()
+
+            if worksheet_name not in self.__worksheets_by_title:
+                raise gspread.exceptions.WorksheetNotFound(worksheet_name)
+            return self.__worksheets_by_title[worksheet_name]
+
+    def worksheet_by_id(self, sheet_id):
+        """Return the cached handle for a worksheet by its sheet id"""
+
+        with self.__lock:
+            # Serve the handle from the cache if it is already known
+            if self.__worksheets_loaded and sheet_id in self.__worksheets_by_id:
+                self.worksheet_cache_hits += 1
+                return self.__worksheets_by_id[sheet_id]
+
+            # Otherwise (re)load every handle with a single metadata fetch
+            self.worksheet_cache_misses += 1
+            self.__load_worksheets()
+
+            if sheet_id not in self.__worksheets_by_id:
+                raise gspread.exceptions.WorksheetNotFound(f"id {sheet_id} not found")
+            return self.__worksheets_by_id[sheet_id]
+
+    def invalidate_worksheets(self):
+        """Drop the cached worksheet handles so the next lookup reloads them"""
+        with self.__lock:
+            self.__worksheets_by_title = {}
+            self.__worksheets_by_id = {}
+            self.__worksheets_loaded = False
+
+    def add_worksheet(self, title, rows, cols):
+        """Add a worksheet to the spreadsheet and invalidate the handle cache"""
+        worksheet = self.scheduler.call(
+            "write", self.sheet.add_worksheet, title, rows, cols
+        )
+        self.invalidate_worksheets()
+        return worksheet
+
+    def rename_worksheet(self, worksheet_name, new_title):
+        """Rename a worksheet and invalidate the handle cache"""
+        self.scheduler.call(
+            "write", self.worksheet(worksheet_name).update_title, new_title
+        )
+        self.invalidate_worksheets()
+
+    def resize_worksheet(self, worksheet_name, rows=None, cols=None):
+        """Resize a worksheet and invalidate the handle cache"""
+        self.scheduler.call("write", self.worksheet(worksheet_name).resize, rows, cols)
+        self.invalidate_worksheets()
+
+    def __load_worksheets(self):
+        """Build the worksheet handle cache from one metadata fetch"""
+
+        # Fetch the metadata of every worksheet in a single round trip
+        metadata = self.scheduler.call("read", self.sheet.fetch_sheet_metadata)
+
+        self.__worksheets_by_title = {}
+        self.__worksheets_by_id = {}
+        for item in metadata["sheets"]:
+            worksheet = gspread.Worksheet(
+                self.sheet, item["properties"], self.sheet.id, self.sheet.client
+            )
+            self.__worksheets_by_title[worksheet.title] = worksheet
+            self.__worksheets_by_id[worksheet.id] = worksheet
+        self.__worksheets_loaded = True
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue writes made inside the block and flush them in one batch update"""
+        with self.__lock:
+            self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                self.__batch_depth -= 1
+                closed = self.__batch_depth == 0
+            if closed:
+                self.flush()
+
+    def flush(self):
+        """Send every queued write to the spreadsheet in one values batch update"""
+        # One flush is sent at a time so the writes reach the sheet in order, and
+        # the queue is swapped out so other threads are not held up by the request
+        with self.__flush_lock:
+            with self.__lock:
+                pending_writes = self.__flushing = self.__pending_writes
+                self.__pending_writes = {}
+            try:
+                self.__send(pending_writes)
+            except Exception:
+                # Queue the unsent writes again, under any made since
+                with self.__lock:
+                    for worksheet_name, cells in pending_writes.items():
+                        self.__pending_writes[worksheet_name] = {
+                            **cells,
+                            **self.__pending_writes.get(worksheet_name, {}),
+                        }
+                raise
+            finally:
+                with self.__lock:
+                    self.__flushing = {}
+
+    def __send(self, pending_writes):
+        """Write the queued cells of each worksheet in one values batch update"""
+        if not pending_writes:
+            return
+
+        # Merge the queued cells of each worksheet into rectangular ranges
+        blocks = [
+            (worksheet_name, start_row, start_col, values_2d)
+            for worksheet_name, cells in pending_writes.items()
+            for start_row, start_col, values_2d in _merge_rectangles(cells)
+        ]
+        data = [
+            {
+                "range": absolute_range_name(
+                    worksheet_name,
+                    f"{rowcol_to_a1(start_row, start_col)}:"
+                    + rowcol_to_a1(
+                        start_row + len(values_2d) - 1,
+                        start_col + len(values_2d[0]) - 1,
+                    ),
+                ),
+                "values": values_2d,
+            }
+            for worksheet_name, start_row, start_col, values_2d in blocks
+        ]
+
+        # Update every range in a single request
+        self.scheduler.call(
+            "write",
+            self.sheet.values_batch_update,
+            {"valueInputOption": "USER_ENTERED", "data": data},
+        )
+
+        # Record the written rows in the mirror
+        if self.mirror is not None:
+            for worksheet_name, start_row, start_col, values_2d in blocks:
+                self.mirror.record(
+                    self.spreadsheet_id,
+                    worksheet_name,
+                    start_row,
+                    start_col,
+                    values_2d,
+                )
+
+    def verify_mirror(self, sample_rows=20):
+        """Compare the last mirrored rows of each worksheet with the live sheet in
+        one values batch get, and forget the mirror of any worksheet edited by hand.
+        Returns the names of the edited worksheets"""
+        if self.mirror is None:
+            return []
+
+        # Take the most recently mirrored rows of every worksheet
+        samples = {}
+        for worksheet_name in self.mirror.worksheets(self.spreadsheet_id):
+            rows = self.mirror.rows(self.spreadsheet_id, worksheet_name)
+            samples[worksheet_name] = {
+                row: rows[row] for row in sorted(rows)[-sample_rows:]
+            }
+        if not samples:
+            return []
 
-        # Authorize the gspread client using credentials and authorized user files
-        self.client = gspread.oauth(
-            credentials_filename="./credentials.json",
-            authorized_user_filename="./authorized_user.json",
+        # Fetch the block of rows around each sample with the formulas as written
+        bounds = {
+            worksheet_name: (
+                min(rows),
+                min(min(values) for values in rows.values()),
+                max(rows),
+                max(max(values) for values in rows.values()),
+            )
+            for worksheet_name, rows in samples.items()
+        }
+        response = self.scheduler.call(
+            "read",
+            self.sheet.values_batch_get,
+            [
+                absolute_range_name(
+                    worksheet_name,
+                    f"{rowcol_to_a1(top, left)}:{rowcol_to_a1(bottom, right)}",
+                )
+                for worksheet_name, (top, left, bottom, right) in bounds.items()
+            ],
+            params={
+                "valueRenderOption": "FORMULA",
+                "dateTimeRenderOption": "FORMATTED_STRING",
+            },
+        )
+
+        # Compare the checksum of every sampled row with the live values
+        edited = []
+        for (worksheet_name, (top, left, bottom, right)), value_range in zip(
+            bounds.items(), response["valueRanges"]
+        ):
+            values_2d = fill_gaps(
+                value_range.get("values", []),
+                rows=bottom - top + 1,
+                cols=right - left + 1,
+            )
+            if not all(
+                self.mirror.matches(
+                    self.spreadsheet_id,
+                    worksheet_name,
+                    row,
+                    {col: values_2d[row - top][col - left] for col in mirrored},
+                )
+                for row, mirrored in samples[worksheet_name].items()
+            ):
+                self.mirror.forget(self.spreadsheet_id, worksheet_name)
+                edited.append(worksheet_name)
+
+        return edited
+
+    def prefetch(self, ranges):
+        """Fetch a list of (worksheet_name, range_address) in one values batch get
+        and serve later reads inside those ranges from memory"""
+        if not ranges:
+            return
+
+        # Fetch every range in a single request
+        response = self.scheduler.call(
+            "read",
+            self.sheet.values_batch_get,
+            [absolute_range_name(name, address) for name, address in ranges],
         )
 
-        # Open the sheet using its key
-        self.sheet = self.client.open_by_key(self.spreadsheet_id)
+        with self.__lock:
+            self.__store_snapshot(ranges, response["valueRanges"])
+
+    def __store_snapshot(self, ranges, value_ranges):
+        """Keep the values returned for prefetched ranges in the snapshot"""
+        for (worksheet_name, address), value_range in zip(ranges, value_ranges):
+            # The returned range is bounded at the worksheet edge when an open
+            # range such as A:A was requested, remember which ends were open
+            _, _, open_row, open_col = _range_bounds(address)
+            start_row, start_col, end_row, end_col = _range_bounds(
+                value_range["range"].rpartition("!")[2]
+            )
+            values_2d = fill_gaps(
+                value_range.get("values", []),
+                rows=end_row - start_row + 1,
+                cols=end_col - start_col + 1,
+            )
+            self.__snapshot.setdefault(worksheet_name, []).append(
+                (
+                    start_row,
+                    start_col,
+                    end_row if open_row != float("inf") else float("inf"),
+                    end_col if open_col != float("inf") else float("inf"),
+                    values_2d,
+                )
+            )
+
+    def invalidate(self, worksheet_name, range_address=None):
+        """Stop serving a range of a worksheet (or all of it) from the snapshot"""
+        with self.__lock:
+            if worksheet_name not in self.__snapshot:
+                return
+
+            if range_address is None:
+                self.__snapshot.pop(worksheet_name, None)
+                self.__stale_cells.pop(worksheet_name, None)
+                return
+
+            start_row, start_col, end_row, end_col = self.__resolve_bounds(
+                worksheet_name, range_address
+            )
+            self.__stale_cells.setdefault(worksheet_name, set()).update(
+                (row, col)
+                for row in range(start_row, end_row + 1)
+                for col in range(start_col, end_col + 1)
+            )
+
+    def find_empty_row(self, worksheet_name, column):
+        """Return the index of the first empty cell in a column of a worksheet"""
+        column_index = gspread.utils.a1_to_rowcol(f"{column}1")[1]
+
+        # Reuse the row found earlier in the run, kept up to date by writes
+        with self.__lock:
+            if (worksheet_name, column_index) in self.__empty_rows:
+                return self.__empty_rows[(worksheet_name, column_index)]
+
+        # Read the whole column in one request, only its populated extent is sent
+        cells = self.read_range(worksheet_name, f"{column}:{column}")
+
+        # Find the first empty cell, or the row after the end of the worksheet
+        empty_row_index = next(
+            (cell.row for cell in cells if cell.value == ""), len(cells) + 1
+        )
+        with self.__lock:
+            return self.__empty_rows.setdefault(
+                (worksheet_name, column_index), empty_row_index
+            )
 
     def read_cell(self, worksheet_name, cell_address):
         """Read the value of a cell in a worksheet"""
 
+        # Make sure queued writes to this cell reach the sheet first
+        if self.__is_pending(worksheet_name, cell_address):
+            self.flush()
+
+        with self.__lock:
+            # Serve the cell from the prefetched snapshot if possible
+            cells = self.__read_snapshot(worksheet_name, cell_address)
+        if cells is not None:
+            # A cell past the end of the prefetched rows is empty
+            if not cells or cells[0].value == "":
+                return None
+            return cells[0].value
+
         # Get the worksheet by name
-        worksheet = self.sheet.worksheet(worksheet_name)
+        worksheet = self.worksheet(worksheet_name)
         # Get the cell by address
-        cell = worksheet.acell(cell_address)
+        cell = self.scheduler.call("read", worksheet.acell, cell_address)
         # Return the cell value
         return cell.value
 
     def write_cell(self, worksheet_name, cell_address, value):
         """Write a value to a cell in a worksheet"""
 
+        row, col = gspread.utils.a1_to_rowcol(cell_address)
+
+        # Skip the write if the mirror shows the cell already holds the value
+        if self.mirror is not None and self.mirror.is_unchanged(
+            self.spreadsheet_id, worksheet_name, row, col, [value]
+        ):
+            return
+
+        with self.__lock:
+            # The prefetched value of this cell is out of date from now on
+            self.invalidate(worksheet_name, cell_address)
+
+            # Move any cached empty row past the written cell
+            self.__advance_empty_rows(worksheet_name, row, col, [[value]])
+
+            # Queue the value if a batch is open
+            if self.__batch_depth:
+                self.__queue_write(worksheet_name, row, col, [[value]])
+                return
+
         # Get the worksheet by name
-        worksheet = self.sheet.worksheet(worksheet_name)
+        worksheet = self.worksheet(worksheet_name)
         # Update the cell value
-        worksheet.update_acell(cell_address, value)
+        self.scheduler.call("write", worksheet.update_acell, cell_address, value)
+
+        # Record the written cell in the mirror
+        if self.mirror is not None:
+            self.mirror.record(self.spreadsheet_id, worksheet_name, row, col, [[value]])
 
     def read_range(self, worksheet_name, range_address):
         """Read the values of a range of cells in a worksheet"""
 
+        # Make sure queued writes inside the range reach the sheet first
+        if self.__is_pending(worksheet_name, range_address):
+            self.flush()
+
+        with self.__lock:
+            # Serve the range from the prefetched snapshot if possible
+            cells = self.__read_snapshot(worksheet_name, range_address)
+        if cells is not None:
+            return cells
+
         # Get the worksheet by name
-        worksheet = self.sheet.worksheet(worksheet_name)
+        worksheet = self.worksheet(worksheet_name)
 
         # Get the range of cells
-        cells = worksheet.range(range_address)
+        cells = self.scheduler.call("read", worksheet.range, range_address)
 
         # Return the values of the cells as a list
         return cells
@@ -51,9 +613,6 @@ class GoogleSheets:
     def write_range(self, worksheet_name, range_address, values):
         """Write values to a range of cells in a worksheet"""
 
-        # Get the worksheet by name
-        worksheet = self.sheet.worksheet(worksheet_name)
-
         # Calculate dimensions of the range
         start_cell, end_cell = range_address.split(":")
         start_row, start_col = gspread.utils.a1_to_rowcol(start_cell)
@@ -72,5 +631,185 @@ class GoogleSheets:
                 + "the dimensions of the range"
             )
 
+        # Only push the rows the mirror does not show as already written
+        if self.mirror is not None and self.__write_changed_rows(
+            worksheet_name, start_row, start_col, values_2d
+        ):
+            return
+
+        with self.__lock:
+            # The prefetched values of this range are out of date from now on
+            self.invalidate(worksheet_name, range_address)
+
+            # Move any cached empty rows past the written cells
+            self.__advance_empty_rows(worksheet_name, start_row, start_col, values_2d)
+
+            # Queue the values if a batch is open
+            if self.__batch_depth:
+                self.__queue_write(worksheet_name, start_row, start_col, values_2d)
+                return
+
+        # Get the worksheet by name
+        worksheet = self.worksheet(worksheet_name)
+
         # Update the values of the cells
-        worksheet.update(range_address, values_2d, value_input_option="USER_ENTERED")
+        self.scheduler.call(
+            "write",
+            worksheet.update,
+            range_address,
+            values_2d,
+            value_input_option="USER_ENTERED",
+        )
+
+        # Record the written rows in the mirror
+        if self.mirror is not None:
+            self.mirror.record(
+                self.spreadsheet_id, worksheet_name, start_row, start_col, values_2d
+            )
+
+    def __write_changed_rows(self, worksheet_name, start_row, start_col, values_2d):
+        """Write only the rows of a block the mirror does not show as already
+        written. Returns False, writing nothing, if every row has changed"""
+        changed_rows = [
+            offset
+            for offset, row_values in enumerate(values_2d)
+            if not self.mirror.is_unchanged(
+                self.spreadsheet_id,
+                worksheet_name,
+                start_row + offset,
+                start_col,
+                row_values,
+            )
+        ]
+        if len(changed_rows) == len(values_2d):
+            return False
+
+        end_col = start_col + len(values_2d[0]) - 1
+        with self.batch():
+            for offset in changed_rows:
+                self.write_range(
+                    worksheet_name,
+                    f"{rowcol_to_a1(start_row + offset, start_col)}:"
+                    + f"{rowcol_to_a1(start_row + offset, end_col)}",
+                    values_2d[offset],
+                )
+        return True
+
+    def __advance_empty_rows(self, worksheet_name, start_row, start_col, values_2d):
+        """Move cached empty rows down past non-empty values written over them"""
+        for (name, column_index), row in self.__empty_rows.items():
+            col_offset = column_index - start_col
+            if name != worksheet_name or not 0 <= col_offset < len(values_2d[0]):
+                continue
+            while (
+                start_row <= row < start_row + len(values_2d)
+                and values_2d[row - start_row][col_offset] != ""
+            ):
+                row += 1
+            self.__empty_rows[(name, column_index)] = row
+
+    def __queue_write(self, worksheet_name, start_row, start_col, values_2d):
+        """Queue a block of values to be written on the next flush"""
+        cells = self.__pending_writes.setdefault(worksheet_name, {})
+        for row_offset, row_values in enumerate(values_2d):
+            for col_offset, value in enumerate(row_values):
+                cells[(start_row + row_offset, start_col + col_offset)] = value
+
+    def __is_pending(self, worksheet_name, range_address) -> bool:
+        """Check whether any queued or unsent writes fall inside the given range"""
+        start_row, start_col, end_row, end_col = _range_bounds(range_address)
+
+        with self.__lock:
+            return any(
+                start_row <= row <= end_row and start_col <= col <= end_col
+                for writes in (self.__pending_writes, self.__flushing)
+                for row, col in writes.get(worksheet_name, {})
+            )
+
+    def __read_snapshot(self, worksheet_name, range_address):
+        """Return the cells of a range from the snapshot, or None if the range is
+        not fully covered by a prefetched range or has been written since"""
+        rectangles = self.__snapshot.get(worksheet_name)
+        if not rectangles:
+            return None
+
+        start_row, start_col, end_row, end_col = _range_bounds(range_address)
+
+        # Cells written since the prefetch are read from the sheet
+        if any(
+            start_row <= row <= end_row and start_col <= col <= end_col
+            for row, col in self.__stale_cells.get(worksheet_name, set())
+        ):
+            return None
+
+        for top, left, bottom, right, values_2d in rectangles:
+            if top <= start_row and end_row <= bottom:
+                if left <= start_col and end_col <= right:
+                    # Open ends are served up to the edge of the prefetched range
+                    last_row = min(end_row, top + len(values_2d) - 1)
+                    last_col = min(end_col, left + len(values_2d[0]) - 1)
+                    return [
+                        gspread.Cell(row, col, values_2d[row - top][col - left])
+                        for row in range(start_row, last_row + 1)
+                        for col in range(start_col, last_col + 1)
+                    ]
+        return None
+
+    def __resolve_bounds(self, worksheet_name, range_address):
+        """Return the bounds of a range, closing open ranges at the worksheet edge"""
+        start_row, start_col, end_row, end_col = _range_bounds(range_address)
+        if end_row == float("inf") or end_col == float("inf"):
+            worksheet = self.worksheet(worksheet_name)
+            end_row = min(end_row, worksheet.row_count)
+            end_col = min(end_col, worksheet.col_count)
+        return start_row, start_col, end_row, end_col
+
+
+def _range_bounds(range_address):
+    """Return the 1-based inclusive (start_row, start_col, end_row, end_col) of
+    an A1 range, using infinity for the open end of ranges such as A:A"""
+    grid_range = a1_range_to_grid_range(range_address)
+    return (
+        grid_range.get("startRowIndex", 0) + 1,
+        grid_range.get("startColumnIndex", 0) + 1,
+        grid_range.get("endRowIndex", float("inf")),
+        grid_range.get("endColumnIndex", float("inf")),
+    )
+
+
+def _merge_rectangles(cells):
+    """Merge a {(row, col): value} mapping into (start_row, start_col, values_2d)
+    rectangles, joining adjacent rows that span the same columns"""
+
+    # Split every row into runs of consecutive columns
+    rows = {}
+    for (row, col), value in cells.items():
+        rows.setdefault(row, {})[col] = value
+
+    runs = []
+    for row in sorted(rows):
+        columns = sorted(rows[row])
+        start_col = columns[0]
+        for index, col in enumerate(columns):
+            if index + 1 == len(columns) or columns[index + 1] != col + 1:
+                runs.append(
+                    (row, start_col, [rows[row][c] for c in range(start_col, col + 1)])
+                )
+                if index + 1 < len(columns):
+                    start_col = columns[index + 1]
+
+    # Stack runs that cover the same columns on consecutive rows
+    rectangles = []
+    open_rectangles = {}
+    for row, start_col, values in runs:
+        key = (start_col, len(values))
+        rectangle = open_rectangles.get(key)
+        if rectangle is not None and rectangle[0] + len(rectangle[2]) == row:
+            rectangle[2].append(values)
+            continue
+        if rectangle is not None:
+            rectangles.append(rectangle)
+        open_rectangles[key] = (row, start_col, [values])
+    rectangles.extend(open_rectangles.values())
+
+    return rectangles
@@ -0,0 +1,146 @@
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+class SheetMirror:
+    """A local SQLite record of the rows written to Google Sheets"""
+
+    def __init__(self, path="./sheet_mirror.sqlite3"):
+        """Open (or create) the mirror database at the given path"""
+        self.path = path
+        self.lock = threading.Lock()
+
+        # The connection is shared by the sheets of a run, guarded by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                "spreadsheet_id TEXT NOT NULL, "
+                "worksheet TEXT NOT NULL, "
+                "row INTEGER NOT NULL, "
+                "content_hash TEXT NOT NULL, "
+                "values_json TEXT NOT NULL, "
+                "updated_at TEXT NOT NULL, "
+                "PRIMARY KEY (spreadsheet_id, worksheet, row))"
+            )
+
+    def rows(self, spreadsheet_id, worksheet):
+        """Return the mirrored rows of a worksheet as {row: {col: value}}"""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT row, values_json FROM rows "
+                "WHERE spreadsheet_id = ? AND worksheet = ?",
+                (spreadsheet_id, worksheet),
+            )
+            return {
+                row: {int(col): value for col, value in json.loads(values).items()}
+                for row, values in cursor.fetchall()
+            }
+
+    def worksheets(self, spreadsheet_id):
+        """Return the names of the worksheets mirrored for a spreadsheet"""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT DISTINCT worksheet FROM rows WHERE spreadsheet_id = ?",
+                (spreadsheet_id,),
+            )
+            return [worksheet for (worksheet,) in cursor.fetchall()]
+
+    def is_unchanged(self, spreadsheet_id, worksheet, row, start_col, values):
+        """Return True if a row segment matches what was last written to it"""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT values_json FROM rows "
+                "WHERE spreadsheet_id = ? AND worksheet = ? AND row = ?",
+                (spreadsheet_id, worksheet, row),
+            )
+            result = cursor.fetchone()
+        if result is None:
+            return False
+
+        mirrored = json.loads(result[0])
+        return all(
+            str(start_col + offset) in mirrored
+            and normalise(mirrored[str(start_col + offset)]) == normalise(value)
+            for offset, value in enumerate(values)
+        )
+
+    def record(self, spreadsheet_id, worksheet, start_row, start_col, values_2d):
+        """Record a block of values written to a worksheet"""
+        now = datetime.datetime.now().isoformat()
+        existing = self.rows(spreadsheet_id, worksheet)
+
+        with self.lock, self.connection:
+            for row_offset, row_values in enumerate(values_2d):
+                row = start_row + row_offset
+
+                # Merge the written segment into whatever was written to the row
+                values = existing.get(row, {})
+                for col_offset, value in enumerate(row_values):
+                    values[start_col + col_offset] = value
+
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        spreadsheet_id,
+                        worksheet,
+                        row,
+                        content_hash(values),
+                        json.dumps({str(col): value for col, value in values.items()}),
+                        now,
+                    ),
+                )
+
+    def matches(self, spreadsheet_id, worksheet, row, values):
+        """Return True if live {col: value} cells hash the same as the mirrored row"""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT content_hash FROM rows "
+                "WHERE spreadsheet_id = ? AND worksheet = ? AND row = ?",
+                (spreadsheet_id, worksheet, row),
+            )
+            result = cursor.fetchone()
+        return result is not None and result[0] == content_hash(values)
+
+    def forget(self, spreadsheet_id, worksheet, rows=None):
+        """Drop mirrored rows of a worksheet (or all of them) after a manual edit"""
+        with self.lock, self.connection:
+            if rows is None:
+                self.connection.execute(
+                    "DELETE FROM rows WHERE spreadsheet_id = ? AND worksheet = ?",
+                    (spreadsheet_id, worksheet),
+                )
+                return
+            self.connection.executemany(
+                "DELETE FROM rows WHERE spreadsheet_id = ? AND worksheet = ? AND row = ?",
+                [(spreadsheet_id, worksheet, row) for row in rows],
+            )
+
+
+def normalise(value):
+    """Normalise a cell value so user-entered and rendered values compare equal"""
+    text = str(value).strip()
+    if text.startswith("="):
+        return text.replace(" ", "")
+
+    # Numbers are stored without their currency and thousands formatting, and
+    # percentages as the fraction the sheet renders them as
+    number = text.replace("£", "").replace("$", "").replace(",", "")
+    scale = 1
+    if number.endswith("%"):
+        number, scale = number[:-1], 100
+    try:
+        return round(float(number) / scale, 6)
+    except ValueError:
+        return text
+
+
+def content_hash(values):
+    """Return the hash of a {col: value} row after normalising its values"""
+    canonical = json.dumps(
+        [[col, normalise(values[col])] for col in sorted(values)], default=str
+    )
+    return hashlib.sha256(canonical.encode("UTF-8")).hexdigest()
@@ -1,53 +1,315 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
+import argparse
+import sys
+import time
+
+from middleware.moverperfect import Moverperfect
 
 from scrapers.hargreaves import Hargreaves
 from scrapers.nutmeg import Nutmeg
 from scrapers.shareworks import ShareWorks
 from scrapers.standardlife import StandardLife
+from utils.browser import PROFILES
+from utils.driver_pool import DEFAULT_POOL_URL, PoolClient
+from utils.fixtures import start_recording
+from utils.runner import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_TIMEOUT,
+    format_report,
+    format_stages,
+    iter_parallel,
+    iter_sequential,
+    read_baseline,
+    record_baseline,
+)
+from utils.scheduler import (
+    DEFAULT_INTERVAL_HOURS,
+    DEFAULT_JITTER_SECONDS,
+    RunLock,
+    RunLocked,
+    Scheduler,
+    SyncLog,
+)
 from utils.secrets import read_secrets
+from utils.sessions import SessionStore
+from utils.snapshots import DEFAULT_TTL_HOURS, SnapshotStore
+from utils.watermarks import WatermarkStore
 
-if __name__ == "__main__":
-    secrets = read_secrets()
 
-    options = ChromeOptions()
-    options.add_argument("--start-maximized")
-    driver = webdriver.Chrome(options=options)
+def build_scrapers(secrets, capture=False, fast_path=False, watermarks=None) -> dict:
+    """Create the scraper for each provider from the secrets. In capture mode the
+    Nutmeg and Standard Life scrapers read the portals' JSON responses, and with the
+    fast path Hargreaves fetches its account summaries over HTTP. With watermarks
+    the scrapers only read back to the last synced transaction"""
+    # Logins are only saved between runs when there is a key to encrypt them with
+    sessions = (
+        SessionStore(secrets["SESSION_KEY"]) if secrets.get("SESSION_KEY") else None
+    )
+
+    return {
+        "nutmeg": Nutmeg(
+            secrets["NUTMEG_EMAIL"],
+            secrets["NUTMEG_PASSWORD"],
+            sessions,
+            capture,
+            watermarks,
+        ),
+        "shareworks": ShareWorks(
+            secrets["SHAREWORKS_HOST"],
+            secrets["SHAREWORKS_USERNAME"],
+            secrets["SHAREWORKS_PASSWORD"],
+            sessions,
+            watermarks,
+        ),
+        "standardLife": StandardLife(
+            secrets["STANDARDLIFE_USERNAME"],
+            secrets["STANDARDLIFE_PASSWORD"],
+            sessions,
+            capture,
+            watermarks,
+        ),
+        "hargreaves": Hargreaves(
+            secrets["HARGREAVES_USERNAME"],
+            secrets["HARGREAVES_DOB"],
+            secrets["HARGREAVES_PASSWORD"],
+            secrets["HARGREAVES_SECRET_NUMBER"],
+            secrets["HARGREAVES_ACCOUNTS"],
+            sessions=sessions,
+            fast_path=fast_path,
+            watermarks=watermarks,
+        ),
+    }
+
+
+def replay(snapshots, providers) -> dict:
+    """Return each provider's newest fresh snapshot, or exit if one is missing"""
+    results = {}
+    for name in providers:
+        snapshot = snapshots.latest(name)
+        if snapshot is None:
+            sys.exit(f"No fresh {name} snapshot to replay, run a scrape first")
+        results[name], created_at = snapshot
+        print(f"Replaying the {name} snapshot from {created_at:%Y-%m-%d %H:%M:%S}")
+    return results
+
+
+def run(args, secrets, scrapers, snapshots, watermarks, *, sync_log=None) -> list:
+    """Scrape the providers of the given scrapers, or replay their snapshots, and
+    hand each provider's data to its sheet sync as soon as it is ready. Providers
+    without a scraper are not synced. The synced providers are recorded in the
+    sync log and returned"""
+    start = time.perf_counter()
+
+    if args.replay:
+        scrapes = (
+            (name, data, None) for name, data in replay(snapshots, scrapers).items()
+        )
+    else:
+        pool = PoolClient(args.pool) if args.pool else None
+        if args.parallel:
+            scrapes = iter_parallel(
+                scrapers, args.max_workers, args.timeout, args.profile, pool
+            )
+        else:
+            scrapes = iter_sequential(scrapers, args.profile, pool)
 
-    nutmeg = Nutmeg(secrets["NUTMEG_EMAIL"], secrets["NUTMEG_PASSWORD"])
+    # When each scrape finished, in seconds from the start of the run
+    scraped_at = {}
+    reports = {}
 
-    nutmeg_data = nutmeg.scrape_data(driver)
+    def results():
+        for name, data, report in scrapes:
+            if report is not None:
+                reports[name] = report
 
-    print(nutmeg_data)
+            # A failed scrape is neither synced nor snapshotted
+            if data is None:
+                print(f"The {name} scrape failed, it will not be synced")
+                continue
+            scraped_at[name] = time.perf_counter() - start
 
-    shareworks = ShareWorks(
-        secrets["SHAREWORKS_HOST"],
-        secrets["SHAREWORKS_USERNAME"],
-        secrets["SHAREWORKS_PASSWORD"],
+            # Snapshot every scrape so the sync can be replayed without the browser
+            if not args.replay:
+                snapshots.save(name, data)
+
+            print(data)
+            yield name, data
+
+    # The sheets are written while the remaining scrapes run
+    timings, synced_at = Moverperfect.insert_stream(
+        secrets, results(), watermarks, use_mirror=not args.no_mirror
     )
 
-    shareworks_data = shareworks.scrape_data(driver)
+    # Recorded straight away, so the daemon does not sync these providers again
+    # while they are fresh even if the reports below fail
+    if sync_log is not None:
+        sync_log.record(synced_at)
 
-    print(shareworks_data)
+    if not args.replay:
+        print(format_report(reports, read_baseline()))
 
-    standard_life = StandardLife(
-        secrets["STANDARDLIFE_USERNAME"], secrets["STANDARDLIFE_PASSWORD"]
+        # Default profile scrapes are the baseline the lean profile is measured by
+        if args.profile == "default" and reports:
+            record_baseline(reports)
+    print(
+        format_stages(
+            scraped_at, reports, timings, synced_at, time.perf_counter() - start
+        )
     )
 
-    standard_life_data = standard_life.scrape_data(driver)
+    print("Finished")
+    return list(synced_at)
+
+
+def provider_interval(value):
+    """Parse a provider=hours scrape interval"""
+    provider, _, hours = value.partition("=")
+    if provider not in DEFAULT_INTERVAL_HOURS:
+        raise argparse.ArgumentTypeError(f"unknown provider {provider}")
+    try:
+        return provider, float(hours)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid hours {hours}") from None
 
-    print(standard_life_data)
 
-    hargreaves = Hargreaves(
-        secrets["HARGREAVES_USERNAME"],
-        secrets["HARGREAVES_DOB"],
-        secrets["HARGREAVES_PASSWORD"],
-        secrets["HARGREAVES_SECRET_NUMBER"],
-        secrets["HARGREAVES_ACCOUNTS"],
+def parse_args():
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description="Update the finance spreadsheet")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="scrape the providers at the same time, each with its own browser",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="number of providers scraped at once in parallel mode",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=DEFAULT_TIMEOUT,
+        help="seconds allowed for each provider in parallel mode",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILES,
+        default="default",
+        help="browser profile, lean is headless with images and trackers blocked",
+    )
+    parser.add_argument(
+        "--capture",
+        action="store_true",
+        help="read Nutmeg and Standard Life data from the JSON their pages fetch",
     )
+    parser.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="fetch Hargreaves account summaries over HTTP after the browser login",
+    )
+    parser.add_argument(
+        "--full-history",
+        action="store_true",
+        help="scrape all history instead of back to the last synced transactions",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="sync the newest fresh scrape snapshots without opening a browser",
+    )
+    parser.add_argument(
+        "--snapshot-ttl",
+        type=float,
+        default=DEFAULT_TTL_HOURS,
+        help="hours a scrape snapshot can still be replayed",
+    )
+    parser.add_argument(
+        "--no-mirror",
+        action="store_true",
+        help="write every row instead of skipping those the local mirror has written",
+    )
+    parser.add_argument(
+        "--pool",
+        nargs="?",
+        const=DEFAULT_POOL_URL,
+        metavar="URL",
+        help="lease warm browser sessions from the driver pool daemon "
+        + f"(default {DEFAULT_POOL_URL})",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="save the sanitized pages scraped into DIR for the parsing benchmark",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running, scraping and syncing each provider when it is due",
+    )
+    parser.add_argument(
+        "--interval",
+        type=provider_interval,
+        action="append",
+        default=[],
+        metavar="PROVIDER=HOURS",
+        help="hours between scrapes of a provider in daemon mode",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=DEFAULT_JITTER_SECONDS,
+        help="up to this many seconds are added to each daemon tick at random",
+    )
+    args = parser.parse_args()
+    if args.daemon and args.replay:
+        parser.error("--replay cannot be used with --daemon")
+    return args
 
-    hargreaves_data = hargreaves.scrape_data(driver)
 
-    print(hargreaves_data)
+def main():
+    """Scrape the providers and update the finance spreadsheet"""
+    args = parse_args()
+    secrets = read_secrets()
+    watermarks = WatermarkStore()
+    scrapers = build_scrapers(
+        secrets,
+        args.capture,
+        args.fast_path,
+        None if args.full_history else watermarks,
+    )
 
-    print("Finished")
+    if args.record:
+        start_recording(args.record)
+
+    snapshots = SnapshotStore(ttl_hours=args.snapshot_ttl)
+    sync_log = SyncLog()
+    if args.daemon:
+        Scheduler(dict(args.interval), sync_log=sync_log).run_forever(
+            list(scrapers),
+            lambda due: run(
+                args,
+                secrets,
+                {name: scrapers[name] for name in due},
+                snapshots,
+                watermarks,
+                sync_log=sync_log,
+            ),
+            args.jitter,
+        )
+    else:
+        try:
+            with RunLock():
+                synced = run(
+                    args, secrets, scrapers, snapshots, watermarks, sync_log=sync_log
+                )
+        except RunLocked as exception:
+            sys.exit(str(exception))
+
+        # Fail the run for cron when a provider was not synced
+        failed = [name for name in scrapers if name not in synced]
+        if failed:
+            sys.exit(f"Not synced: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,30 @@
+import collections
+import concurrent.futures
 import datetime
+import logging
+import threading
+import time
 
-from connectors.gsheet import GoogleSheets
+import gspread
+
+from connectors.gsheet import DEFAULT_SCHEDULER, GoogleSheets
+from connectors.mirror import SheetMirror
+from utils.watermarks import DEFAULT_ACCOUNT
+
+# Ranges read while syncing each spreadsheet, prefetched in one batch get per run
+SHEET_READ_PLAN = [
+    ("Nutmeg", "A:D"),
+    ("Nutmeg Monthly", "H:H"),
+    ("Share Purchase Plan", "A:C"),
+    ("Pension", "A:B"),
+]
+HARGREAVES_READ_PLAN = [
+    ("Transactions", "A:A"),
+    ("Fund Reference", "E3:E10"),
+]
+
+# Number of rows fetched by each read when scanning back up a worksheet
+LOOKBACK_ROWS = 200
 
 
 class Moverperfect:
@@ -10,7 +34,14 @@ class Moverperfect:
 
     @staticmethod
     def insert_all(
-        secrets, nutmeg_data, shareworks_data, standard_life_data, hargreaves_data
+        secrets,
+        nutmeg_data,
+        shareworks_data,
+        standard_life_data,
+        hargreaves_data,
+        *,
+        watermarks=None,
+        use_mirror=True,
     ):
         """
         Insert data from all investment platforms into Google Spreadsheet.
@@ -19,15 +50,194 @@ class Moverperfect:
         :param shareworks_data: Data from the Shareworks platform.
         :param standard_life_data: Data from the Standard Life platform.
         :param hargreaves_data: Data from the Hargreaves Lansdown platform.
+        :param watermarks: The WatermarkStore advanced to the latest synced
+        transaction of each provider whose sync succeeded.
+        :param use_mirror: Whether to skip the rows the SheetMirror shows as written.
+        :return: The timings of insert_stream.
+
+        A provider whose data is None is not synced, and a spreadsheet with no
+        providers to sync is not opened.
+        """
+        return Moverperfect.insert_stream(
+            secrets,
+            [
+                ("nutmeg", nutmeg_data),
+                ("shareworks", shareworks_data),
+                ("standardLife", standard_life_data),
+                ("hargreaves", hargreaves_data),
+            ],
+            watermarks,
+            use_mirror=use_mirror,
+        )[0]
+
+    @staticmethod
+    def insert_stream(secrets, results, watermarks=None, *, use_mirror=True):
+        """
+        Insert each provider's data into Google Spreadsheet as soon as it arrives.
+
+        Each provider's sync starts while the next result is awaited, so the
+        Sheets requests overlap the scrapes still running. A spreadsheet is opened,
+        verified and prefetched once, when its first provider arrives.
+
+        :param results: An iterable of (provider name, data) pairs, such as the
+        scrapes in the order they finish. A provider whose data is None is not
+        synced.
+        :param watermarks: The WatermarkStore advanced to the latest synced
+        transaction of each provider whose sync succeeded.
+        :param use_mirror: Whether to skip the rows the SheetMirror shows as written.
+        Without it every row is sent, and nothing is recorded in the mirror.
+        :return: A dictionary of the seconds each provider sync took, the seconds
+        each spreadsheet took to open and the total, and a dictionary of the
+        seconds from the start of the stream at which each provider sync finished.
+        A provider whose sync failed is logged and left out of the second.
+        """
+        # Rows written by earlier runs, used to push only changed or new rows
+        mirror = SheetMirror() if use_mirror else None
+
+        # The scheduler outlives the run in daemon mode, so its counters are
+        # zeroed for the report to cover this run alone
+        DEFAULT_SCHEDULER.reset()
+
+        syncs = Moverperfect.__provider_syncs()
+        timings = {}
+        finished_at = {}
+        start = time.perf_counter()
+
+        # Each spreadsheet is opened by the first of its providers to arrive, the
+        # others wait for it on the spreadsheet's lock
+        sheets = {}
+        sheet_locks = {
+            sink_name: threading.Lock() for sink_name, _, _ in syncs.values()
+        }
+
+        def open_sheet(sink_name, read_plan):
+            with sheet_locks[sink_name]:
+                if sink_name not in sheets:
+                    open_start = time.perf_counter()
+                    sheet = GoogleSheets(secrets[sink_name], mirror)
+                    Moverperfect.__verify_mirror(sheet)
+                    sheet.prefetch(read_plan)
+                    sheets[sink_name] = sheet
+                    timings[sink_name] = time.perf_counter() - open_start
+                return sheets[sink_name]
+
+        def timed_sync(name, data):
+            sink_name, read_plan, sync = syncs[name]
+            sheet = open_sheet(sink_name, read_plan)
+
+            # Each provider sends its writes in one batch update once it is done.
+            # The batch is shared with the spreadsheet's other providers, so it is
+            # flushed here rather than when the last of them finishes
+            sync_start = time.perf_counter()
+            with sheet.batch():
+                sync(sheet, data)
+            sheet.flush()
+            timings[name] = time.perf_counter() - sync_start
+            finished_at[name] = time.perf_counter() - start
+
+        # Sync each provider on a worker thread as soon as its data arrives
+        synced = Moverperfect.__sync_as_they_arrive(results, timed_sync, len(syncs))
+
+        timings["total"] = time.perf_counter() - start
+
+        # Only the transactions of the syncs that succeeded are in the sheets
+        if watermarks is not None:
+            Moverperfect.__advance_watermarks(
+                watermarks,
+                synced.get("nutmeg"),
+                synced.get("shareworks"),
+                synced.get("standardLife"),
+                synced.get("hargreaves"),
+            )
+
+        Moverperfect.__report(timings)
+        return timings, finished_at
+
+    @staticmethod
+    def __sync_as_they_arrive(results, sync, max_workers):
+        """
+        Run a sync on a worker thread for each provider's data as soon as it arrives.
+
+        :param results: An iterable of (provider name, data) pairs. A provider whose
+        data is None is not synced.
+        :param sync: Called with the name and data of each provider to sync.
+        :param max_workers: The number of syncs run at once.
+        :return: The data of the providers whose sync succeeded, keyed by provider
+        name. A failed sync is logged and does not stop the others.
+        """
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for name, data in results:
+                if data is None:
+                    continue
+                futures[name] = (data, executor.submit(sync, name, data))
+
+            synced = {}
+            for name, (data, future) in futures.items():
+                try:
+                    future.result()
+                except Exception:
+                    logging.exception("The %s sync failed", name)
+                    continue
+                synced[name] = data
+        return synced
+
+    @staticmethod
+    def __provider_syncs():
+        """
+        Return the spreadsheet each provider writes to, the read plan prefetched
+        for that spreadsheet and the provider's sync, keyed by provider name.
+        """
+
+        return {
+            "nutmeg": ("SHEET_ID", SHEET_READ_PLAN, Moverperfect.__nutmeg),
+            "shareworks": ("SHEET_ID", SHEET_READ_PLAN, Moverperfect.__shareworks),
+            "standardLife": (
+                "SHEET_ID",
+                SHEET_READ_PLAN,
+                Moverperfect.__standard_life,
+            ),
+            "hargreaves": (
+                "SHEET_ID_2",
+                HARGREAVES_READ_PLAN,
+                Moverperfect.__hargreaves,
+            ),
+        }
+
+    @staticmethod
+    def __report(timings):
+        """
+        Print how the requests were paced against the Sheets API quotas and how
+        long each sync took.
+
+        :param timings: A dictionary of the elapsed seconds to print.
         """
-        sheet = GoogleSheets(secrets["SHEET_ID"])
 
-        Moverperfect.__nutmeg(sheet, nutmeg_data)
-        Moverperfect.__shareworks(sheet, shareworks_data)
-        Moverperfect.__standard_life(sheet, standard_life_data)
+        stats = DEFAULT_SCHEDULER.stats()
+        print(
+            f"Sheets API: {stats['reads']} reads, {stats['writes']} writes, "
+            + f"{stats['retries']} retries, {stats['throttleSeconds']}s throttled, "
+            + f"max queue depth {stats['maxQueueDepth']}"
+        )
+        print(
+            "Sheets sync timings: "
+            + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        )
+
+    @staticmethod
+    def __verify_mirror(sheet: GoogleSheets):
+        """
+        Check the local mirror of a spreadsheet against the live sheet.
 
-        hargreaves_sheet = GoogleSheets(secrets["SHEET_ID_2"])
-        Moverperfect.__hargreaves(hargreaves_sheet, hargreaves_data)
+        :param sheet: The Google Sheet instance.
+        """
+
+        for worksheet in sheet.verify_mirror():
+            print(
+                f"WARNING: {worksheet} was edited outside of this script, "
+                + "its rows will be written in full"
+            )
 
     @staticmethod
     def __nutmeg(sheet: GoogleSheets, nutmeg_data):
@@ -40,81 +250,65 @@ class Moverperfect:
         sheet_name_main = "Nutmeg"
         sheet_name_monthly = "Nutmeg Monthly"
 
-        # Function to check if the date in a given row-1 matches the transaction_date
-        def previous_date_matches(
-            sheet: GoogleSheets, index: int, transaction_date: datetime.datetime
-        ):
-            # Read the date from the specified row
-            dates = sheet.read_range(sheet_name_main, f"A{index - 1}:A{index - 1}")
-
-            # Compare the date from the sheet with the transaction_date
-            return dates[0].value == transaction_date.strftime("%d/%m/%Y")
+        # Find the index of the first empty row with a single column read
+        empty_row_index = sheet.find_empty_row(sheet_name_main, "A")
 
-        # Initialize the starting and ending row indices
-        start_row = 1
-        end_row = 100
+        # Index the rows of the latest day in the sheet, scraped transactions older
+        # than that day are already in the sheet
+        last_date = None
+        existing_rows = collections.Counter()
+        for _, values in Moverperfect.__scan_back(
+            sheet, sheet_name_main, "A", "D", empty_row_index - 1
+        ):
+            try:
+                row_date = datetime.datetime.strptime(values[0], "%d/%m/%Y")
+            except ValueError:
+                continue
+            if last_date is None:
+                last_date = row_date
+            if row_date < last_date:
+                break
+            existing_rows[Moverperfect.__nutmeg_key(*values)] += 1
 
-        # Find the index of the first empty row within the initial range
-        empty_row_index = Moverperfect.__find_empty_row(
-            sheet, sheet_name_main, start_row, end_row, "A"
-        )
+        # Collect the transactions in ascending order that are not in the sheet yet
+        new_rows = []
+        for transaction in reversed(nutmeg_data["transactions"]):
+            if last_date is not None and transaction["date"] < last_date:
+                continue
 
-        # Keep searching for an empty row in the next 100-row blocks until one is found
-        while empty_row_index is None:
-            start_row += 100
-            end_row += 100
-            empty_row_index = Moverperfect.__find_empty_row(
-                sheet, sheet_name_main, start_row, end_row, "A"
+            key = Moverperfect.__nutmeg_key(
+                transaction["date"].strftime("%d/%m/%Y"),
+                transaction["transaction"],
+                transaction["pot"],
+                transaction["amount"],
             )
+            if existing_rows[key] > 0:
+                existing_rows[key] -= 1
+                continue
 
-        # Iterate through the transactions in reversed(ascending) order
-        for i, transaction in enumerate(reversed(nutmeg_data["transactions"])):
-            # If the date of the current transaction matches the date in the sheet
-            if previous_date_matches(sheet, empty_row_index, transaction["date"]):
-                # Iterate through the transactions in reversed(asc) order inserting them
-                for previous_transaction in reversed(
-                    nutmeg_data["transactions"][: len(nutmeg_data["transactions"]) - i]
-                ):
-                    # Skip transaction if it already exists in the sheet
-                    if previous_date_matches(
-                        sheet, empty_row_index, previous_transaction["date"]
-                    ):
-                        continue
-
-                    # Write the transaction data to the sheet
-                    sheet.write_range(
-                        sheet_name_main,
-                        f"A{empty_row_index}:F{empty_row_index}",
-                        [
-                            previous_transaction["date"].strftime("%d/%m/%Y"),
-                            previous_transaction["transaction"],
-                            previous_transaction["pot"],
-                            previous_transaction["amount"],
-                            "",
-                            f"=F{empty_row_index - 1}+D{empty_row_index}",
-                        ],
-                    )
-                    # Move to the next row
-                    empty_row_index += 1
-                break
-
-        # Initialize the starting and ending row indices
-        start_row = 1
-        end_row = 100
-
-        # Find the index of the first empty row within the initial range
-        empty_row_index = Moverperfect.__find_empty_row(
-            sheet, sheet_name_monthly, start_row, end_row, "H"
-        )
+            row_index = empty_row_index + len(new_rows)
+            new_rows.append(
+                [
+                    transaction["date"].strftime("%d/%m/%Y"),
+                    transaction["transaction"],
+                    transaction["pot"],
+                    transaction["amount"],
+                    "",
+                    f"=F{row_index - 1}+D{row_index}",
+                ]
+            )
 
-        # Keep searching for an empty row in the next 100-row blocks until one is found
-        while empty_row_index is None:
-            start_row += 100
-            end_row += 100
-            empty_row_index = Moverperfect.__find_empty_row(
-                sheet, sheet_name_monthly, start_row, end_row, "H"
+        # Write all of the new transactions in one go
+        if new_rows:
+            sheet.write_range(
+                sheet_name_main,
+                f"A{empty_row_index}:F{empty_row_index + len(new_rows) - 1}",
+                [value for row in new_rows for value in row],
             )
 
+        # Find the index of the first empty row with a single column read
+        empty_row_index = sheet.find_empty_row(sheet_name_monthly, "H")
+
         # Write latest data
         sheet.write_range(
             sheet_name_monthly,
@@ -189,31 +383,31 @@ class Moverperfect:
                 f"*H{index}+J{index})"
             )
 
-        # Initialize the starting and ending row indices
-        start_row = 1
-        end_row = 100
+        # Find the index of the first empty row with a single column read
+        empty_row_index = sheet.find_empty_row(sheet_name, "A")
 
-        # Find the index of the first empty row within the initial range
-        empty_row_index = Moverperfect.__find_empty_row(
-            sheet, sheet_name, start_row, end_row, "A"
-        )
+        # Scan back once over columns A:C to find the date of the last transaction
+        # and the last valuation row (the latest row with an empty column C)
+        last_transaction_date = None
+        last_transaction_index = None
+        for search_row, values in Moverperfect.__scan_back(
+            sheet, sheet_name, "A", "C", empty_row_index
+        ):
+            if last_transaction_date is None and values[2] != "":
+                last_transaction_date = values[0]
+            if (
+                last_transaction_index is None
+                and search_row < empty_row_index
+                and values[2] == ""
+            ):
+                last_transaction_index = search_row
+            if last_transaction_date is not None and last_transaction_index is not None:
+                break
 
-        # Keep searching for an empty row in the next 100-row blocks until one is found
-        while empty_row_index is None:
-            start_row += 100
-            end_row += 100
-            empty_row_index = Moverperfect.__find_empty_row(
-                sheet, sheet_name, start_row, end_row, "A"
-            )
-
-        last_transaction_date = next(
-            (
-                sheet.read_cell(sheet_name, f"A{search_row}")
-                for search_row in range(empty_row_index, 1, -1)
-                if sheet.read_cell(sheet_name, f"C{search_row}") is not None
-            ),
-            "01/01/1970",
-        )
+        if last_transaction_date is None:
+            last_transaction_date = "01/01/1970"
+        if last_transaction_index is None:
+            last_transaction_index = 0
 
         relevant_transactions = [
             transaction
@@ -221,8 +415,8 @@ class Moverperfect:
             if transaction[1] == "You bought"
         ]
 
-        for last_transaction_index in range(len(relevant_transactions) - 1, -1, -2):
-            transaction = relevant_transactions[last_transaction_index]
+        for transaction_index in range(len(relevant_transactions) - 1, -1, -2):
+            transaction = relevant_transactions[transaction_index]
             if (
                 Moverperfect.__compare_date_1_greater_2(
                     last_transaction_date, format_date(transaction[0])
@@ -233,13 +427,6 @@ class Moverperfect:
             insert_shareworks_transaction(transaction, empty_row_index)
             empty_row_index = empty_row_index + 1
 
-        last_transaction_index = 0
-        # Iterate through rows in reverse to find the first non-empty cell in column C
-        for i in range(empty_row_index - 1, 1, -1):
-            if sheet.read_cell(sheet_name, f"C{i}") is None:
-                last_transaction_index = i
-                break
-
         sheet.write_range(
             sheet_name,
             f"A{empty_row_index}:M{empty_row_index}",
@@ -302,28 +489,17 @@ class Moverperfect:
 
         sheet_name = "Pension"
 
-        # Initialize the starting and ending row indices
-        start_row = 1
-        end_row = 100
-
-        # Find the index of the first empty row within the initial range
-        empty_row_index = Moverperfect.__find_empty_row(
-            sheet, sheet_name, start_row, end_row, "A"
-        )
-
-        # Keep searching for an empty row in the next 100-row blocks until one is found
-        while empty_row_index is None:
-            start_row += 100
-            end_row += 100
-            empty_row_index = Moverperfect.__find_empty_row(
-                sheet, sheet_name, start_row, end_row, "A"
-            )
+        # Find the index of the first empty row with a single column read
+        empty_row_index = sheet.find_empty_row(sheet_name, "A")
 
+        # Scan back over columns A:B to find the date of the last transaction
         last_transaction_date = next(
             (
-                sheet.read_cell(sheet_name, f"A{search_row}")
-                for search_row in range(empty_row_index, 1, -1)
-                if sheet.read_cell(sheet_name, f"B{search_row}") is not None
+                values[0]
+                for _, values in Moverperfect.__scan_back(
+                    sheet, sheet_name, "A", "B", empty_row_index
+                )
+                if values[1] != ""
             ),
             "01/01/1970",
         )
@@ -381,9 +557,11 @@ class Moverperfect:
                     transaction["tradeDate"],
                     transaction["settleDate"],
                     transaction["reference"],
-                    "Cash"
-                    if transaction["unitCost"] == "n/a"
-                    else transaction["description"],
+                    (
+                        "Cash"
+                        if transaction["unitCost"] == "n/a"
+                        else transaction["description"]
+                    ),
                     transaction["unitCost"],
                     transaction["quantity"],
                     transaction["value"],
@@ -392,22 +570,8 @@ class Moverperfect:
 
         tran_sheet_name = "Transactions"
 
-        # Initialize the starting and ending row indices
-        start_row = 1
-        end_row = 100
-
-        # Find the index of the first empty row within the initial range
-        empty_row_index = Moverperfect.__find_empty_row(
-            sheet, tran_sheet_name, start_row, end_row, "A"
-        )
-
-        # Keep searching for an empty row in the next 100-row blocks until one is found
-        while empty_row_index is None:
-            start_row += 100
-            end_row += 100
-            empty_row_index = Moverperfect.__find_empty_row(
-                sheet, tran_sheet_name, start_row, end_row, "A"
-            )
+        # Find the index of the first empty row with a single column read
+        empty_row_index = sheet.find_empty_row(tran_sheet_name, "A")
 
         last_transaction_date = sheet.read_cell(
             tran_sheet_name, f"A{empty_row_index - 1}"
@@ -438,6 +602,9 @@ class Moverperfect:
 
         sheet.write_range("Fund Reference", "D3:D10", prices)
 
+        # Send the queued writes so the rebalancer total reflects the new prices
+        sheet.flush()
+
         value_from_sheet = sheet.read_cell("Rebalancer", "D17")
 
         if value_from_sheet != hargreaves_data[0]["value"]:
@@ -447,28 +614,134 @@ class Moverperfect:
             )
 
     @staticmethod
-    def __find_empty_row(
-        sheet: GoogleSheets, worksheet: str, start_row: int, end_row: int, column: str
-    ) -> int | None:
+    def __scan_back(
+        sheet: GoogleSheets,
+        worksheet: str,
+        first_column: str,
+        last_column: str,
+        from_row: int,
+    ):
         """
-        Find the first empty row within a specified range in a Google Sheet.
+        Yield the rows of a worksheet from from_row back up to row 2.
+
+        Rows are fetched LOOKBACK_ROWS at a time with one read per block, so a scan
+        that stops near from_row costs a single read however long the sheet is.
+        Cells a read does not return, such as the rows below the end of a
+        prefetched snapshot, are blank.
 
         :param sheet: The Google Sheet instance.
-        :param worksheet: The name of the worksheet to search.
-        :param start_row: The starting row index to search.
-        :param end_row: The ending row index to search.
-        :param column: The column letter to search for an empty row.
-        :return: The index of the first empty row, or None if no empty row is found.
+        :param worksheet: The name of the worksheet to scan.
+        :param first_column: The first column letter of each row to return.
+        :param last_column: The last column letter of each row to return.
+        :param from_row: The row index to start scanning back from.
+        :return: A generator of (row index, list of cell values) tuples.
+        """
+
+        columns = range(
+            gspread.utils.a1_to_rowcol(f"{first_column}1")[1],
+            gspread.utils.a1_to_rowcol(f"{last_column}1")[1] + 1,
+        )
+
+        end_row = from_row
+        while end_row > 1:
+            start_row = max(2, end_row - LOOKBACK_ROWS + 1)
+
+            # Read the whole block of rows in one request, placing each cell by its
+            # own row and column as the read may return fewer rows than asked for
+            values = {
+                (cell.row, cell.col): cell.value
+                for cell in sheet.read_range(
+                    worksheet, f"{first_column}{start_row}:{last_column}{end_row}"
+                )
+            }
+
+            # Walk the block from the bottom up
+            for row in range(end_row, start_row - 1, -1):
+                yield row, [values.get((row, col), "") for col in columns]
+
+            end_row = start_row - 1
+
+    @staticmethod
+    def __advance_watermarks(
+        watermarks, nutmeg_data, shareworks_data, standard_life_data, hargreaves_data
+    ):
+        """
+        Advance each provider's watermark to the latest transaction it synced.
+
+        A provider whose scrape failed has no transactions, so its watermark is
+        left where it was.
+
+        :param watermarks: The WatermarkStore to advance.
+        :param nutmeg_data: Data from the Nutmeg platform.
+        :param shareworks_data: Data from the Shareworks platform.
+        :param standard_life_data: Data from the Standard Life platform.
+        :param hargreaves_data: Data from the Hargreaves Lansdown platform.
+        """
+
+        def latest(dates):
+            """Return the latest of the dates that parse, or None"""
+            parsed = []
+            for date, date_format in dates:
+                try:
+                    parsed.append(
+                        date
+                        if isinstance(date, datetime.datetime)
+                        else datetime.datetime.strptime(date, date_format)
+                    )
+                except (TypeError, ValueError):
+                    continue
+            return max(parsed, default=None)
+
+        def rows(data, key):
+            """Return the transactions of a provider, or none if its scrape failed"""
+            return data[key] if isinstance(data, dict) and data[key] else []
+
+        latest_dates = {
+            ("nutmeg", DEFAULT_ACCOUNT): latest(
+                (transaction["date"], None)
+                for transaction in rows(nutmeg_data, "transactions")
+            ),
+            ("shareworks", DEFAULT_ACCOUNT): latest(
+                (transaction[0], "%d-%b-%Y")
+                for transaction in rows(shareworks_data, "transactionData")
+                if transaction
+            ),
+            ("standardLife", DEFAULT_ACCOUNT): latest(
+                (transaction[1], "%d/%m/%Y")
+                for transaction in rows(standard_life_data, "transactionData")
+                if len(transaction) > 1
+            ),
+        }
+        for account_data in hargreaves_data or []:
+            if "account" in account_data:
+                latest_dates[("hargreaves", account_data["account"])] = latest(
+                    (transaction["tradeDate"], "%d/%m/%Y")
+                    for transaction in account_data["transactions"]
+                )
+
+        for (provider, account), date in latest_dates.items():
+            if date is not None:
+                watermarks.advance(provider, date, account)
+
+    @staticmethod
+    def __nutmeg_key(date: str, transaction: str, pot: str, amount: str) -> tuple:
+        """
+        Build the key used to match a Nutmeg transaction against a sheet row.
+
+        :param date: The transaction date in the format "%d/%m/%Y".
+        :param transaction: The transaction type.
+        :param pot: The name of the pot.
+        :param amount: The amount, with or without currency formatting.
+        :return: A tuple of the normalised date, transaction, pot and amount.
         """
 
-        # Read the specified range of rows from the sheet
-        dates = sheet.read_range(worksheet, f"{column}{start_row}:{column}{end_row}")
+        amount = str(amount).replace("£", "").replace(",", "").replace("+", "")
+        try:
+            amount = round(float(amount), 2)
+        except ValueError:
+            amount = amount.strip()
 
-        # Iterate through the rows and find the first empty one
-        for index, date in enumerate(dates):
-            if date.value == "":
-                return index + start_row
-        return None
+        return date, str(transaction).strip(), str(pot).strip(), amount
 
     @staticmethod
     def __compare_date_1_greater_2(date_1: str, date_2: str) -> bool:
@@ -1,5 +1,5 @@
+from datetime import datetime
 import logging
-import time
 from typing import Any
 
 from selenium.webdriver.common.by import By
@@ -7,10 +7,67 @@ from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
+from scrapers.parsers import (
+    HARGREAVES_ACCOUNT_TOTAL,
+    HARGREAVES_HOLDINGS_COLUMNS,
+    HARGREAVES_HOLDINGS_ROWS,
+    HARGREAVES_TRANSACTION_COLUMNS,
+    HARGREAVES_TRANSACTION_ROWS,
+    parse_hargreaves_summary,
+)
+from utils.fastpath import fetch_all, session_from_driver
+from utils.fixtures import record_page
+from utils.sessions import log_in
+from utils.waits import NetworkIdle, RowCountStable, wait_for
+
+ACCOUNT_SUMMARY_URL = "https://online.hl.co.uk/my-accounts/account_summary/account/"
+
+# The breadcrumb shown on every page once logged in
+LOGGED_IN_BREADCRUMB = '//*[@id="breadcrumbs"]/div[1]/strong[1]'
+
+# Reads every row matching an XPath in the browser and returns, for each row, the
+# text of the cells at the given row-relative XPaths. The text is normalised the
+# way WebElement.text is, and a missing cell fails like find_element would
+_EXTRACT_TABLE = """
+const [rowsXPath, columns] = arguments;
+const rows = document.evaluate(
+    rowsXPath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+);
+const data = [];
+for (let i = 0; i < rows.snapshotLength; i++) {
+    const rowData = {};
+    for (const [key, xpath] of Object.entries(columns)) {
+        const cell = document.evaluate(
+            xpath, rows.snapshotItem(i), null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue;
+        if (cell === null) {
+            throw new Error("No cell at " + xpath + " in row " + (i + 1));
+        }
+        rowData[key] = cell.innerText
+            .replace(/[ \\t\\u00a0]+/g, " ")
+            .split("\\n").map((line) => line.trim()).join("\\n")
+            .trim();
+    }
+    data.push(rowData);
+}
+return data;
+"""
+
+
+def extract_table(driver: WebDriver, rows_xpath: str, columns: dict) -> list:
+    """Return the text of the given cells of every row of a table as a list of
+    dictionaries, read in a single WebDriver round trip"""
+    return driver.execute_script(_EXTRACT_TABLE, rows_xpath, columns)
+
 
 class Hargreaves:
     """A class for scraping data from the Hargreaves Lansdown website"""
 
+    # The login details and each option are kept as attributes like the other
+    # scrapers do
+    # pylint: disable=too-many-instance-attributes
+
     def __init__(
         self,
         username: str,
@@ -18,6 +75,10 @@ class Hargreaves:
         password: str,
         secure_number: str,
         accounts: list,
+        *,
+        sessions=None,
+        fast_path=False,
+        watermarks=None,
     ):
         """Initialize the instance variables for the class methods"""
         self.username = username
@@ -25,24 +86,39 @@ class Hargreaves:
         self.password = password
         self.secure_number = secure_number
         self.accounts = accounts
+        self.sessions = sessions
+        self.fast_path = fast_path
+        self.watermarks = watermarks
 
-    def scrape_data(self, driver) -> list[dict[str, str]]:
-        """Scrape transaction and portfolio data from the Hargreaves Lansdown website"""
+    def scrape_data(self, driver) -> list[dict[str, str]] | None:
+        """Scrape transaction and portfolio data from the Hargreaves Lansdown website,
+        or return None if the scrape fails"""
         try:
-            # Log into the website
-            self.__login(driver)
+            # Log into the website, unless the saved session is still valid
+            log_in(
+                driver,
+                self.sessions,
+                "hargreaves",
+                (By.XPATH, LOGGED_IN_BREADCRUMB),
+                lambda: self.__login(driver),
+            )
+
+            # With the fast path, fetch every account summary over HTTP at once
+            summaries = self.__fetch_summaries(driver) if self.fast_path else {}
 
             accounts_data = []
 
             # For each defined account, check holdings and transactions
             for account in self.accounts:
-                accounts_data.append(self.__check_account(driver, account))
+                accounts_data.append(
+                    self.__check_account(driver, account, summaries.get(account))
+                )
 
             # Return the data as a dictionary
             return accounts_data
         except Exception as exception:
             logging.error(exception)
-            return []
+            return None
 
     def __login(self, driver: WebDriver):
         """Log into the website on the driver"""
@@ -106,76 +182,95 @@ class Hargreaves:
         ).click()
 
         # Wait until user log in is complete
-        wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, '//*[@id="breadcrumbs"]/div[1]/strong[1]')
-            )
-        )
-
-    def __check_account(self, driver: WebDriver, account_number: str) -> dict[str, Any]:
-        """Check the account number and return value, stocks, and transactions"""
-        account_data = {"value": 0, "stocks": [], "transactions": []}
+        wait.until(EC.element_to_be_clickable((By.XPATH, LOGGED_IN_BREADCRUMB)))
+
+    def __fetch_summaries(self, driver: WebDriver) -> dict[str, dict]:
+        """Fetch the account summary pages over HTTP with the driver's session and
+        return the parsed summaries keyed by account. Accounts whose page could not
+        be fetched or parsed are left out, to be read in the browser"""
+        session = session_from_driver(driver)
+        urls = {
+            account: ACCOUNT_SUMMARY_URL + str(account) for account in self.accounts
+        }
+        pages = fetch_all(session, list(urls.values()))
+
+        summaries = {}
+        for account, url in urls.items():
+            if not pages[url] or not pages[url].strip():
+                continue
+
+            # A page that does not parse is left to the browser like a missing one
+            try:
+                summary = parse_hargreaves_summary(pages[url])
+            except ValueError as exception:
+                logging.warning(
+                    "Could not parse the summary of account %s: %s", account, exception
+                )
+                continue
+            if summary is not None:
+                summaries[account] = summary
+        return summaries
+
+    def __check_account(
+        self, driver: WebDriver, account_number: str, summary=None
+    ) -> dict[str, Any]:
+        """Check the account number and return value, stocks, and transactions.
+        The value and stocks are taken from the summary when one was fetched"""
+        account_data = {
+            "account": account_number,
+            "value": 0,
+            "stocks": [],
+            "transactions": [],
+        }
 
         wait = WebDriverWait(driver, 20)
 
-        # Navigate to the account summary page for the account_number
-        driver.get(
-            "https://online.hl.co.uk/my-accounts/account_summary/account/"
-            + str(account_number)
-        )
+        if summary is not None:
+            account_data.update(summary)
+        else:
+            # Navigate to the account summary page for the account_number
+            driver.get(ACCOUNT_SUMMARY_URL + str(account_number))
 
-        # Grab the account value
-        account_data["value"] = wait.until(
-            EC.element_to_be_clickable((By.XPATH, '//*[@id="account_total_header"]'))
-        ).text
+            # Grab the account value
+            account_data["value"] = wait.until(
+                EC.element_to_be_clickable((By.XPATH, HARGREAVES_ACCOUNT_TOTAL))
+            ).text
 
-        time.sleep(1)
+            # Wait for the holdings table to fill in, an account summary lists at
+            # least one holding so an empty table has not rendered yet
+            wait_for(
+                driver,
+                "hargreaves holdings table",
+                RowCountStable((By.XPATH, HARGREAVES_HOLDINGS_ROWS)),
+            )
 
-        # Grab the stocks in the account
-        account_data["stocks"] = self.__get_stock_data(driver)
+            # Grab the stocks in the account
+            account_data["stocks"] = self.__get_stock_data(driver)
+            record_page(driver, "hargreaves", f"summary_{account_number}")
 
-        # Grab the transactions in the account
-        account_data["transactions"] = self.__get_transaction_data(
-            driver, wait, account_number
+        # Grab the transactions in the account, leaving out those before the last
+        # synced transaction
+        since = (
+            self.watermarks.get("hargreaves", account_number)
+            if self.watermarks
+            else None
         )
+        account_data["transactions"] = [
+            transaction
+            for transaction in self.__get_transaction_data(driver, wait, account_number)
+            if since is None
+            or datetime.strptime(transaction["tradeDate"], "%d/%m/%Y") >= since
+        ]
 
         return account_data
 
     def __get_stock_data(self, driver: WebDriver) -> list:
         """Return the stock data from the account summary page
         Account summary page must be opened prior to function call"""
-        stocks_data = []
-
-        # Grab the rows of stocks
-        stocks = driver.find_elements(By.XPATH, '//*[@id="holdings-table"]/tbody/tr')
-
-        # For each stock, grab name, units, price, value, and cost
-        for x in range(0, len(stocks)):
-            stock_data = {}
-            const_table_row = '//*[@id="holdings-table"]/tbody/tr['
-            stock_data["stock"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[1]/div/a/span",
-            ).text
-            stock_data["units"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[2]/span",
-            ).text
-            stock_data["price(p)"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[3]/span",
-            ).text
-            stock_data["value"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[4]/span/span",
-            ).text
-            stock_data["cost"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[5]/span",
-            ).text
-            stocks_data.append(stock_data)
-
-        return stocks_data
+        # Grab the name, units, price, value, and cost of each stock in one call
+        return extract_table(
+            driver, HARGREAVES_HOLDINGS_ROWS, HARGREAVES_HOLDINGS_COLUMNS
+        )
 
     def __get_transaction_data(
         self, driver: WebDriver, wait: WebDriverWait, account_number: str
@@ -195,47 +290,15 @@ class Hargreaves:
         ).click()
 
         # Ensure that transactions show after radio button click
-        time.sleep(3)
-
-        # Grab all of the transactions on the page
-        transactions = driver.find_elements(
-            By.XPATH, '//*[@id="content-body-full"]/table/tbody/tr'
+        wait_for(driver, "hargreaves 90 day transactions", NetworkIdle())
+        wait_for(
+            driver,
+            "hargreaves transactions table",
+            RowCountStable((By.XPATH, HARGREAVES_TRANSACTION_ROWS), 0),
         )
 
-        transactions_data = []
-
-        # For each transaction, grab the relevent transaction data
-        for x in range(0, len(transactions)):
-            transaction_data = {}
-            const_table_row = '//*[@id="content-body-full"]/table/tbody/tr['
-            transaction_data["tradeDate"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[1]",
-            ).text
-            transaction_data["settleDate"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[2]",
-            ).text
-            transaction_data["reference"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[3]",
-            ).text
-            transaction_data["description"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[4]",
-            ).text
-            transaction_data["unitCost"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[5]",
-            ).text
-            transaction_data["quantity"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[6]",
-            ).text
-            transaction_data["value"] = driver.find_element(
-                By.XPATH,
-                const_table_row + str(x + 1) + "]/td[7]",
-            ).text
-            transactions_data.append(transaction_data)
-
-        return transactions_data
+        # Grab the relevent data of every transaction on the page in one call
+        record_page(driver, "hargreaves", f"transactions_{account_number}")
+        return extract_table(
+            driver, HARGREAVES_TRANSACTION_ROWS, HARGREAVES_TRANSACTION_COLUMNS
+        )
@@ -1,33 +1,54 @@
-from datetime import datetime
 import logging
-import time
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
+from scrapers.parsers import parse_nutmeg_transactions, parse_nutmeg_transactions_json
+from utils.capture import parse_captured
+from utils.fixtures import record_page
+from utils.sessions import log_in
+from utils.waits import document_ready, wait_for
+
+TRANSACTION_HISTORY_URL = "https://dashboard.nutmeg.com/transaction-history/general"
+
+# URL pattern of the JSON responses behind the transaction history page
+TRANSACTIONS_JSON = r"(?i)transaction"
+
 
 class Nutmeg:
     """A class for scraping data from the Nutmeg website"""
 
-    def __init__(self, email, passwd):
+    def __init__(self, email, passwd, sessions=None, capture=False, watermarks=None):
         """Initialize the instance variables for the class methods"""
         self.email = email
         self.passwd = passwd
+        self.sessions = sessions
+        self.capture = capture
+        self.watermarks = watermarks
 
     def scrape_data(self, driver: WebDriver):
-        """Scrape transaction and portfolio data from the Nutmeg website"""
+        """Scrape transaction and portfolio data from the Nutmeg website, or return
+        None if the scrape fails"""
         try:
             wait = WebDriverWait(driver, 20)
 
             output = {}
 
-            # Log into the website
-            self.__login(driver, wait)
+            # Log into the website, unless the saved session is still valid
+            log_in(
+                driver,
+                self.sessions,
+                "nutmeg",
+                (By.CSS_SELECTOR, "table"),
+                lambda: self.__login(driver, wait),
+                probe_url=TRANSACTION_HISTORY_URL,
+            )
 
-            # Grab Transaction History
-            output["transactions"] = self.__get_transaction_data(driver, wait)
+            # Grab Transaction History, back to the last synced transaction if known
+            since = self.watermarks.get("nutmeg") if self.watermarks else None
+            output["transactions"] = self.__get_transaction_data(driver, wait, since)
 
             # Grab portfolio data
             output.update(self.__get_portfolio_data(driver, wait))
@@ -37,11 +58,7 @@ class Nutmeg:
 
         except Exception as exception:
             logging.error(exception)
-            return {
-                "transactions": [],
-                "netContributions": 0,
-                "currentValue": 0,
-            }
+            return None
 
     def __login(self, driver: WebDriver, wait: WebDriverWait):
         """
@@ -73,67 +90,45 @@ class Nutmeg:
         )
         submit.click()
 
-        time.sleep(5)
+        # Wait until the login has redirected away from the authentication page
+        wait_for(
+            driver,
+            "nutmeg login redirect",
+            lambda d: "authentication.nutmeg.com" not in d.current_url
+            and document_ready(d),
+        )
 
-    def __get_transaction_data(self, driver: WebDriver, wait: WebDriverWait):
+    def __get_transaction_data(
+        self, driver: WebDriver, wait: WebDriverWait, since=None
+    ):
         """
         Retrieve transaction data from the Nutmeg dashboard transaction history page.
 
         :param driver: WebDriver instance for web scraping.
         :param wait: WebDriverWait instance for waiting for elements to load.
+        :param since: The date of the last synced transaction, older ones are skipped.
         :return: List of dictionaries containing transaction data.
         """
         # Navigate to the transaction history page
-        driver.get("https://dashboard.nutmeg.com/transaction-history/general")
+        driver.get(TRANSACTION_HISTORY_URL)
+
+        # In capture mode, read the transactions from the JSON the page fetches
+        if self.capture:
+            transactions_data = parse_captured(
+                driver,
+                "nutmeg transactions json",
+                TRANSACTIONS_JSON,
+                lambda payloads: parse_nutmeg_transactions_json(payloads, since),
+            )
+            if transactions_data is not None:
+                return transactions_data
 
         # Wait for the table to load
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table")))
 
-        # Initialize list to store transaction data
-        transactions_data = []
-
-        # Find all table elements and header elements on the page
-        tables = driver.find_elements(By.CSS_SELECTOR, "table")
-        headers = driver.find_elements(
-            By.XPATH,
-            '//*[@id="root"]/section/section[2]/div/div/div/div/section/div/section[2]'
-            + "/section/section/h1/span",
-        )
-
-        # Iterate over each table and its corresponding header
-        for index, table in enumerate(tables):
-            # Find all transaction rows within the table
-            transactions = table.find_elements(By.CSS_SELECTOR, "tbody tr")
-
-            # Parse and format the month from the header text
-            month_parts = headers[index].text.split()
-            month_parts[0] = month_parts[0][:3]
-            month = datetime.strptime(" ".join(month_parts), "%b %Y")
-
-            # Iterate over each transaction row
-            for transaction in transactions:
-                transaction_data = {}
-                transaction_cells = transaction.find_elements(By.CSS_SELECTOR, "td")
-
-                # Extract and format the day, transaction type, pot, and amount from
-                # the transaction cells
-                day = int(transaction_cells[0].text.split()[1])
-                transaction_data["date"] = datetime(month.year, month.month, day)
-                transaction_data["transaction"] = transaction_cells[1].text
-                transaction_data["pot"] = transaction_cells[2].text
-
-                # Filter out unwanted transaction data
-                if transaction_data["pot"] == "Unallocated Cash":
-                    continue
-
-                # Remove unnecessary characters from the amount string and add the
-                # amount to the transaction data
-                transaction_data["amount"] = (
-                    transaction_cells[3].text.replace("+", "").replace("£", "")
-                )
-                transactions_data.append(transaction_data)
-
-        return transactions_data
+        # Parse the transaction tables from the page source in one go
+        record_page(driver, "nutmeg", "transactions")
+        return parse_nutmeg_transactions(driver.page_source, since)
 
     def __get_portfolio_data(self, driver: WebDriver, wait: WebDriverWait):
         """
@@ -161,6 +156,7 @@ class Nutmeg:
         current_value = wait.until(
             EC.presence_of_element_located((By.XPATH, current_value_xpath))
         ).text
+        record_page(driver, "nutmeg", "portfolio")
 
         # Return the portfolio data as a dictionary
         return {
@@ -0,0 +1,471 @@
+import re
+from datetime import datetime
+
+from lxml import html
+
+# Elements rendered on their own line, so their text is separated by newlines
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "tr",
+    "ul",
+}
+
+# Elements whose content is never rendered as text
+SKIPPED_TAGS = {"head", "noscript", "script", "style", "template"}
+
+NUTMEG_MONTH_HEADERS = (
+    '//*[@id="root"]/section/section[2]/div/div/div/div/section/div/section[2]'
+    + "/section/section/h1/span"
+)
+
+STANDARD_LIFE_ROWS = (
+    '//*[@id="tab-transaction"]/tcs-transaction-tab'
+    + "/div[2]/tcs-transaction-history/div[3]"
+    + "/table/tbody/tr"
+)
+
+SHAREWORKS_ROWS = '//*[@id="Activity_table"]/tbody/tr'
+
+HARGREAVES_ACCOUNT_TOTAL = '//*[@id="account_total_header"]'
+
+HARGREAVES_HOLDINGS_ROWS = '//*[@id="holdings-table"]/tbody/tr'
+
+# The row-relative XPath of each holding field on the account summary page
+HARGREAVES_HOLDINGS_COLUMNS = {
+    "stock": "td[1]/div/a/span",
+    "units": "td[2]/span",
+    "price(p)": "td[3]/span",
+    "value": "td[4]/span/span",
+    "cost": "td[5]/span",
+}
+
+HARGREAVES_TRANSACTION_ROWS = '//*[@id="content-body-full"]/table/tbody/tr'
+
+# The row-relative XPath of each field on the capital transaction history page
+HARGREAVES_TRANSACTION_COLUMNS = {
+    "tradeDate": "td[1]",
+    "settleDate": "td[2]",
+    "reference": "td[3]",
+    "description": "td[4]",
+    "unitCost": "td[5]",
+    "quantity": "td[6]",
+    "value": "td[7]",
+}
+
+
+def parse_document(source: str):
+    """Parse a page source (or an element's outerHTML) into an lxml tree"""
+    return html.fromstring(source)
+
+
+def element_text(element) -> str:
+    """Return an element's text the way WebElement.text renders it: whitespace
+    collapsed, one line per block element and hidden content left out"""
+    pieces = []
+    _collect_text(element, pieces)
+
+    # Source whitespace is already collapsed, so only the line ends need trimming
+    lines = (line.strip() for line in "".join(pieces).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _collect_text(element, pieces):
+    """Append the rendered text of an element and its descendants to pieces"""
+    # Comments, non-rendered and hidden elements contribute only their tail
+    if (
+        not isinstance(element.tag, str)
+        or element.tag in SKIPPED_TAGS
+        or _is_hidden(element)
+    ):
+        pieces.append(_collapse(element.tail))
+        return
+
+    block = element.tag in BLOCK_TAGS
+    if block:
+        pieces.append("\n")
+    if element.tag == "br":
+        pieces.append("\n")
+
+    pieces.append(_collapse(element.text))
+    for child in element:
+        _collect_text(child, pieces)
+
+    if block:
+        pieces.append("\n")
+    pieces.append(_collapse(element.tail))
+
+
+def _collapse(text) -> str:
+    """Collapse the source whitespace of a text node the way a browser does"""
+    return re.sub(r"\s+", " ", text or "")
+
+
+def _is_hidden(element) -> bool:
+    """Return True if an element is hidden by its own attributes"""
+    style = element.get("style", "").replace(" ", "").lower()
+    return element.get("hidden") is not None or "display:none" in style
+
+
+def accessible_name(element) -> str:
+    """Approximate an element's accessible name from its labelling attributes and
+    those of its descendants"""
+    for candidate in element.iter():
+        if not isinstance(candidate.tag, str):
+            continue
+        for attribute in ("aria-label", "alt", "title"):
+            value = candidate.get(attribute, "").strip()
+            if value:
+                return value
+    return ""
+
+
+def parse_table(document, rows_xpath: str, columns: dict) -> list:
+    """Return the text of the given cells of every row of a table as a list of
+    dictionaries, like the scrapers' in-browser extract_table"""
+    data = []
+    for index, row in enumerate(document.xpath(rows_xpath)):
+        row_data = {}
+        for key, xpath in columns.items():
+            cells = row.xpath(xpath)
+            if not cells:
+                raise ValueError(f"No cell at {xpath} in row {index + 1}")
+            row_data[key] = element_text(cells[0])
+        data.append(row_data)
+    return data
+
+
+def parse_hargreaves_summary(source: str):
+    """Parse the account value and holdings from a Hargreaves account summary page
+    source, or return None if the page does not show an account summary with a
+    total and at least one holding"""
+    document = parse_document(source)
+
+    totals = document.xpath(HARGREAVES_ACCOUNT_TOTAL)
+    if not totals or not document.xpath('//*[@id="holdings-table"]'):
+        return None
+
+    value = element_text(totals[0])
+    stocks = parse_table(
+        document, HARGREAVES_HOLDINGS_ROWS, HARGREAVES_HOLDINGS_COLUMNS
+    )
+    if not value or not stocks:
+        return None
+
+    return {"value": value, "stocks": stocks}
+
+
+def parse_nutmeg_transactions(source: str, since=None) -> list:
+    """Parse the transactions from the Nutmeg transaction history page source. The
+    months are listed newest first, so parsing stops at the first month before
+    since, and transactions before since are left out"""
+    document = parse_document(source)
+
+    # Find all table elements and header elements on the page
+    tables = document.xpath("//table")
+    headers = document.xpath(NUTMEG_MONTH_HEADERS)
+
+    transactions_data = []
+
+    # Iterate over each table and its corresponding header
+    for index, table in enumerate(tables):
+        # Parse and format the month from the header text
+        month_parts = element_text(headers[index]).split()
+        month_parts[0] = month_parts[0][:3]
+        month = datetime.strptime(" ".join(month_parts), "%b %Y")
+
+        # The remaining months have all been synced already
+        if since is not None and (month.year, month.month) < (since.year, since.month):
+            break
+
+        # Iterate over each transaction row
+        for transaction in table.xpath(".//tbody//tr"):
+            transaction_data = {}
+            transaction_cells = [
+                element_text(cell) for cell in transaction.xpath(".//td")
+            ]
+
+            # Extract and format the day, transaction type, pot, and amount
+            day = int(transaction_cells[0].split()[1])
+            transaction_data["date"] = datetime(month.year, month.month, day)
+            transaction_data["transaction"] = transaction_cells[1]
+            transaction_data["pot"] = transaction_cells[2]
+
+            # Filter out unwanted and already synced transaction data
+            if transaction_data["pot"] == "Unallocated Cash":
+                continue
+            if since is not None and transaction_data["date"] < since:
+                continue
+
+            # Remove unnecessary characters from the amount string
+            transaction_data["amount"] = (
+                transaction_cells[3].replace("+", "").replace("£", "")
+            )
+            transactions_data.append(transaction_data)
+
+    return transactions_data
+
+
+def parse_standard_life_transactions(source: str, since=None) -> list:
+    """Parse the rows of the Standard Life activity table page source. Cells with no
+    text are represented by their accessible name, and skipped if they have none.
+    The rows are listed newest first, so parsing stops at the first row before
+    since"""
+    transaction_data = []
+
+    for row in parse_document(source).xpath(STANDARD_LIFE_ROWS):
+        row_data = []
+        for cell in row.xpath(".//td"):
+            text = element_text(cell)
+            if text == "":
+                text = accessible_name(cell)
+            if text == "":
+                continue
+            row_data.append(text)
+
+        if _is_before(row_data, since):
+            break
+        transaction_data.append(row_data)
+
+    return transaction_data
+
+
+def _is_before(row_data: list, since) -> bool:
+    """Return True if a Standard Life row is dated before since. Rows without a
+    readable date are kept"""
+    if since is None or len(row_data) < 2:
+        return False
+    try:
+        return datetime.strptime(row_data[1], "%d/%m/%Y") < since
+    except ValueError:
+        return False
+
+
+def parse_shareworks_transactions(source: str) -> list:
+    """Parse the rows of the Shareworks activity table page source, skipping the
+    three header rows"""
+    rows = parse_document(source).xpath(SHAREWORKS_ROWS)
+    return [[element_text(cell) for cell in row.xpath(".//td")] for row in rows[3:]]
+
+
+# Candidate keys of the fields read from the portals' JSON responses. The
+# responses are undocumented, so each field accepts the names it has been seen
+# under, compared case-insensitively. Generic names such as "type", "value" or
+# "date" are left out, so other lists the pages fetch, such as notifications, are
+# not taken for the records
+NUTMEG_JSON_FIELDS = {
+    "date": ("transactionDate", "valueDate", "effectiveDate"),
+    "transaction": ("transactionType",),
+    "pot": ("potName", "pot", "portfolioName", "goalName"),
+    "amount": ("amount", "netAmount"),
+}
+
+STANDARD_LIFE_TRANSACTION_FIELDS = {
+    "description": ("transactionType", "description"),
+    "date": ("transactionDate", "effectiveDate", "paymentDate"),
+    "amount": ("grossAmount", "paymentAmount", "amount"),
+}
+
+STANDARD_LIFE_SUMMARY_FIELDS = {
+    "totalPayments": ("totalPayments", "totalContributions", "paymentsIn"),
+    "investmentGrowth": ("investmentGrowth", "gainLoss"),
+    "totalValue": ("totalValue", "planValue"),
+}
+
+
+def json_field(record: dict, candidates):
+    """Return the value of the first candidate key present in a JSON object, or
+    None if it has none of them"""
+    keys = {key.lower(): key for key in record}
+    for candidate in candidates:
+        if candidate.lower() in keys:
+            return record[keys[candidate.lower()]]
+    return None
+
+
+def _json_nodes(payload):
+    """Yield every object and list in a JSON payload, outermost first"""
+    pending = [payload]
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, dict):
+            yield node
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            yield node
+            pending.extend(node)
+
+
+def find_json_records(payloads, fields: dict):
+    """Return the first list of objects in the payloads where every object has
+    every field, or None if there is no such list"""
+    for payload in payloads:
+        for node in _json_nodes(payload):
+            if (
+                isinstance(node, list)
+                and node
+                and all(
+                    isinstance(item, dict)
+                    and all(
+                        json_field(item, keys) is not None for keys in fields.values()
+                    )
+                    for item in node
+                )
+            ):
+                return node
+    return None
+
+
+def find_json_object(payloads, fields: dict):
+    """Return the first object in the payloads that has every field, or None if
+    there is no such object"""
+    for payload in payloads:
+        for node in _json_nodes(payload):
+            if isinstance(node, dict) and all(
+                json_field(node, keys) is not None for keys in fields.values()
+            ):
+                return node
+    return None
+
+
+def json_date(value) -> datetime:
+    """Parse a JSON date given as an ISO string, a dd/mm/YYYY string or epoch
+    milliseconds"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000)
+    if "/" in value:
+        return datetime.strptime(value[:10], "%d/%m/%Y")
+    return datetime.strptime(value[:10], "%Y-%m-%d")
+
+
+def json_amount(value) -> float:
+    """Parse a JSON amount given as a number, a formatted string or an object with
+    an amount and a currency"""
+    if isinstance(value, dict):
+        value = json_field(value, ("amount", "value"))
+    if isinstance(value, str):
+        value = value.replace("£", "").replace(",", "").replace("+", "")
+    return float(value)
+
+
+def json_text(value) -> str:
+    """Return a JSON text field, raising ValueError if it is not a string"""
+    if not isinstance(value, str):
+        raise ValueError(f"Expected text, found {value!r}")
+    return value
+
+
+def _pounds(amount: float) -> str:
+    """Format an amount the way the portals display it, such as -£1,234.50"""
+    return ("-" if amount < 0 else "") + f"£{abs(amount):,.2f}"
+
+
+def parse_nutmeg_transactions_json(payloads, since=None):
+    """Parse the transactions from captured Nutmeg JSON responses into the structure
+    parse_nutmeg_transactions returns, or None if the responses are not recognised.
+    Transactions before since are left out"""
+    records = find_json_records(payloads, NUTMEG_JSON_FIELDS)
+    if records is None:
+        return None
+
+    transactions_data = []
+    for record in records:
+        pot = json_field(record, NUTMEG_JSON_FIELDS["pot"])
+        if isinstance(pot, dict):
+            pot = json_field(pot, ("name",))
+
+        # Filter out unwanted transaction data
+        if pot == "Unallocated Cash":
+            continue
+
+        date = json_date(json_field(record, NUTMEG_JSON_FIELDS["date"]))
+        if since is not None and date < since:
+            continue
+
+        amount = json_amount(json_field(record, NUTMEG_JSON_FIELDS["amount"]))
+        transactions_data.append(
+            {
+                "date": datetime(date.year, date.month, date.day),
+                "transaction": json_text(
+                    json_field(record, NUTMEG_JSON_FIELDS["transaction"])
+                ),
+                "pot": json_text(pot),
+                "amount": f"{amount:,.2f}",
+            }
+        )
+
+    # Newest first, the order of the transaction history page
+    transactions_data.sort(key=lambda transaction: transaction["date"], reverse=True)
+    return transactions_data
+
+
+def parse_standard_life_transactions_json(payloads, since=None):
+    """Parse the transactions from captured Standard Life JSON responses into the
+    rows parse_standard_life_transactions returns, or None if the responses are not
+    recognised. Transactions before since are left out"""
+    records = find_json_records(payloads, STANDARD_LIFE_TRANSACTION_FIELDS)
+    if records is None:
+        return None
+
+    transactions = [
+        (
+            json_date(json_field(record, STANDARD_LIFE_TRANSACTION_FIELDS["date"])),
+            json_text(
+                json_field(record, STANDARD_LIFE_TRANSACTION_FIELDS["description"])
+            ),
+            _pounds(
+                json_amount(
+                    json_field(record, STANDARD_LIFE_TRANSACTION_FIELDS["amount"])
+                )
+            ),
+        )
+        for record in records
+    ]
+
+    # Newest first, the order of the activity table
+    transactions.sort(key=lambda transaction: transaction[0], reverse=True)
+    rows = [
+        [description, date.strftime("%d/%m/%Y"), amount]
+        for date, description, amount in transactions
+    ]
+    return [row for row in rows if not _is_before(row, since)]
+
+
+def parse_standard_life_summary_json(payloads):
+    """Parse the plan summary from captured Standard Life JSON responses into the
+    values shown on the summary tab, or None if the responses are not recognised"""
+    summary = find_json_object(payloads, STANDARD_LIFE_SUMMARY_FIELDS)
+    if summary is None:
+        return None
+
+    return {
+        name: _pounds(json_amount(json_field(summary, keys)))
+        for name, keys in STANDARD_LIFE_SUMMARY_FIELDS.items()
+    }
@@ -1,5 +1,6 @@
+import datetime
 import logging
-import time
+import re
 from typing import Any
 
 from selenium.webdriver.common.by import By
@@ -8,25 +9,84 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.wait import WebDriverWait
 
+from scrapers.parsers import parse_shareworks_transactions
+from utils.fixtures import record_page
+from utils.sessions import log_in
+from utils.waits import DomSettled, document_ready, wait_for
+
+# The portfolio value shown on the front page once logged in
+PORTFOLIO_VALUE = '//*[@id="hero-total-portfolio-value"]/span/span[2]'
+
+ALL_HISTORY = "All Available History"
+
+# Days of history requested before the watermark, in case a purchase is shown on
+# the statement a few days after its date
+WATERMARK_MARGIN_DAYS = 7
+
+# Days in each unit of a "Last N <unit>" statement period
+PERIOD_UNIT_DAYS = {"day": 1, "week": 7, "month": 31, "year": 366}
+
+
+def period_days(option: str, today: datetime.date):
+    """Return the number of days of history a statement period option covers, or
+    None if the option is not recognised"""
+    if option == ALL_HISTORY:
+        return float("inf")
+    if option.lower() == "year to date":
+        return (today - datetime.date(today.year, 1, 1)).days
+    match = re.search(r"(\d+)\s*(day|week|month|year)s?", option, re.IGNORECASE)
+    if match:
+        return int(match.group(1)) * PERIOD_UNIT_DAYS[match.group(2).lower()]
+    return None
+
+
+def narrowest_period(options: list, since, today=None) -> str:
+    """Return the shortest statement period option that reaches back to the
+    watermark, or all available history if there is no watermark"""
+    if since is None:
+        return ALL_HISTORY
+
+    today = today or datetime.date.today()
+    needed = (today - since.date()).days + WATERMARK_MARGIN_DAYS
+    covering = [
+        (days, option)
+        for option in options
+        if (days := period_days(option, today)) is not None and days >= needed
+    ]
+    return min(covering)[1] if covering else ALL_HISTORY
+
 
 class ShareWorks:
     """A class for scraping data from the Shareworks website"""
 
-    def __init__(self, host: str, username: str, passwd: str):
+    def __init__(
+        self, host: str, username: str, passwd: str, sessions=None, watermarks=None
+    ):
         """Initialize the instance variables for the class methods"""
         self.host = host
         self.username = username
         self.passwd = passwd
+        self.sessions = sessions
+        self.watermarks = watermarks
 
-    def scrape_data(self, driver) -> dict[str, Any]:
-        """Scrape transaction and portfolio data from the Shareworks website"""
+    def scrape_data(self, driver) -> dict[str, Any] | None:
+        """Scrape transaction and portfolio data from the Shareworks website, or
+        return None if the scrape fails"""
         try:
-            # Set up wait and log in to Shareworks
+            # Set up wait and log in to Shareworks, unless the saved session is
+            # still valid
             wait = WebDriverWait(driver, 60)
-            self.__login(driver, wait)
+            log_in(
+                driver,
+                self.sessions,
+                "shareworks",
+                (By.XPATH, PORTFOLIO_VALUE),
+                lambda: self.__login(driver, wait),
+            )
 
-            # Grab transaction data
-            transaction_data = self.__get_transaction_data(driver, wait)
+            # Grab transaction data, back to the last synced transaction if known
+            since = self.watermarks.get("shareworks") if self.watermarks else None
+            transaction_data = self.__get_transaction_data(driver, wait, since)
 
             # Naviagate to portfolio page and change dropdown to GBP
             self.__prepare_portfolio_page(driver, wait)
@@ -35,6 +95,7 @@ class ShareWorks:
             exchange_rate = self.__get_exchange_rate(wait)
             current_value = self.__get_current_value(wait)
             total_shares = self.__get_total_shares(wait)
+            record_page(driver, "shareworks", "portfolio")
             share_price = transaction_data[len(transaction_data) - 1][5]
 
             # Return the data as a dictionary
@@ -47,13 +108,7 @@ class ShareWorks:
             }
         except Exception as exception:
             logging.error(exception)
-            return {
-                "transactionData": 0,
-                "exchangeRate": 0,
-                "currentValue": 0,
-                "totalShares": 0,
-                "sharePrice": 0,
-            }
+            return None
         finally:
             # Ensure the driver is back to default content before exiting
             driver.switch_to.default_content()
@@ -83,15 +138,14 @@ class ShareWorks:
         ).click()
 
         # Wait until login process has finished and front page has loaded
-        wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, '//*[@id="hero-total-portfolio-value"]/span/span[2]')
-            )
-        )
-
-    def __get_transaction_data(self, driver: WebDriver, wait: WebDriverWait) -> list:
-        """Open the transaction page, select all history from dropdown
-        and collect all transaction history"""
+        wait.until(EC.presence_of_element_located((By.XPATH, PORTFOLIO_VALUE)))
+
+    def __get_transaction_data(
+        self, driver: WebDriver, wait: WebDriverWait, since=None
+    ) -> list:
+        """Open the transaction page, select the shortest period from the dropdown
+        that reaches back to since (all history without one) and collect the
+        transaction history"""
         # Select the Activity Page
         wait.until(
             EC.element_to_be_clickable(
@@ -117,38 +171,26 @@ class ShareWorks:
         )
 
         driver.switch_to.frame(iframe)
-        time.sleep(2)
-        submit = wait.until(
-            EC.element_to_be_clickable((By.XPATH, '//*[@id="submit_html"]'))
+        wait_for(
+            driver,
+            "shareworks statement form",
+            lambda d: document_ready(d) and DomSettled()(d),
+            timeout=60,
         )
+        # Read the period options in one call and pick the narrowest one needed
+        date_select = driver.find_element(By.XPATH, '//*[@id="date_select"]')
+        options = driver.execute_script(
+            "return Array.from(arguments[0].options, (option) => option.text.trim())",
+            date_select,
+        )
+        period = narrowest_period(options, since)
 
-        # Select the dropdown and change value to All Available History
-        Select(
-            driver.find_element(By.XPATH, '//*[@id="date_select"]')
-        ).select_by_visible_text("All Available History")
-
-        # Submit the form
-        submit.click()
-
-        # Grab all of the rows in the activity table
-        rows = driver.find_elements(By.XPATH, '//*[@id="Activity_table"]/tbody/tr')
-        transaction_data = []
-
-        # Iterate over the rows
-        for row in rows[3:]:
-            # Find all the cells in the row
-            cells = row.find_elements(By.XPATH, ".//td")
-
-            # Initialize a list to store the data for this row
-            row_data = []
-
-            # Iterate over the cells
-            for cell in cells:
-                # Extract the text from the cell and append it to the row data
-                row_data.append(cell.text)
+        transaction_data = self.__get_statement(driver, wait, period)
 
-            # Append the row data to the 2D array
-            transaction_data.append(row_data)
+        # The share price is taken from the latest row, so fall back to all history
+        # when nothing happened in the narrower period
+        if not transaction_data and period != ALL_HISTORY:
+            transaction_data = self.__get_statement(driver, wait, ALL_HISTORY)
 
         # Switch back out of the iframe
         driver.switch_to.default_content()
@@ -156,6 +198,31 @@ class ShareWorks:
         # Return the transaction data
         return transaction_data
 
+    def __get_statement(
+        self, driver: WebDriver, wait: WebDriverWait, period: str
+    ) -> list:
+        """Submit the statement form for the period and return the parsed rows.
+        The driver must be switched into the statement iframe"""
+        submit = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//*[@id="submit_html"]'))
+        )
+
+        # Select the dropdown and change value to the period
+        Select(
+            driver.find_element(By.XPATH, '//*[@id="date_select"]')
+        ).select_by_visible_text(period)
+
+        # Submit the form, waiting for any earlier statement to be replaced
+        previous = driver.find_elements(By.ID, "Activity_table")
+        submit.click()
+        if previous:
+            wait.until(EC.staleness_of(previous[0]))
+        wait.until(EC.presence_of_element_located((By.ID, "Activity_table")))
+
+        # Parse the rows of the activity table from the frame's source in one go
+        record_page(driver, "shareworks", "statement")
+        return parse_shareworks_transactions(driver.page_source)
+
     def __prepare_portfolio_page(self, driver: WebDriver, wait: WebDriverWait):
         """Loads the portfolio page and selects the GBP exchange rate conversion"""
         # Navigate to the portfolio page
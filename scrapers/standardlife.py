@@ -1,5 +1,4 @@
 import logging
-import time
 from typing import Any
 
 from selenium.webdriver.common.by import By
@@ -7,73 +6,81 @@ from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
+from scrapers.parsers import (
+    STANDARD_LIFE_ROWS,
+    parse_standard_life_summary_json,
+    parse_standard_life_transactions,
+    parse_standard_life_transactions_json,
+)
+from utils.capture import parse_captured
+from utils.fixtures import record_page
+from utils.sessions import log_in
+from utils.waits import DomSettled, NetworkIdle, RowCountStable, wait_for
+
 PENSION_SUMMARY_TAB = (
     '//*[@id="tab-summary"]/tcs-pensions-summary-tab/tcs-view-plan-summary-pension'
 )
 
+# The link on the dashboard's hero tile to the pension plan summary
+HERO_TILE_LINK = (
+    "/html/body/app-root/app-secure-container/tcs-main-nav/div"
+    + "/mat-sidenav-container/mat-sidenav-content/tcs-dashboard"
+    + "/div[2]/div[2]/tcs-hero-tile/div/a"
+)
+
+# URL patterns of the JSON responses behind the summary and activity tabs
+SUMMARY_JSON = r"(?i)summary|valuation"
+TRANSACTIONS_JSON = r"(?i)transaction"
+
 
 class StandardLife:
     """A class for scraping data from the Standard Life website"""
 
-    def __init__(self, username: str, passwd: str):
+    def __init__(
+        self,
+        username: str,
+        passwd: str,
+        sessions=None,
+        capture=False,
+        watermarks=None,
+    ):
         """Initialize the instance variables for the class methods"""
         self.username = username
         self.passwd = passwd
+        self.sessions = sessions
+        self.capture = capture
+        self.watermarks = watermarks
 
-    def scrape_data(self, driver: WebDriver) -> dict[str, Any]:
-        """Scrape transaction and portfolio data from the Standard Life website"""
+    def scrape_data(self, driver: WebDriver) -> dict[str, Any] | None:
+        """Scrape transaction and portfolio data from the Standard Life website, or
+        return None if the scrape fails"""
         try:
-            # Set up wait and log in to Standard Life
+            # Set up wait and log in to Standard Life, unless the saved session is
+            # still valid
             wait = WebDriverWait(driver, 60)
-            self.__login(driver, wait)
-
-            time.sleep(5)
-
-            accept_cookie = wait.until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="cookieAcceptAllLink"]'))
+            log_in(
+                driver,
+                self.sessions,
+                "standardLife",
+                (By.XPATH, HERO_TILE_LINK),
+                lambda: self.__login(driver, wait),
             )
 
-            time.sleep(5)
-
-            accept_cookie.click()
-
             # Naviagate to portfolio page and change dropdown to GBP
-            wait.until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        "/html/body/app-root/app-secure-container/tcs-main-nav/div"
-                        + "/mat-sidenav-container/mat-sidenav-content/tcs-dashboard"
-                        + "/div[2]/div[2]/tcs-hero-tile/div/a",
-                    )
-                )
-            ).click()
+            wait.until(EC.element_to_be_clickable((By.XPATH, HERO_TILE_LINK))).click()
 
-            time.sleep(5)
+            # Grab total payments, investment growth, and total value
+            summary = self.__get_summary(driver, wait)
 
-            # Grab exchange rate, current value, and total shares
-            total_payments = self.__get_total_payments(wait)
-            investment_growth = self.__get_investment_growth(wait)
-            total_value = self.__get_total_value(wait)
-
-            # Grab transaction data
-            transaction_data = self.__get_transaction_data(driver, wait)
+            # Grab transaction data, back to the last synced transaction if known
+            since = self.watermarks.get("standardLife") if self.watermarks else None
+            transaction_data = self.__get_transaction_data(driver, wait, since)
 
             # Return the data as a dictionary
-            return {
-                "transactionData": transaction_data,
-                "totalPayments": total_payments,
-                "investmentGrowth": investment_growth,
-                "totalValue": total_value,
-            }
+            return {"transactionData": transaction_data, **summary}
         except Exception as exception:
             logging.error(exception)
-            return {
-                "transactionData": 0,
-                "totalPayments": 0,
-                "investmentGrowth": 0,
-                "totalValue": 0,
-            }
+            return None
 
     def __login(self, driver: WebDriver, wait: WebDriverWait):
         """Log into the website on the driver"""
@@ -102,6 +109,42 @@ class StandardLife:
             )
         ).click()
 
+        # Wait for the dashboard to finish loading after the login
+        wait_for(driver, "standard life dashboard", NetworkIdle(), timeout=60)
+
+        accept_cookie = wait.until(
+            EC.element_to_be_clickable((By.XPATH, '//*[@id="cookieAcceptAllLink"]'))
+        )
+
+        # Let the cookie banner finish animating in before clicking it
+        wait_for(driver, "standard life cookie banner", DomSettled(), timeout=60)
+
+        accept_cookie.click()
+
+    def __get_summary(self, driver: WebDriver, wait: WebDriverWait) -> dict[str, str]:
+        """Return the total payments, investment growth and total value of the plan,
+        from the captured JSON in capture mode or else from the summary tab"""
+        if self.capture:
+            summary = parse_captured(
+                driver,
+                "standard life summary json",
+                SUMMARY_JSON,
+                parse_standard_life_summary_json,
+            )
+            if summary is not None:
+                return summary
+
+        # Wait for the plan summary to finish loading
+        wait_for(driver, "standard life plan summary", NetworkIdle(), timeout=60)
+
+        summary = {
+            "totalPayments": self.__get_total_payments(wait),
+            "investmentGrowth": self.__get_investment_growth(wait),
+            "totalValue": self.__get_total_value(wait),
+        }
+        record_page(driver, "standardLife", "summary")
+        return summary
+
     def __get_total_payments(self, wait: WebDriverWait) -> str:
         """Return the current exchange rate shown on the portfolio page"""
         return wait.until(
@@ -135,9 +178,11 @@ class StandardLife:
             )
         ).text
 
-    def __get_transaction_data(self, driver: WebDriver, wait: WebDriverWait) -> list:
+    def __get_transaction_data(
+        self, driver: WebDriver, wait: WebDriverWait, since=None
+    ) -> list:
         """Open the transaction page, select all history from dropdown
-        and collect all transaction history"""
+        and collect the transaction history back to since"""
         # Select the Activity Page
         wait.until(
             EC.element_to_be_clickable(
@@ -148,34 +193,24 @@ class StandardLife:
             )
         ).click()
 
-        time.sleep(1)
-
-        # Grab all of the rows in the activity table
-        rows = driver.find_elements(
-            By.XPATH,
-            '//*[@id="tab-transaction"]/tcs-transaction-tab'
-            + "/div[2]/tcs-transaction-history/div[3]"
-            + "/table/tbody/tr",
+        # In capture mode, read the transactions from the JSON behind the tab
+        if self.capture:
+            transaction_data = parse_captured(
+                driver,
+                "standard life transactions json",
+                TRANSACTIONS_JSON,
+                lambda payloads: parse_standard_life_transactions_json(payloads, since),
+            )
+            if transaction_data is not None:
+                return transaction_data
+
+        # Wait for the activity table to stop filling in
+        wait_for(
+            driver,
+            "standard life activity table",
+            RowCountStable((By.XPATH, STANDARD_LIFE_ROWS)),
         )
-        transaction_data = []
-
-        # Iterate over the rows
-        for row in rows:
-            # Find all the cells in the row
-            cells = row.find_elements(By.XPATH, ".//td")
-
-            # Initialize a list to store the data for this row
-            row_data = []
-
-            # Iterate over the cells
-            for cell in cells:
-                if cell.text == "" and cell.accessible_name == "":
-                    continue
-                # Extract the text from the cell and append it to the row data
-                row_data.append(cell.accessible_name if cell.text == "" else cell.text)
-
-            # Append the row data to the 2D array
-            transaction_data.append(row_data)
 
-        # Return the transaction data
-        return transaction_data
+        # Parse the rows from the page source in one go
+        record_page(driver, "standardLife", "transactions")
+        return parse_standard_life_transactions(driver.page_source, since)
@@ -0,0 +1,46 @@
+import contextlib
+from unittest import mock
+
+from benchmarks.middleware import InMemoryHTTPClient, in_memory_client
+from connectors.gsheet import GoogleSheets, RequestScheduler
+from connectors.mirror import SheetMirror
+from middleware.moverperfect import Moverperfect
+
+
+def unthrottled() -> RequestScheduler:
+    """Return a scheduler whose quotas are never reached"""
+    return RequestScheduler(reads_per_minute=10**9, writes_per_minute=10**9)
+
+
+def open_sheet(worksheets, spreadsheet_id="test", mirror=None):
+    """Return a GoogleSheets on in-memory worksheets, given as
+    {title: {(row, col): value}}, with an optional SheetMirror, and the HTTP
+    client counting its calls"""
+    http_client = InMemoryHTTPClient(worksheets)
+    with in_memory_client(http_client):
+        sheet = GoogleSheets(spreadsheet_id, mirror, unthrottled())
+    return sheet, http_client
+
+
+@contextlib.contextmanager
+def in_memory_sheets(worksheets, scheduler=None):
+    """Run Moverperfect against in-memory worksheets, unthrottled or with the given
+    scheduler and with its mirror in memory. Yields the HTTP client counting the
+    calls"""
+    http_client = InMemoryHTTPClient(worksheets)
+    scheduler = scheduler or unthrottled()
+    with in_memory_client(http_client), mock.patch(
+        "connectors.gsheet.DEFAULT_SCHEDULER", scheduler
+    ), mock.patch("middleware.moverperfect.DEFAULT_SCHEDULER", scheduler), mock.patch(
+        "middleware.moverperfect.SheetMirror", lambda: SheetMirror(":memory:")
+    ):
+        yield http_client
+
+
+def run_sync(sync_name, worksheets, data):
+    """Run one private Moverperfect provider sync, such as "__shareworks", in a
+    batch on the in-memory worksheets. Returns the HTTP client"""
+    sheet, http_client = open_sheet(worksheets)
+    with sheet.batch():
+        getattr(Moverperfect, f"_Moverperfect{sync_name}")(sheet, data)
+    return http_client
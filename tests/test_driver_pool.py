@@ -0,0 +1,244 @@
+import http.server
+import itertools
+import threading
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import WebDriverException
+
+from utils.driver_pool import (
+    LEASE_TIMEOUT,
+    DriverPool,
+    PoolBusy,
+    PoolClient,
+    _PoolHandler,
+)
+
+SESSION_IDS = itertools.count(1)
+
+
+class FakeChrome:
+    """A Chrome session that answers until it is killed"""
+
+    def __init__(self, options):
+        self.options = options
+        self.session_id = f"session-{next(SESSION_IDS)}"
+        self.caps = {"browserName": "chrome"}
+        self.service = mock.Mock(service_url="http://127.0.0.1:9515")
+        self.alive = True
+        self.heap_mb = 10
+        self.quit_calls = 0
+
+    def execute_script(self, script):
+        """Answer a script while the browser is alive"""
+        if not self.alive:
+            raise WebDriverException("chrome not reachable")
+        return script
+
+    def execute_cdp_cmd(self, command, _params):
+        """Report the page's JS heap usage"""
+        assert command == "Runtime.getHeapUsage"
+        return {"usedSize": self.heap_mb * 2**20}
+
+    def quit(self):
+        """Quit the browser"""
+        self.quit_calls += 1
+        self.alive = False
+
+
+class DriverPoolTest(unittest.TestCase):
+    """DriverPool"""
+
+    def setUp(self):
+        patcher = mock.patch("utils.driver_pool.webdriver.Chrome", FakeChrome)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = DriverPool(max_uses=3, max_heap_mb=100, directory="profiles")
+        self.addCleanup(self.pool.close)
+
+    def release(self, provider):
+        """Release the provider's session and wait for any replacement launched in
+        the background"""
+        before = set(threading.enumerate())
+        self.pool.release(provider)
+        for thread in set(threading.enumerate()) - before:
+            thread.join()
+
+    def driver(self, provider) -> FakeChrome:
+        """Return the browser of the provider's current session"""
+        return self.pool.sessions[provider].driver
+
+    def test_lease_launches_a_session(self):
+        """The first lease launches the provider's browser with its profile"""
+        lease = self.pool.lease("nutmeg", "lean")
+        driver = self.driver("nutmeg")
+        self.assertEqual(
+            lease,
+            {
+                "url": "http://127.0.0.1:9515",
+                "sessionId": driver.session_id,
+                "capabilities": {"browserName": "chrome"},
+            },
+        )
+        self.assertIn("--headless=new", driver.options.arguments)
+        self.assertEqual(self.pool.counters["coldLeases"], 1)
+
+    def test_released_session_is_leased_again(self):
+        """A released session is handed out warm to the next lease"""
+        first = self.pool.lease("nutmeg", "default")
+        self.release("nutmeg")
+        second = self.pool.lease("nutmeg", "default")
+        self.assertEqual(first["sessionId"], second["sessionId"])
+        self.assertEqual(self.pool.counters["warmLeases"], 1)
+        self.assertEqual(self.pool.counters["launches"], 1)
+
+    def test_leased_session_is_busy(self):
+        """A session cannot be leased twice, but other providers can be leased"""
+        self.pool.lease("nutmeg", "default")
+        with self.assertRaises(PoolBusy):
+            self.pool.lease("nutmeg", "default")
+        self.pool.lease("hargreaves", "default")
+        self.assertEqual(self.pool.counters["leasesRejected"], 1)
+
+    def test_release_without_a_lease(self):
+        """Releasing a provider that holds no lease does nothing"""
+        self.release("nutmeg")
+        self.pool.lease("nutmeg", "default")
+        self.release("nutmeg")
+        self.release("nutmeg")
+        self.assertEqual(self.pool.counters["releases"], 1)
+
+    def test_dead_session_is_replaced_on_lease(self):
+        """A session that stopped answering is replaced before it is leased"""
+        first = self.pool.lease("nutmeg", "default")
+        self.release("nutmeg")
+        dead = self.driver("nutmeg")
+        dead.alive = False
+
+        second = self.pool.lease("nutmeg", "default")
+        self.assertNotEqual(first["sessionId"], second["sessionId"])
+        self.assertEqual(dead.quit_calls, 1)
+        self.assertEqual(self.pool.recycles, {"health": 1})
+
+    def test_other_profile_is_replaced_on_lease(self):
+        """A session launched with another profile is replaced"""
+        first = self.pool.lease("nutmeg", "default")
+        self.release("nutmeg")
+        second = self.pool.lease("nutmeg", "lean")
+        self.assertNotEqual(first["sessionId"], second["sessionId"])
+        self.assertEqual(self.pool.recycles, {"profile": 1})
+
+    def test_dead_session_is_replaced_on_release(self):
+        """A session that dies while leased is replaced when it is released"""
+        first = self.pool.lease("nutmeg", "default")
+        self.driver("nutmeg").alive = False
+        self.release("nutmeg")
+
+        self.assertNotEqual(self.driver("nutmeg").session_id, first["sessionId"])
+        self.assertEqual(self.pool.recycles, {"health": 1})
+
+    def test_used_session_is_recycled(self):
+        """A session is replaced after max_uses leases"""
+        sessions = set()
+        for _ in range(4):
+            sessions.add(self.pool.lease("nutmeg", "default")["sessionId"])
+            self.release("nutmeg")
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(self.pool.recycles, {"uses": 1})
+
+    def test_large_heap_is_recycled(self):
+        """A session left with a JS heap past max_heap_mb is replaced"""
+        self.pool.lease("nutmeg", "default")
+        self.driver("nutmeg").heap_mb = 200
+        self.release("nutmeg")
+        self.assertEqual(self.pool.recycles, {"memory": 1})
+        self.assertEqual(self.driver("nutmeg").heap_mb, 10)
+
+    def test_check_recycles_dead_idle_sessions(self):
+        """The health check recycles idle sessions that stopped answering"""
+        self.pool.lease("nutmeg", "default")
+        self.release("nutmeg")
+        self.pool.lease("hargreaves", "default")
+        self.release("hargreaves")
+        self.driver("nutmeg").alive = False
+
+        self.pool.check()
+        self.assertEqual(list(self.pool.sessions), ["hargreaves"])
+        self.assertEqual(self.pool.recycles, {"health": 1})
+
+    def test_check_reclaims_expired_leases(self):
+        """Leases never released are reclaimed once they time out"""
+        self.pool.lease("nutmeg", "default")
+        self.pool.lease("hargreaves", "default")
+        self.pool.sessions["nutmeg"].leased_at -= LEASE_TIMEOUT + 1
+
+        self.pool.check()
+        self.assertEqual(list(self.pool.sessions), ["hargreaves"])
+        self.assertEqual(self.pool.recycles, {"expired": 1})
+
+    def test_metrics(self):
+        """The metrics report the counters and each session"""
+        self.pool.lease("nutmeg", "lean")
+        metrics = self.pool.metrics()
+        self.assertEqual(metrics["launches"], 1)
+        self.assertEqual(
+            metrics["sessions"],
+            {"nutmeg": {"profile": "lean", "uses": 1, "leased": True, "ageSeconds": 0}},
+        )
+
+    def test_close_quits_every_session(self):
+        """Closing the pool quits every browser"""
+        self.pool.lease("nutmeg", "default")
+        self.pool.lease("hargreaves", "default")
+        drivers = [self.driver("nutmeg"), self.driver("hargreaves")]
+        self.pool.close()
+        self.assertEqual([driver.quit_calls for driver in drivers], [1, 1])
+        self.assertEqual(self.pool.sessions, {})
+
+
+class PoolClientTest(unittest.TestCase):
+    """PoolClient against a served pool"""
+
+    def setUp(self):
+        self.pool = mock.Mock()
+        self.pool.lease.return_value = {
+            "url": "http://127.0.0.1:9515",
+            "sessionId": "session",
+            "capabilities": {"browserName": "chrome"},
+        }
+        self.pool.metrics.return_value = {"launches": 1}
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PoolHandler)
+        server.pool = self.pool
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = PoolClient(f"http://127.0.0.1:{server.server_port}/")
+
+    def test_lease_attaches_and_releases(self):
+        """A lease attaches to the pool's session and releases it afterwards"""
+        with self.client.lease("nutmeg", "lean") as driver:
+            self.assertEqual(driver.session_id, "session")
+            self.assertEqual(driver.caps, {"browserName": "chrome"})
+            self.pool.release.assert_not_called()
+        self.pool.lease.assert_called_once_with("nutmeg", "lean")
+        self.pool.release.assert_called_once_with("nutmeg")
+
+    def test_released_when_the_scrape_fails(self):
+        """The session is released even when the block raises"""
+        with self.assertRaises(ValueError):
+            with self.client.lease("nutmeg"):
+                raise ValueError("scrape failed")
+        self.pool.release.assert_called_once_with("nutmeg")
+
+    def test_busy_session(self):
+        """A rejected lease raises with the pool's message"""
+        self.pool.lease.side_effect = PoolBusy("The nutmeg session is already leased")
+        with self.assertRaisesRegex(RuntimeError, "already leased"):
+            with self.client.lease("nutmeg"):
+                pass
+        self.pool.release.assert_not_called()
+
+    def test_metrics(self):
+        """The client returns the pool's metrics"""
+        self.assertEqual(self.client.metrics(), {"launches": 1})
@@ -0,0 +1,84 @@
+import unittest
+
+from benchmarks.fixtures import nutmeg_transactions, standard_life_transactions
+from scrapers.parsers import (
+    parse_document,
+    parse_nutmeg_transactions,
+    parse_standard_life_transactions,
+)
+from utils.fixtures import sanitize_html
+
+PAGE = """<html><head>
+<script>window.token = "abc";</script><style>td { color: red }</style>
+<meta name="csrf" content="12345678"></head>
+<body onload="track()">
+<!-- account 12345678 -->
+<p>Hello jane.doe@example.com<noscript><img src="pixel.gif"></noscript> and welcome</p>
+<form action="/login"><input name="account" value="12345678"></form>
+<table class="holdings"><tr><td data-ref="ACC87654321">Fund A</td><td>1,234.56</td>
+</tr></table><a href="/statement/12345678">Statement</a> for account 87654321
+<address>Jane Doe, 12 High Street, SW1A 1AA</address><p>Plan 4821, paid £52.10</p>
+<svg aria-label="Jane's pension"></svg><p>On 01/10/2026 and 01-Oct-2026</p>
+</body></html>"""
+
+
+class SanitizeHtmlTest(unittest.TestCase):
+    """Recorded pages keep their structure and figures, without identifying text"""
+
+    def setUp(self):
+        self.source = sanitize_html(PAGE)
+
+    def test_scripts_styles_and_comments_are_dropped(self):
+        """Scripts, styles, meta tags, noscript and comments are removed"""
+        for text in ("<script", "<style", "<meta", "<noscript", "<!--", "token"):
+            with self.subTest(text):
+                self.assertNotIn(text, self.source)
+
+    def test_text_after_dropped_elements_is_kept(self):
+        """The text following a dropped element stays in the page"""
+        self.assertIn("xxx xxxxxxx</p>", self.source)
+
+    def test_identifying_text_is_redacted(self):
+        """Emails, long numbers, form values, links and handlers are removed"""
+        for text in ("jane.doe", "12345678", "87654321", "onload", "href", "action"):
+            with self.subTest(text):
+                self.assertNotIn(text, self.source)
+        self.assertIn('data-ref="ACCREDACTED"', self.source)
+
+    def test_text_is_masked(self):
+        """Names, addresses, postcodes, short numbers and amounts are masked"""
+        for text in ("Jane", "High", "SW1A", "4821", "52.10", "Fund A", "1,234.56"):
+            with self.subTest(text):
+                self.assertNotIn(text, self.source)
+        self.assertIn("Xxxx Xxx, 00 Xxxx Xxxxxx, XX0X 0XX", self.source)
+        self.assertIn('aria-label="Xxxx\'x xxxxxxx"', self.source)
+
+    def test_dates_are_kept(self):
+        """The dates the parsers read are kept"""
+        self.assertIn("Xx 01/10/2026 xxx 01-Oct-2026", self.source)
+
+    def test_tables_keep_their_shape(self):
+        """The tables the parsers read keep their cells, with masked text"""
+        cells = parse_document(self.source).xpath("//table[@class='holdings']//td")
+        self.assertEqual([cell.text for cell in cells], ["Xxxx X", "0,000.00"])
+        self.assertTrue(self.source.startswith("<!DOCTYPE html>"))
+
+    def test_recorded_pages_still_parse(self):
+        """The transaction pages parse after sanitizing, with the same dates"""
+        nutmeg = parse_nutmeg_transactions(sanitize_html(nutmeg_transactions(45)))
+        self.assertEqual(
+            [row["date"] for row in nutmeg],
+            [row["date"] for row in parse_nutmeg_transactions(nutmeg_transactions(45))],
+        )
+        self.assertEqual(nutmeg[0]["amount"], "0.00")
+
+        standard_life = parse_standard_life_transactions(
+            sanitize_html(standard_life_transactions(3))
+        )
+        self.assertEqual(
+            standard_life[0], ["Xxxxxxx xxxxxxx", "01/10/2026", "£0.00", "Xxxxxxxxx"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,612 @@
+import contextlib
+import io
+import threading
+import unittest
+from unittest import mock
+
+import gspread
+
+from benchmarks.middleware import nutmeg_case
+from connectors.gsheet import (
+    RequestScheduler,
+    TokenBucket,
+    _merge_rectangles,
+)
+from connectors.mirror import SheetMirror, content_hash, normalise
+from middleware.moverperfect import Moverperfect
+from tests.sheets import in_memory_sheets, open_sheet, unthrottled
+
+
+class FindEmptyRowTest(unittest.TestCase):
+    """GoogleSheets.find_empty_row"""
+
+    def test_first_empty_cell_found_with_one_read(self):
+        """The first empty cell of the column is found with a single read"""
+        column = {(row, 1): f"value {row}" for row in range(1, 251) if row != 120}
+        sheet, http_client = open_sheet({"Sheet": column})
+
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 120)
+        self.assertEqual(http_client.calls["values_get"], 1)
+
+    def test_row_after_a_full_column(self):
+        """A column without gaps is appended to"""
+        column = {(row, 1): f"value {row}" for row in range(1, 251)}
+        sheet, _ = open_sheet({"Sheet": column})
+
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 251)
+
+    def test_repeated_lookups_are_cached(self):
+        """The column is read once per sheet"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+
+        sheet.find_empty_row("Sheet", "A")
+        sheet.find_empty_row("Sheet", "A")
+        self.assertEqual(http_client.calls["values_get"], 1)
+
+    def test_writes_move_the_cached_row_down(self):
+        """Rows written in the column are no longer empty"""
+        sheet, _ = open_sheet({"Sheet": {(1, 1): "Date"}})
+
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 2)
+        sheet.write_range("Sheet", "A2:B3", ["a", "b", "c", "d"])
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 4)
+
+    def test_writes_to_other_columns_leave_the_row(self):
+        """Rows written in other columns are still empty"""
+        sheet, _ = open_sheet({"Sheet": {(1, 1): "Date"}})
+
+        sheet.find_empty_row("Sheet", "A")
+        sheet.write_range("Sheet", "C2:C3", ["a", "b"])
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 2)
+
+    def test_prefetched_column_needs_no_read(self):
+        """A prefetched column is not read again"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date", (2, 1): "a"}})
+
+        sheet.prefetch([("Sheet", "A:A")])
+        self.assertEqual(sheet.find_empty_row("Sheet", "A"), 3)
+        self.assertEqual(http_client.calls["values_get"], 0)
+
+
+class WorksheetCacheTest(unittest.TestCase):
+    """GoogleSheets.worksheet and worksheet_by_id"""
+
+    def setUp(self):
+        self.worksheets = {"First": {(1, 1): "a"}, "Second": {(1, 1): "b"}}
+        self.sheet, self.http_client = open_sheet(self.worksheets)
+
+        # gspread fetches the metadata once when it opens the spreadsheet
+        self.assertIsNotNone(self.sheet.sheet)
+        self.http_client.calls.clear()
+
+    def test_handles_are_loaded_once(self):
+        """Every worksheet handle comes from one metadata fetch"""
+        first = self.sheet.worksheet("First")
+        self.assertIs(self.sheet.worksheet("First"), first)
+        self.assertEqual(self.sheet.worksheet("Second").title, "Second")
+        self.assertIs(self.sheet.worksheet_by_id(first.id), first)
+
+        self.assertEqual(self.http_client.calls["metadata"], 1)
+        self.assertEqual(self.sheet.worksheet_cache_misses, 1)
+        self.assertEqual(self.sheet.worksheet_cache_hits, 3)
+
+    def test_cell_calls_do_not_fetch_metadata(self):
+        """Reads and writes reuse the cached handle"""
+        self.sheet.read_cell("First", "A1")
+        self.sheet.write_cell("First", "A2", "x")
+        self.sheet.read_range("Second", "A1:A2")
+        self.assertEqual(self.http_client.calls["metadata"], 1)
+
+    def test_unknown_worksheets_reload_the_handles(self):
+        """A worksheet added since the handles were loaded is found by a reload,
+        and one that does not exist raises"""
+        self.sheet.worksheet("First")
+        self.worksheets["Third"] = {}
+        self.assertEqual(self.sheet.worksheet("Third").title, "Third")
+        self.assertEqual(self.http_client.calls["metadata"], 2)
+
+        with self.assertRaises(gspread.exceptions.WorksheetNotFound):
+            self.sheet.worksheet("Missing")
+        with self.assertRaises(gspread.exceptions.WorksheetNotFound):
+            self.sheet.worksheet_by_id(99)
+
+    def test_invalidated_handles_are_reloaded(self):
+        """After invalidate_worksheets the next lookup fetches the metadata"""
+        self.sheet.worksheet("First")
+        self.sheet.invalidate_worksheets()
+        self.sheet.worksheet("First")
+        self.assertEqual(self.http_client.calls["metadata"], 2)
+
+
+class PrefetchTest(unittest.TestCase):
+    """GoogleSheets.prefetch, reads served from the snapshot and invalidate"""
+
+    def setUp(self):
+        self.worksheets = {
+            "Sheet": {
+                (row, col): f"{row},{col}" for row in (1, 2, 3) for col in (1, 2)
+            },
+            "Other": {(1, 1): "other"},
+        }
+        self.sheet, self.http_client = open_sheet(self.worksheets)
+        self.sheet.prefetch([("Sheet", "A:B"), ("Other", "A1:A2")])
+
+    def reads(self) -> int:
+        """Return the reads made after the prefetch"""
+        return self.http_client.calls["values_get"]
+
+    def test_ranges_are_fetched_in_one_request(self):
+        """Every prefetched range comes from one batch get"""
+        self.assertEqual(self.http_client.calls["values_batch_get"], 1)
+
+    def test_reads_inside_the_ranges_are_served_from_memory(self):
+        """Cells and ranges inside the prefetched ranges need no request"""
+        self.assertEqual(self.sheet.read_cell("Sheet", "B2"), "2,2")
+        self.assertEqual(
+            [cell.value for cell in self.sheet.read_range("Sheet", "A2:B3")],
+            ["2,1", "2,2", "3,1", "3,2"],
+        )
+        self.assertEqual(self.sheet.read_cell("Other", "A1"), "other")
+        self.assertEqual(self.reads(), 0)
+
+    def test_open_ranges_end_at_the_worksheet_edge(self):
+        """A column is served down to the edge of the worksheet, and cells below
+        its values or past the edge are empty"""
+        values = [cell.value for cell in self.sheet.read_range("Sheet", "A:A")]
+        self.assertEqual(values[:4], ["1,1", "2,1", "3,1", ""])
+        self.assertEqual(len(values), self.sheet.worksheet("Sheet").row_count)
+        self.assertIsNone(self.sheet.read_cell("Sheet", "A500"))
+        self.assertIsNone(self.sheet.read_cell("Sheet", "A50000"))
+        self.assertEqual(self.reads(), 0)
+
+    def test_reads_outside_the_ranges_go_to_the_sheet(self):
+        """A range not inside a prefetched one is read from the sheet"""
+        self.assertEqual(self.sheet.read_cell("Sheet", "C1"), None)
+        self.sheet.read_range("Other", "A1:B1")
+        self.assertEqual(self.reads(), 2)
+
+    def test_writes_make_the_overlapping_cells_stale(self):
+        """A cell written since the prefetch is read back from the sheet with its
+        new value, while the cells around it are still served from memory"""
+        with self.sheet.batch():
+            self.sheet.write_range("Sheet", "B2:B2", ["new"])
+            self.assertEqual(self.sheet.read_cell("Sheet", "B1"), "1,2")
+            self.assertEqual(self.sheet.read_cell("Sheet", "A2"), "2,1")
+            self.assertEqual(self.reads(), 0)
+
+            # The queued write is sent before the stale cell is read
+            self.assertEqual(self.sheet.read_cell("Sheet", "B2"), "new")
+            self.assertEqual(self.http_client.calls["values_batch_update"], 1)
+        self.assertEqual(
+            [cell.value for cell in self.sheet.read_range("Sheet", "A2:B2")],
+            ["2,1", "new"],
+        )
+        self.assertEqual(self.reads(), 2)
+
+    def test_invalidated_worksheets_are_read_from_the_sheet(self):
+        """After invalidating a worksheet its reads go to the sheet"""
+        self.worksheets["Other"][(1, 1)] = "edited"
+        self.sheet.invalidate("Other")
+        self.assertEqual(self.sheet.read_cell("Other", "A1"), "edited")
+        self.assertEqual(self.sheet.read_cell("Sheet", "A1"), "1,1")
+        self.assertEqual(self.reads(), 1)
+
+
+class HeldWriteScheduler(RequestScheduler):
+    """Holds every write request until released, or fails it"""
+
+    def __init__(self, fail=False):
+        super().__init__(reads_per_minute=10**9, writes_per_minute=10**9)
+        self.fail = fail
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def call(self, kind, function, *args, **kwargs):
+        if kind == "write":
+            self.started.set()
+            self.released.wait(5)
+            if self.fail:
+                raise ConnectionError("write failed")
+        return super().call(kind, function, *args, **kwargs)
+
+
+class FlushTest(unittest.TestCase):
+    """GoogleSheets.flush"""
+
+    def test_writes_can_be_queued_while_a_flush_is_sent(self):
+        """The lock is not held across the batch update request"""
+        sheet, _ = open_sheet({"Sheet": {(1, 1): "Date"}})
+        sheet.scheduler = HeldWriteScheduler()
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:A2", ["a"])
+
+            flush = threading.Thread(target=sheet.flush)
+            flush.start()
+            self.assertTrue(sheet.scheduler.started.wait(5))
+
+            # Another sync queues its writes while the first flush is in flight
+            queued = threading.Thread(
+                target=sheet.write_range, args=("Sheet", "B2:B2", ["b"])
+            )
+            queued.start()
+            queued.join(1)
+            self.assertFalse(queued.is_alive())
+
+            sheet.scheduler.released.set()
+            flush.join(5)
+
+        sheet.scheduler = unthrottled()
+        self.assertEqual(sheet.read_cell("Sheet", "A2"), "a")
+        self.assertEqual(sheet.read_cell("Sheet", "B2"), "b")
+
+    def test_unsent_writes_are_queued_again(self):
+        """Writes of a failed flush are sent by the next one"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+        sheet.scheduler = HeldWriteScheduler(fail=True)
+        sheet.scheduler.released.set()
+        with self.assertRaises(ConnectionError):
+            with sheet.batch():
+                sheet.write_range("Sheet", "A2:A2", ["a"])
+
+        sheet.scheduler = unthrottled()
+        sheet.flush()
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+        self.assertEqual(http_client.worksheets["Sheet"][(2, 1)], "a")
+
+    def test_newer_writes_win_over_requeued_ones(self):
+        """A cell written while a failing flush was in flight keeps its new value
+        when the unsent writes are queued again"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+        sheet.scheduler = HeldWriteScheduler(fail=True)
+        failures = []
+
+        def flush():
+            try:
+                sheet.flush()
+            except ConnectionError as exception:
+                failures.append(exception)
+
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B2", ["old", "b"])
+            flushing = threading.Thread(target=flush)
+            flushing.start()
+            self.assertTrue(sheet.scheduler.started.wait(5))
+            sheet.write_range("Sheet", "A2:A2", ["new"])
+            sheet.scheduler.released.set()
+            flushing.join(5)
+            sheet.scheduler = unthrottled()
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+        self.assertEqual(http_client.worksheets["Sheet"][(2, 1)], "new")
+        self.assertEqual(http_client.worksheets["Sheet"][(2, 2)], "b")
+
+    def test_writes_outside_a_batch_are_sent_at_once(self):
+        """Without a batch every write is its own request"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+        sheet.write_range("Sheet", "A2:A2", ["a"])
+        sheet.write_range("Sheet", "A3:A3", ["b"])
+        self.assertEqual(http_client.calls["values_update"], 2)
+
+    def test_batches_send_one_request(self):
+        """Nested batches send their writes once the outermost one closes"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B2", ["a", "b"])
+            with sheet.batch():
+                sheet.write_range("Sheet", "A3:B3", ["c", "d"])
+            self.assertEqual(http_client.calls["values_batch_update"], 0)
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+        self.assertEqual(http_client.cells_written, 4)
+
+
+class MergeRectanglesTest(unittest.TestCase):
+    """connectors.gsheet._merge_rectangles"""
+
+    def assert_covers(self, cells, rectangles):
+        """Check the rectangles hold every cell once with its value"""
+        covered = {}
+        for start_row, start_col, values_2d in rectangles:
+            self.assertEqual(len({len(row) for row in values_2d}), 1)
+            for row_offset, row in enumerate(values_2d):
+                for col_offset, value in enumerate(row):
+                    cell = (start_row + row_offset, start_col + col_offset)
+                    self.assertNotIn(cell, covered)
+                    covered[cell] = value
+        self.assertEqual(covered, cells)
+
+    def test_adjacent_rows_are_joined(self):
+        """Rows spanning the same columns on consecutive rows form one block"""
+        cells = {(row, col): f"{row},{col}" for row in (2, 3, 4) for col in (1, 2)}
+        rectangles = _merge_rectangles(cells)
+        self.assertEqual(
+            rectangles,
+            [(2, 1, [["2,1", "2,2"], ["3,1", "3,2"], ["4,1", "4,2"]])],
+        )
+
+    def test_gaps_split_blocks(self):
+        """A gap between rows or between columns starts another block"""
+        cells = {(2, 1): "a", (4, 1): "b", (2, 3): "c"}
+        rectangles = _merge_rectangles(cells)
+        self.assertEqual(len(rectangles), 3)
+        self.assert_covers(cells, rectangles)
+
+    def test_non_rectangular_cells(self):
+        """An L shape is split into blocks that cover it exactly"""
+        cells = {(2, 1): "a", (2, 2): "b", (3, 1): "c", (4, 1): "d", (4, 2): "e"}
+        rectangles = _merge_rectangles(cells)
+        self.assert_covers(cells, rectangles)
+        self.assertLess(len(rectangles), len(cells))
+
+    def test_overlapping_writes_keep_the_latest_value(self):
+        """Overlapping writes in a batch are sent once, with the later values"""
+        sheet, http_client = open_sheet({"Sheet": {(1, 1): "Date"}})
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", ["a", "b", "c", "d"])
+            sheet.write_range("Sheet", "B3:C4", ["D", "e", "f", "g"])
+
+        cells = http_client.worksheets["Sheet"]
+        self.assertEqual(
+            [[cells.get((row, col), "") for col in (1, 2, 3)] for row in (2, 3, 4)],
+            [["a", "b", ""], ["c", "D", "e"], ["", "f", "g"]],
+        )
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+        self.assertEqual(http_client.cells_written, 7)
+
+
+class FakeClock:
+    """Stands in for the time module, only moving when slept on"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        """Return the fake time"""
+        return self.now
+
+    def sleep(self, seconds):
+        """Move the fake time on instead of sleeping"""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    """A Sheets API error response, as APIError reads it"""
+
+    def __init__(self, code):
+        self.code = code
+
+    def json(self):
+        """Return the error body"""
+        return {"error": {"code": self.code, "message": "error", "status": "ERROR"}}
+
+
+def api_error(code) -> gspread.exceptions.APIError:
+    """Return the APIError of a response with the given status code"""
+    return gspread.exceptions.APIError(FakeResponse(code))
+
+
+class TokenBucketTest(unittest.TestCase):
+    """TokenBucket"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("connectors.gsheet.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_bucket_does_not_wait(self):
+        """Requests up to the capacity are sent straight away"""
+        bucket = TokenBucket(3, 1.0)
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_empty_bucket_waits_for_a_token(self):
+        """Once the bucket is empty each request waits for the next token"""
+        bucket = TokenBucket(2, 0.5)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(bucket.acquire(), 2.0)
+        self.assertEqual(bucket.acquire(), 2.0)
+        self.assertEqual(self.clock.sleeps, [2.0, 2.0])
+
+    def test_refill_is_capped_at_the_capacity(self):
+        """An idle bucket does not store more than its capacity"""
+        bucket = TokenBucket(2, 1.0)
+        bucket.acquire()
+        self.clock.now += 60
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 1.0])
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    """RequestScheduler.call and its counters"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for target, value in [
+            ("connectors.gsheet.time", self.clock),
+            ("connectors.gsheet.random.random", lambda: 0.5),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.scheduler = RequestScheduler(max_retries=3, max_backoff=3.0)
+
+    def test_requests_are_counted(self):
+        """Reads and writes are counted apart"""
+        self.assertEqual(self.scheduler.call("read", lambda: "value"), "value")
+        self.scheduler.call("write", lambda: None)
+        stats = self.scheduler.stats()
+        self.assertEqual((stats["reads"], stats["writes"]), (1, 1))
+        self.assertEqual(stats["maxQueueDepth"], 1)
+
+    def test_retryable_errors_back_off_with_jitter(self):
+        """Rate limited and server errors are retried after a growing, jittered
+        and capped delay"""
+        function = mock.Mock(
+            side_effect=[api_error(429), api_error(503), api_error(500), "value"]
+        )
+        self.assertEqual(self.scheduler.call("read", function), "value")
+        self.assertEqual(self.clock.sleeps, [1.5, 2.5, 3.0])
+
+        stats = self.scheduler.stats()
+        self.assertEqual(stats["retries"], 3)
+        self.assertEqual(stats["reads"], 4)
+        self.assertEqual(stats["throttleSeconds"], 7.0)
+
+    def test_other_errors_are_raised(self):
+        """An error that a retry cannot fix is raised straight away"""
+        function = mock.Mock(side_effect=api_error(400))
+        with self.assertRaises(gspread.exceptions.APIError):
+            self.scheduler.call("write", function)
+        self.assertEqual(function.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_retries_are_limited(self):
+        """The error is raised once the retries run out"""
+        function = mock.Mock(side_effect=api_error(429))
+        with self.assertRaises(gspread.exceptions.APIError):
+            self.scheduler.call("read", function)
+        self.assertEqual(function.call_count, 4)
+
+    def test_reset_zeroes_the_counters(self):
+        """After a reset the counters only cover the requests since"""
+        self.scheduler.call("read", lambda: None)
+        self.scheduler.reset()
+        self.scheduler.call("write", lambda: None)
+        stats = self.scheduler.stats()
+        self.assertEqual((stats["reads"], stats["writes"]), (0, 1))
+
+    def test_each_sync_reports_its_own_requests(self):
+        """The report of a sync does not include the requests of earlier ones, as
+        in daemon mode"""
+        scheduler = unthrottled()
+        reports = []
+        for _ in range(2):
+            worksheets, data = nutmeg_case(10)
+            worksheets["Share Purchase Plan"] = {(1, 1): "Date"}
+            worksheets["Pension"] = {(1, 1): "Date"}
+            output = io.StringIO()
+            with in_memory_sheets(worksheets, scheduler), contextlib.redirect_stdout(
+                output
+            ):
+                Moverperfect.insert_stream({"SHEET_ID": "sheet"}, [("nutmeg", data)])
+            reports.append(output.getvalue().splitlines()[0])
+
+        self.assertTrue(reports[0].startswith("Sheets API: "))
+        self.assertEqual(reports[0], reports[1])
+
+
+class NormaliseTest(unittest.TestCase):
+    """connectors.mirror.normalise and content_hash"""
+
+    def test_currency_and_thousands_are_ignored(self):
+        """Formatted amounts equal the numbers the sheet renders them as"""
+        self.assertEqual(normalise("£1,234.50"), normalise("1234.5"))
+        self.assertEqual(normalise("$10"), normalise(10))
+        self.assertEqual(normalise(" 7 "), 7)
+
+    def test_percentages_are_fractions(self):
+        """A percentage equals the fraction the sheet renders it as"""
+        self.assertEqual(normalise("12.5%"), normalise("0.125"))
+
+    def test_formula_spacing_is_ignored(self):
+        """Formulas compare without their spaces, and are not taken for numbers"""
+        self.assertEqual(normalise("=SUM(G2: G9)"), "=SUM(G2:G9)")
+        self.assertEqual(normalise("=1"), "=1")
+
+    def test_text_is_kept(self):
+        """Text that is not a number is only stripped"""
+        self.assertEqual(normalise(" PAYROLL PURCHASE "), "PAYROLL PURCHASE")
+        self.assertNotEqual(normalise("01/02/2000"), normalise("02/01/2000"))
+
+    def test_hash_follows_the_normalised_values(self):
+        """Rows hash the same whatever the formatting of their values"""
+        self.assertEqual(
+            content_hash({1: "01/01/2000", 2: "£1,000.00"}),
+            content_hash({2: 1000, 1: "01/01/2000"}),
+        )
+        self.assertNotEqual(
+            content_hash({1: "01/01/2000", 2: "1000"}),
+            content_hash({1: "01/01/2000", 2: "1001"}),
+        )
+
+
+class MirrorTest(unittest.TestCase):
+    """GoogleSheets writes with a SheetMirror, and verify_mirror"""
+
+    def setUp(self):
+        self.mirror = SheetMirror(":memory:")
+        self.worksheets = {"Sheet": {(1, 1): "Date"}, "Other": {(1, 1): "Date"}}
+        self.rows = ["01/01/2000", "10.00", "02/01/2000", "20.00"]
+
+        # An earlier run wrote two rows to each worksheet
+        sheet, _ = open_sheet(self.worksheets, mirror=self.mirror)
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", self.rows)
+            sheet.write_range("Other", "A2:B3", self.rows)
+
+    def test_unchanged_rows_are_skipped(self):
+        """Only the rows that differ from what was last written are sent"""
+        sheet, http_client = open_sheet(self.worksheets, mirror=self.mirror)
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", ["01/01/2000", "£10", *self.rows[2:]])
+        self.assertEqual(http_client.calls["values_batch_update"], 0)
+
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", [*self.rows[:2], "02/01/2000", "25"])
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+        self.assertEqual(http_client.cells_written, 2)
+        self.assertEqual(self.worksheets["Sheet"][(3, 2)], "25")
+
+    def test_is_unchanged_compares_every_value(self):
+        """A row segment is unchanged only if each of its values is"""
+        self.assertTrue(self.mirror.is_unchanged("test", "Sheet", 2, 1, ["01/01/2000"]))
+        self.assertTrue(self.mirror.is_unchanged("test", "Sheet", 2, 2, ["10"]))
+        self.assertFalse(
+            self.mirror.is_unchanged("test", "Sheet", 2, 1, ["01/01/2000", "11"])
+        )
+        self.assertFalse(
+            self.mirror.is_unchanged("test", "Sheet", 2, 1, self.rows[:2] + ["x"])
+        )
+        self.assertFalse(self.mirror.is_unchanged("test", "Sheet", 4, 1, ["a"]))
+        self.assertFalse(self.mirror.is_unchanged("other", "Sheet", 2, 1, ["a"]))
+
+    def test_untouched_sheets_pass_verification(self):
+        """A sheet left as it was written keeps its mirror"""
+        sheet, http_client = open_sheet(self.worksheets, mirror=self.mirror)
+        self.assertEqual(sheet.verify_mirror(), [])
+        self.assertEqual(http_client.calls["values_batch_get"], 1)
+        self.assertEqual(sorted(self.mirror.worksheets("test")), ["Other", "Sheet"])
+
+    def test_edited_worksheets_are_forgotten(self):
+        """A worksheet whose sampled rows changed loses its mirror, and only it"""
+        self.worksheets["Sheet"][(3, 2)] = "21.00"
+        sheet, _ = open_sheet(self.worksheets, mirror=self.mirror)
+
+        self.assertEqual(sheet.verify_mirror(), ["Sheet"])
+        self.assertEqual(self.mirror.worksheets("test"), ["Other"])
+
+    def test_undone_syncs_are_written_again(self):
+        """Rows deleted from the sheet since they were written are sent again"""
+        for cell in [(2, 1), (2, 2), (3, 1), (3, 2)]:
+            del self.worksheets["Sheet"][cell]
+
+        sheet, _ = open_sheet(self.worksheets, mirror=self.mirror)
+        self.assertEqual(sheet.verify_mirror(), ["Sheet"])
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", self.rows)
+        self.assertEqual(self.worksheets["Sheet"][(3, 2)], "20.00")
+
+    def test_sheets_without_a_mirror_write_every_row(self):
+        """Without a mirror nothing is skipped or verified"""
+        sheet, http_client = open_sheet(self.worksheets)
+        self.assertEqual(sheet.verify_mirror(), [])
+        with sheet.batch():
+            sheet.write_range("Sheet", "A2:B3", self.rows)
+        self.assertEqual(http_client.cells_written, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
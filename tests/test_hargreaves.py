@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from benchmarks.fixtures import hargreaves_summary
+from scrapers.hargreaves import ACCOUNT_SUMMARY_URL, Hargreaves
+from scrapers.parsers import parse_hargreaves_summary
+
+# A summary page whose holdings row is missing its cells
+MALFORMED_SUMMARY = hargreaves_summary(1).replace("<td><span>£0.00</span></td>", "")
+
+
+class HargreavesSummaryTest(unittest.TestCase):
+    """parse_hargreaves_summary and the fast path's Hargreaves.__fetch_summaries"""
+
+    def test_summary(self):
+        """The account total and every holding are parsed"""
+        summary = parse_hargreaves_summary(hargreaves_summary(2))
+        self.assertEqual(summary["value"], "£1,234,567.89")
+        self.assertEqual(
+            [stock["stock"] for stock in summary["stocks"]], ["Fund 0", "Fund 1"]
+        )
+
+    def test_summaries_without_holdings_or_total_are_rejected(self):
+        """A page without holdings or an account total is not a summary"""
+        self.assertIsNone(parse_hargreaves_summary(hargreaves_summary(0)))
+        self.assertIsNone(
+            parse_hargreaves_summary(hargreaves_summary(1).replace("£1,234,567.89", ""))
+        )
+
+    def test_malformed_summaries_raise(self):
+        """A holdings row missing a cell fails to parse"""
+        with self.assertRaises(ValueError):
+            parse_hargreaves_summary(MALFORMED_SUMMARY)
+
+    def test_accounts_that_fail_are_left_to_the_browser(self):
+        """Only the accounts whose summary parsed are returned"""
+        pages = {
+            "1": hargreaves_summary(2),
+            "2": MALFORMED_SUMMARY,
+            "3": hargreaves_summary(0),
+            "4": " ",
+            "5": None,
+        }
+        scraper = Hargreaves("user", "01/01/70", "password", "123456", list(pages))
+        with mock.patch("scrapers.hargreaves.session_from_driver"), mock.patch(
+            "scrapers.hargreaves.fetch_all",
+            return_value={
+                ACCOUNT_SUMMARY_URL + account: page for account, page in pages.items()
+            },
+        ):
+            summaries = getattr(scraper, "_Hargreaves__fetch_summaries")(None)
+        self.assertEqual(list(summaries), ["1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
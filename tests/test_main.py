@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import WebDriverException
+
+from benchmarks.middleware import nutmeg_case, standard_life_case
+from main import build_scrapers, run
+from middleware.moverperfect import Moverperfect
+from tests.sheets import in_memory_sheets
+from tests.test_watermarks import SECRETS
+from utils.scheduler import SyncLog
+from utils.snapshots import SnapshotStore
+from utils.watermarks import WatermarkStore
+
+
+class FailedScrapeTest(unittest.TestCase):
+    """Failed scrapes return None, and run neither syncs nor snapshots them. A
+    failed sync does not stop the others"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.snapshots = SnapshotStore(os.path.join(directory, "snapshots"))
+        self.watermarks = WatermarkStore(os.path.join(directory, "watermarks.json"))
+        self.sync_log = SyncLog(os.path.join(directory, "last_synced.json"))
+
+    def test_scrapers_return_none_when_they_fail(self):
+        """A scraper whose browser fails returns None instead of placeholder data"""
+        for name, scraper in build_scrapers(SECRETS).items():
+            driver = mock.MagicMock()
+            driver.get.side_effect = WebDriverException("Chrome has gone away")
+            with self.subTest(name), self.assertLogs(level="ERROR"):
+                self.assertIsNone(scraper.scrape_data(driver))
+
+    def run_scrapes(self, scrapes, worksheets):
+        """Run main.run on the given scrapes against in-memory sheets. Returns the
+        providers synced and the output"""
+        args = argparse.Namespace(
+            replay=False, pool=None, parallel=False, profile="lean", no_mirror=False
+        )
+        output = io.StringIO()
+        with in_memory_sheets(worksheets), mock.patch(
+            "main.iter_sequential", return_value=iter(scrapes)
+        ), contextlib.redirect_stdout(output):
+            synced = run(
+                args,
+                {"SHEET_ID": "sheet", "SHEET_ID_2": "sheet 2"},
+                {name: None for name, _, _ in scrapes},
+                self.snapshots,
+                self.watermarks,
+                sync_log=self.sync_log,
+            )
+        return synced, output.getvalue()
+
+    def test_failed_providers_are_skipped(self):
+        """Only the providers whose scrape succeeded are synced and snapshotted"""
+        nutmeg_worksheets, _ = nutmeg_case(10)
+        pension_worksheets, pension_data = standard_life_case(10)
+        worksheets = {
+            **nutmeg_worksheets,
+            **pension_worksheets,
+            "Share Purchase Plan": {(1, 1): "Date"},
+        }
+        nutmeg_rows = dict(worksheets["Nutmeg"])
+
+        synced, output = self.run_scrapes(
+            [("nutmeg", None, None), ("standardLife", pension_data, None)],
+            worksheets,
+        )
+
+        self.assertEqual(synced, ["standardLife"])
+        self.assertEqual(worksheets["Nutmeg"], nutmeg_rows)
+        self.assertGreater(len(worksheets["Pension"]), len(pension_worksheets))
+        self.assertIsNone(self.snapshots.latest("nutmeg"))
+        self.assertIsNotNone(self.snapshots.latest("standardLife"))
+        self.assertIsNone(self.watermarks.get("nutmeg"))
+        self.assertIsNotNone(self.watermarks.get("standardLife"))
+        self.assertIsNone(self.sync_log.get("nutmeg"))
+        self.assertIsNotNone(self.sync_log.get("standardLife"))
+
+        # The stage report only lists the provider that was synced
+        self.assertIn("standardLife: scraped at", output)
+        self.assertNotIn("nutmeg: scraped at", output)
+
+    def test_failed_syncs_do_not_stop_the_others(self):
+        """A provider whose sync fails is left out, while the rows of the others
+        are written and recorded as synced"""
+        nutmeg_worksheets, nutmeg_data = nutmeg_case(10)
+        pension_worksheets, pension_data = standard_life_case(10)
+        worksheets = {
+            **nutmeg_worksheets,
+            **pension_worksheets,
+            "Share Purchase Plan": {(1, 1): "Date"},
+        }
+
+        with mock.patch.object(
+            Moverperfect,
+            "_Moverperfect__nutmeg",
+            side_effect=RuntimeError("The Nutmeg sheet is protected"),
+        ), self.assertLogs(level="ERROR") as logs:
+            synced, _ = self.run_scrapes(
+                [("nutmeg", nutmeg_data, None), ("standardLife", pension_data, None)],
+                worksheets,
+            )
+
+        self.assertEqual(synced, ["standardLife"])
+        self.assertIn("The nutmeg sync failed", logs.output[0])
+        self.assertGreater(len(worksheets["Pension"]), len(pension_worksheets))
+        self.assertIsNone(self.watermarks.get("nutmeg"))
+        self.assertIsNotNone(self.watermarks.get("standardLife"))
+        self.assertIsNone(self.sync_log.get("nutmeg"))
+        self.assertIsNotNone(self.sync_log.get("standardLife"))
+
+
+if __name__ == "__main__":
+    unittest.main()
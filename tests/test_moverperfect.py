@@ -0,0 +1,278 @@
+import unittest
+
+import contextlib
+import datetime
+import time
+from unittest import mock
+
+import gspread
+
+from benchmarks.middleware import (
+    NEW_TRANSACTIONS,
+    nutmeg_case,
+    shareworks_case,
+    standard_life_case,
+)
+from middleware.moverperfect import Moverperfect
+from tests.sheets import in_memory_sheets, run_sync
+
+
+def column(cells, col, first_row=2):
+    """Return the values of a worksheet column down to its last used row"""
+    last_row = max(row for row, _ in cells)
+    return [cells.get((row, col), "") for row in range(first_row, last_row + 1)]
+
+
+def nutmeg_transaction(day, transaction="Deposit", amount="10.00"):
+    """Return a scraped Nutmeg transaction on a day of January 2000"""
+    return {
+        "date": datetime.datetime(2000, 1, day),
+        "transaction": transaction,
+        "pot": "Pot",
+        "amount": amount,
+    }
+
+
+class NutmegSyncTest(unittest.TestCase):
+    """Moverperfect.__nutmeg"""
+
+    def sync(self, rows, transactions):
+        """Sync the scraped transactions, newest first, into a sheet holding the
+        rows. Returns the rows of the sheet afterwards and the HTTP client"""
+        worksheets = {
+            "Nutmeg": {(1, 1): "Date"},
+            "Nutmeg Monthly": {(1, 8): "Net Contributions"},
+        }
+        for row, values in enumerate(rows, start=2):
+            for col, value in enumerate(values, start=1):
+                worksheets["Nutmeg"][(row, col)] = value
+
+        data = {
+            "transactions": transactions,
+            "netContributions": "£1,000.00",
+            "currentValue": "£1,100.00",
+        }
+        http_client = run_sync("__nutmeg", worksheets, data)
+        cells = worksheets["Nutmeg"]
+        return [
+            [cells.get((row, col), "") for col in range(1, 5)]
+            for row in range(2, max(row for row, _ in cells) + 1)
+        ], http_client
+
+    def test_only_new_transactions_are_appended(self):
+        """Transactions before and on the last day in the sheet are skipped"""
+        worksheets, data = nutmeg_case(100)
+        run_sync("__nutmeg", worksheets, data)
+
+        dates = column(worksheets["Nutmeg"], 1)
+        self.assertEqual(len(dates), 100 + NEW_TRANSACTIONS)
+        self.assertEqual(len(set(dates)), len(dates))
+
+    def test_same_day_transaction_with_another_amount_is_inserted(self):
+        """A transaction on the last day in the sheet differing only by its amount
+        is not taken for the one already there"""
+        rows, _ = self.sync(
+            [["02/01/2000", "Deposit", "Pot", "10.00"]],
+            [nutmeg_transaction(2, amount="25.00"), nutmeg_transaction(2)],
+        )
+        self.assertEqual(
+            rows,
+            [
+                ["02/01/2000", "Deposit", "Pot", "10.00"],
+                ["02/01/2000", "Deposit", "Pot", "25.00"],
+            ],
+        )
+
+    def test_repeated_transactions_are_matched_one_to_one(self):
+        """Two identical transactions on a day are both kept, and only the one
+        not in the sheet yet is inserted"""
+        rows, _ = self.sync(
+            [["02/01/2000", "Deposit", "Pot", "10.00"]],
+            [nutmeg_transaction(2), nutmeg_transaction(2)],
+        )
+        self.assertEqual(rows, [["02/01/2000", "Deposit", "Pot", "10.00"]] * 2)
+
+    def test_amounts_match_whatever_their_formatting(self):
+        """A scraped "£1,000.00" matches the "1000" read back from the sheet"""
+        rows, _ = self.sync(
+            [["02/01/2000", "Deposit", "Pot", "1000"]],
+            [nutmeg_transaction(2, amount="£1,000.00")],
+        )
+        self.assertEqual(rows, [["02/01/2000", "Deposit", "Pot", "1000"]])
+
+    def test_new_rows_are_written_in_one_request(self):
+        """The new transactions and the monthly figures go in one batch update"""
+        _, http_client = self.sync(
+            [["01/01/2000", "Deposit", "Pot", "10.00"]],
+            [nutmeg_transaction(day) for day in range(9, 1, -1)],
+        )
+        self.assertEqual(http_client.calls["values_batch_update"], 1)
+
+    def test_reads_do_not_grow_with_the_history(self):
+        """A long history takes as many reads as a short one"""
+        reads = [
+            run_sync("__nutmeg", *nutmeg_case(size)).calls["values_get"]
+            for size in (50, 2000)
+        ]
+        self.assertEqual(reads[0], reads[1])
+
+
+class ShareworksSyncTest(unittest.TestCase):
+    """Moverperfect.__shareworks"""
+
+    def test_only_new_purchases_are_appended(self):
+        """Purchases already in the sheet are skipped and the statement's
+        duplicate rows are inserted once"""
+        worksheets, data = shareworks_case(100)
+        history = len(column(worksheets["Share Purchase Plan"], 1))
+
+        run_sync("__shareworks", worksheets, data)
+        rows = column(worksheets["Share Purchase Plan"], 3)
+        self.assertEqual(len(rows), history + NEW_TRANSACTIONS + 1)
+        self.assertEqual(rows[history:], ["PAYROLL PURCHASE"] * NEW_TRANSACTIONS + [""])
+
+    def test_valuation_sums_since_the_last_valuation(self):
+        """The valuation row sums the shares bought since the previous one"""
+        worksheets, data = shareworks_case(100)
+        cells = worksheets["Share Purchase Plan"]
+        last_valuation = max(
+            row for row, col in cells if col == 1 and not cells.get((row, 3))
+        )
+
+        run_sync("__shareworks", worksheets, data)
+        last_row = max(row for row, _ in cells)
+        self.assertEqual(
+            cells[(last_row, 7)], f"=SUM(G{last_valuation}:G{last_row - 1})"
+        )
+
+    def test_reads_do_not_grow_with_the_history(self):
+        """A long history takes as many reads as a short one"""
+        reads = [
+            run_sync("__shareworks", *shareworks_case(size)).calls["values_get"]
+            for size in (50, 2000)
+        ]
+        self.assertEqual(reads[0], reads[1])
+
+    def test_empty_sheet(self):
+        """Every purchase is inserted into a sheet with only its header"""
+        worksheets, data = shareworks_case(0)
+
+        run_sync("__shareworks", worksheets, data)
+        rows = column(worksheets["Share Purchase Plan"], 3)
+        self.assertEqual(rows, ["PAYROLL PURCHASE"] * NEW_TRANSACTIONS + [""])
+
+
+class StandardLifeSyncTest(unittest.TestCase):
+    """Moverperfect.__standard_life"""
+
+    def test_only_new_payments_are_appended(self):
+        """Payments up to the last one in the sheet are skipped"""
+        worksheets, data = standard_life_case(100)
+
+        run_sync("__standard_life", worksheets, data)
+        payments = [value for value in column(worksheets["Pension"], 2) if value]
+        self.assertEqual(len(payments), 100 + NEW_TRANSACTIONS)
+
+        # The valuation row follows the new payments
+        cells = worksheets["Pension"]
+        last_row = max(row for row, _ in cells)
+        self.assertEqual(last_row, 2 + 100 + NEW_TRANSACTIONS)
+        self.assertEqual(cells[(last_row, 4)], data["totalPayments"])
+
+    def test_valuation_rows_are_skipped_when_scanning_back(self):
+        """The date of a valuation row, with no payment, is not taken as the
+        date of the last payment"""
+        worksheets, data = standard_life_case(100)
+        run_sync("__standard_life", worksheets, data)
+
+        # A second sync of the same payments only adds a valuation row
+        run_sync("__standard_life", worksheets, data)
+        payments = [value for value in column(worksheets["Pension"], 2) if value]
+        self.assertEqual(len(payments), 100 + NEW_TRANSACTIONS)
+
+    def test_reads_do_not_grow_with_the_history(self):
+        """A long history takes as many reads as a short one"""
+        reads = [
+            run_sync("__standard_life", *standard_life_case(size)).calls["values_get"]
+            for size in (50, 2000)
+        ]
+        self.assertEqual(reads[0], reads[1])
+
+
+class ScanBackTest(unittest.TestCase):
+    """Moverperfect.__scan_back"""
+
+    def scan(self, rows, from_row):
+        """Scan back from from_row over columns A:C of a sheet whose reads only
+        return the given rows, starting at row 2"""
+        sheet = mock.Mock()
+        sheet.read_range.return_value = [
+            gspread.Cell(row, col, value)
+            for row, values in enumerate(rows, start=2)
+            for col, value in enumerate(values, start=1)
+        ]
+        scan_back = getattr(Moverperfect, "_Moverperfect__scan_back")
+        return list(scan_back(sheet, "Sheet", "A", "C", from_row)), sheet
+
+    def test_full_block(self):
+        """Every row of the block is yielded from the bottom up"""
+        rows, sheet = self.scan([["a", "1", "x"], ["b", "2", "y"]], 3)
+        self.assertEqual(rows, [(3, ["b", "2", "y"]), (2, ["a", "1", "x"])])
+        sheet.read_range.assert_called_once_with("Sheet", "A2:C3")
+
+    def test_short_read(self):
+        """Rows a read does not return are blank, and the rows it does return keep
+        their own indices"""
+        rows, _ = self.scan([["a", "1", "x"], ["b", "2", "y"]], 5)
+        self.assertEqual(
+            rows,
+            [
+                (5, ["", "", ""]),
+                (4, ["", "", ""]),
+                (3, ["b", "2", "y"]),
+                (2, ["a", "1", "x"]),
+            ],
+        )
+
+
+class InsertStreamTest(unittest.TestCase):
+    """Moverperfect.insert_stream"""
+
+    def test_writes_are_sent_when_each_sync_finishes(self):
+        """A provider's rows reach the sheet when its sync finishes, while another
+        provider of the spreadsheet is still syncing"""
+        nutmeg_worksheets, nutmeg_data = nutmeg_case(10)
+        pension_worksheets, pension_data = standard_life_case(10)
+        worksheets = {
+            **nutmeg_worksheets,
+            **pension_worksheets,
+            "Share Purchase Plan": {(1, 1): "Date"},
+        }
+        nutmeg_cells = len(worksheets["Nutmeg"])
+        standard_life = getattr(Moverperfect, "_Moverperfect__standard_life")
+        nutmeg_sent = []
+
+        def slow_standard_life(sheet, data):
+            # Held open until the Nutmeg rows are in the sheet, or two seconds
+            deadline = time.monotonic() + 2
+            while len(worksheets["Nutmeg"]) == nutmeg_cells:
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.01)
+            nutmeg_sent.append(len(worksheets["Nutmeg"]) > nutmeg_cells)
+            standard_life(sheet, data)
+
+        with in_memory_sheets(worksheets), mock.patch.object(
+            Moverperfect, "_Moverperfect__standard_life", slow_standard_life
+        ), contextlib.redirect_stdout(None):
+            _, finished_at = Moverperfect.insert_stream(
+                {"SHEET_ID": "sheet"},
+                [("standardLife", pension_data), ("nutmeg", nutmeg_data)],
+            )
+
+        self.assertEqual(nutmeg_sent, [True])
+        self.assertLess(finished_at["nutmeg"], finished_at["standardLife"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,335 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from benchmarks.fixtures import (
+    nutmeg_transactions,
+    shareworks_statement,
+    standard_life_transactions,
+)
+from scrapers.parsers import (
+    accessible_name,
+    element_text,
+    parse_document,
+    parse_nutmeg_transactions,
+    parse_nutmeg_transactions_json,
+    parse_shareworks_transactions,
+    parse_standard_life_summary_json,
+    parse_standard_life_transactions,
+    parse_standard_life_transactions_json,
+)
+from utils.capture import parse_captured
+
+# A list fetched alongside the transactions whose objects have generic keys
+NOTIFICATIONS = {
+    "notifications": [
+        {"type": "Message", "date": "2024-05-01", "value": 1, "name": "Welcome"}
+    ]
+}
+
+
+def nutmeg_record(date, transaction="Deposit", pot="Pot", amount=10.0):
+    """Return a Nutmeg transaction as the portal's JSON lists it"""
+    return {
+        "transactionDate": date,
+        "transactionType": transaction,
+        "pot": {"name": pot},
+        "amount": {"amount": amount, "currency": "GBP"},
+    }
+
+
+def standard_life_record(date, amount="100.00"):
+    """Return a Standard Life payment as the portal's JSON lists it"""
+    return {
+        "description": "Regular payment",
+        "effectiveDate": date,
+        "grossAmount": amount,
+    }
+
+
+def text_of(fragment) -> str:
+    """Return the rendered text of an HTML fragment"""
+    return element_text(parse_document(fragment))
+
+
+class ElementTextTest(unittest.TestCase):
+    """element_text and accessible_name"""
+
+    def test_whitespace_is_collapsed(self):
+        """Runs of source whitespace render as one space, trimmed at the ends"""
+        self.assertEqual(text_of("<td>\n  Day   3\n </td>"), "Day 3")
+
+    def test_block_elements_are_lines(self):
+        """Block elements and line breaks start a new line, inline ones do not"""
+        self.assertEqual(
+            text_of("<div><p>First <b>bold</b></p><p>Second<br>Third</p></div>"),
+            "First bold\nSecond\nThird",
+        )
+
+    def test_hidden_content_is_left_out(self):
+        """Hidden elements, scripts and comments are skipped, but the text after
+        them is kept"""
+        self.assertEqual(
+            text_of(
+                '<td>£10<span style="display: none">99</span>.00'
+                + "<!-- note --><script>x = 1</script><i hidden>!</i> GBP</td>"
+            ),
+            "£10.00 GBP",
+        )
+
+    def test_accessible_name_of_icons(self):
+        """An icon's label is its accessible name"""
+        cell = parse_document(
+            '<td><span><svg aria-label="Completed"></svg></span></td>'
+        )
+        self.assertEqual(accessible_name(cell), "Completed")
+        self.assertEqual(accessible_name(parse_document("<td></td>")), "")
+
+
+class NutmegTransactionsTest(unittest.TestCase):
+    """parse_nutmeg_transactions"""
+
+    def test_month_tables_are_parsed_newest_first(self):
+        """Every row of every month table is read with its month's date"""
+        transactions = parse_nutmeg_transactions(nutmeg_transactions(45))
+        self.assertEqual(len(transactions), 45)
+        self.assertEqual(
+            transactions[0],
+            {
+                "date": datetime(2026, 10, 1),
+                "transaction": "Deposit",
+                "pot": "Pot 0",
+                "amount": "1.00",
+            },
+        )
+        self.assertEqual(transactions[20]["date"], datetime(2026, 9, 21))
+        self.assertEqual(transactions[40]["date"], datetime(2026, 8, 13))
+        self.assertEqual(transactions[-1]["amount"], "45.00")
+
+    def test_unallocated_cash_is_skipped(self):
+        """Movements of unallocated cash are not transactions"""
+        page = nutmeg_transactions(30).replace("Pot 2", "Unallocated Cash")
+        transactions = parse_nutmeg_transactions(page)
+        self.assertEqual(len(transactions), 20)
+        self.assertNotIn("Unallocated Cash", {t["pot"] for t in transactions})
+
+    def test_parsing_stops_at_since(self):
+        """Transactions before since are left out, and older months are not read"""
+        transactions = parse_nutmeg_transactions(
+            nutmeg_transactions(45), since=datetime(2026, 9, 21)
+        )
+        self.assertEqual(len(transactions), 28)
+        self.assertEqual(min(t["date"] for t in transactions), datetime(2026, 9, 21))
+
+
+class StandardLifeTransactionsTest(unittest.TestCase):
+    """parse_standard_life_transactions"""
+
+    def test_rows_are_parsed(self):
+        """Cells are read as text, icons by their label and empty cells skipped"""
+        self.assertEqual(
+            parse_standard_life_transactions(standard_life_transactions(2)),
+            [
+                ["Regular payment", "01/10/2026", "£1.00", "Completed"],
+                ["Regular payment", "30/09/2026", "£2.00", "Completed"],
+            ],
+        )
+
+    def test_parsing_stops_at_since(self):
+        """Rows are read down to the first one dated before since"""
+        rows = parse_standard_life_transactions(
+            standard_life_transactions(10), since=datetime(2026, 9, 30)
+        )
+        self.assertEqual([row[1] for row in rows], ["01/10/2026", "30/09/2026"])
+
+    def test_missing_table(self):
+        """A page without the activity table has no rows"""
+        self.assertEqual(parse_standard_life_transactions("<p>Loading</p>"), [])
+
+
+class ShareworksTransactionsTest(unittest.TestCase):
+    """parse_shareworks_transactions"""
+
+    def test_header_rows_are_skipped(self):
+        """The rows below the three header rows are read cell by cell"""
+        self.assertEqual(
+            parse_shareworks_transactions(shareworks_statement(2)),
+            [
+                [
+                    "01-Oct-2026",
+                    "You bought",
+                    "Plan",
+                    "Shares",
+                    "1.0000",
+                    "$123.45",
+                    "$1.00",
+                ],
+                [
+                    "30-Sep-2026",
+                    "You bought",
+                    "Plan",
+                    "Shares",
+                    "2.0000",
+                    "$123.45",
+                    "$2.00",
+                ],
+            ],
+        )
+
+    def test_statement_without_activity(self):
+        """A statement with only its header rows has no transactions"""
+        self.assertEqual(parse_shareworks_transactions(shareworks_statement(0)), [])
+
+
+class NutmegTransactionsJsonTest(unittest.TestCase):
+    """parse_nutmeg_transactions_json"""
+
+    def test_transactions_are_found_past_other_lists(self):
+        """A list with generic keys is not taken for the transactions"""
+        payloads = [
+            NOTIFICATIONS,
+            {"data": {"transactions": [nutmeg_record("2024-05-02T10:00:00Z")]}},
+        ]
+        self.assertEqual(
+            parse_nutmeg_transactions_json(payloads),
+            [
+                {
+                    "date": datetime(2024, 5, 2),
+                    "transaction": "Deposit",
+                    "pot": "Pot",
+                    "amount": "10.00",
+                }
+            ],
+        )
+
+    def test_transactions_are_newest_first(self):
+        """The transactions come out in the order of the history page"""
+        payloads = [
+            [
+                nutmeg_record("2024-05-01"),
+                nutmeg_record("2024-05-03"),
+                nutmeg_record("2024-05-02"),
+            ]
+        ]
+        self.assertEqual(
+            [t["date"].day for t in parse_nutmeg_transactions_json(payloads)],
+            [3, 2, 1],
+        )
+
+    def test_transactions_before_since_are_left_out(self):
+        """Transactions already synced are skipped"""
+        payloads = [[nutmeg_record("2024-05-01"), nutmeg_record("2024-05-03")]]
+        transactions = parse_nutmeg_transactions_json(
+            payloads, since=datetime(2024, 5, 2)
+        )
+        self.assertEqual([t["date"].day for t in transactions], [3])
+
+    def test_unallocated_cash_is_left_out(self):
+        """Unallocated cash is not a pot transaction"""
+        payloads = [[nutmeg_record("2024-05-01", pot="Unallocated Cash")]]
+        self.assertEqual(parse_nutmeg_transactions_json(payloads), [])
+
+    def test_records_missing_a_field_are_not_recognised(self):
+        """A list where any object lacks a field is not the transactions"""
+        record = nutmeg_record("2024-05-01")
+        del record["amount"]
+        payloads = [[nutmeg_record("2024-05-02"), record]]
+        self.assertIsNone(parse_nutmeg_transactions_json(payloads))
+
+    def test_responses_without_transactions_are_not_recognised(self):
+        """No transactions are found in unrelated responses"""
+        self.assertIsNone(parse_nutmeg_transactions_json([NOTIFICATIONS]))
+
+    def test_invalid_values_raise(self):
+        """A transaction type that is not text fails, so the DOM is used"""
+        payloads = [[nutmeg_record("2024-05-01", transaction={"id": 1})]]
+        with self.assertRaises(ValueError):
+            parse_nutmeg_transactions_json(payloads)
+
+
+class StandardLifeJsonTest(unittest.TestCase):
+    """parse_standard_life_transactions_json and parse_standard_life_summary_json"""
+
+    def test_transactions_are_rows_newest_first(self):
+        """The payments come out as the activity table's rows, newest first"""
+        payloads = [
+            NOTIFICATIONS,
+            {
+                "transactions": [
+                    standard_life_record("2024-04-01", "1234.5"),
+                    standard_life_record("2024-05-01"),
+                ]
+            },
+        ]
+        self.assertEqual(
+            parse_standard_life_transactions_json(payloads),
+            [
+                ["Regular payment", "01/05/2024", "£100.00"],
+                ["Regular payment", "01/04/2024", "£1,234.50"],
+            ],
+        )
+
+    def test_transactions_before_since_are_left_out(self):
+        """Payments already synced are skipped"""
+        payloads = [
+            [standard_life_record("2024-04-01"), standard_life_record("2024-05-01")]
+        ]
+        rows = parse_standard_life_transactions_json(
+            payloads, since=datetime(2024, 4, 15)
+        )
+        self.assertEqual([row[1] for row in rows], ["01/05/2024"])
+
+    def test_generic_keys_are_not_recognised(self):
+        """Objects with only generic keys are not taken for payments"""
+        self.assertIsNone(parse_standard_life_transactions_json([NOTIFICATIONS]))
+
+    def test_summary(self):
+        """The plan summary is formatted the way the summary tab shows it"""
+        payloads = [
+            NOTIFICATIONS,
+            {
+                "plan": {
+                    "totalContributions": 10000,
+                    "investmentGrowth": -250.5,
+                    "planValue": "9,749.50",
+                }
+            },
+        ]
+        self.assertEqual(
+            parse_standard_life_summary_json(payloads),
+            {
+                "totalPayments": "£10,000.00",
+                "investmentGrowth": "-£250.50",
+                "totalValue": "£9,749.50",
+            },
+        )
+
+
+class ParseCapturedTest(unittest.TestCase):
+    """parse_captured, which returns None for the scrapers to fall back to the DOM"""
+
+    def parse(self, payloads):
+        """Parse the payloads as if they were captured Nutmeg responses"""
+        with mock.patch("utils.capture.wait_for_json", return_value=payloads):
+            return parse_captured(
+                None, "nutmeg transactions json", "", parse_nutmeg_transactions_json
+            )
+
+    def test_valid_responses_are_parsed(self):
+        """Recognised responses are parsed"""
+        self.assertEqual(len(self.parse([[nutmeg_record("2024-05-01")]])), 1)
+
+    def test_invalid_responses_fall_back(self):
+        """Responses that fail validation fall back to the DOM"""
+        payloads = [[nutmeg_record("2024-05-01", transaction=None)]]
+        self.assertIsNone(self.parse(payloads))
+        payloads = [[nutmeg_record("2024-05-01", transaction=1)]]
+        self.assertIsNone(self.parse(payloads))
+
+    def test_missing_responses_fall_back(self):
+        """No captured responses fall back to the DOM"""
+        self.assertIsNone(self.parse([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
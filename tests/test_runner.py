@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.runner import format_report, read_baseline, record_baseline
+
+
+def report(profile, seconds, requests, kib):
+    """Return a scrape report with the given profile and figures"""
+    return {
+        "profile": profile,
+        "seconds": seconds,
+        "requests": requests,
+        "blocked": 0,
+        "bytes": kib * 1024,
+        "waits": [],
+        "login": "none",
+    }
+
+
+class NetworkBaselineTest(unittest.TestCase):
+    """read_baseline, record_baseline and the savings in format_report"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "baseline.json")
+
+    def test_only_default_profile_reports_are_recorded(self):
+        """Lean scrapes do not replace the baseline they are measured by"""
+        record_baseline({"nutmeg": report("default", 10.0, 200, 4000)}, self.path)
+        record_baseline(
+            {
+                "nutmeg": report("lean", 4.0, 50, 1000),
+                "hargreaves": report("lean", 4.0, 50, 1000),
+            },
+            self.path,
+        )
+        self.assertEqual(
+            read_baseline(self.path),
+            {"nutmeg": {"seconds": 10.0, "requests": 200, "bytes": 4000 * 1024}},
+        )
+
+    def test_missing_baseline(self):
+        """No baseline has been recorded before the first default scrape"""
+        self.assertEqual(read_baseline(self.path), {})
+
+    def test_lean_savings_are_reported(self):
+        """A lean scrape reports what it saved against the default profile"""
+        record_baseline({"nutmeg": report("default", 10.0, 200, 4000)}, self.path)
+        lines = format_report(
+            {"nutmeg": report("lean", 4.0, 50, 1000)}, read_baseline(self.path)
+        ).splitlines()
+        self.assertEqual(
+            lines[1],
+            "    saved 6.0s (60%), 150 requests (75%), 3000 KiB (75%) "
+            + "against the default profile",
+        )
+
+    def test_default_scrapes_report_no_savings(self):
+        """A default scrape is not compared with itself"""
+        record_baseline({"nutmeg": report("default", 10.0, 200, 4000)}, self.path)
+        lines = format_report(
+            {"nutmeg": report("default", 9.0, 190, 3900)}, read_baseline(self.path)
+        ).splitlines()
+        self.assertEqual(len(lines), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
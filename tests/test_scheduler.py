@@ -0,0 +1,174 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from utils.runner import iter_sequential
+from utils.scheduler import (
+    RETRY_HOURS,
+    STALE_LOCK_HOURS,
+    RunLock,
+    Scheduler,
+    SyncLog,
+)
+
+NOW = datetime.datetime(2024, 5, 1, 9)
+
+
+class SchedulerTest(unittest.TestCase):
+    """The scheduler runs providers whose last sync is older than their interval,
+    and retries failed ones after the retry delay"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.sync_log = SyncLog(os.path.join(directory, "last_synced.json"))
+        self.scheduler = self.new_scheduler(directory)
+        self.providers = ["nutmeg", "hargreaves"]
+
+    def new_scheduler(self, directory):
+        """Return a scheduler using the test's sync log and a lock in the directory"""
+        return Scheduler(
+            {"hargreaves": 4},
+            lock_path=os.path.join(directory, "run.lock"),
+            sync_log=self.sync_log,
+        )
+
+    def tick(self, hours, synced):
+        """Tick the given hours after NOW, syncing the given providers as main.run
+        does. Returns the providers that were due"""
+        now = NOW + datetime.timedelta(hours=hours)
+        run = mock.Mock(side_effect=lambda due: self.sync_log.record(synced, now))
+        self.scheduler.tick(self.providers, run, now)
+        return run.call_args.args[0] if run.called else []
+
+    def test_everything_is_due_at_first(self):
+        """A provider never synced is due"""
+        self.assertEqual(self.scheduler.due(self.providers, NOW), self.providers)
+
+    def test_synced_providers_wait_for_their_interval(self):
+        """A synced provider is not due again until its interval has passed"""
+        self.assertEqual(self.tick(0, self.providers), self.providers)
+        self.assertEqual(self.tick(3, self.providers), [])
+        self.assertEqual(self.tick(4, ["hargreaves"]), ["hargreaves"])
+        self.assertEqual(self.tick(24, self.providers), self.providers)
+
+    def test_sync_times_outlive_the_daemon(self):
+        """A restarted daemon does not sync providers still fresh from a run made
+        before it, by itself or by hand"""
+        self.sync_log.record(["nutmeg"], NOW)
+        restarted = self.new_scheduler(os.path.dirname(self.sync_log.path))
+        self.assertEqual(
+            restarted.due(self.providers, NOW + datetime.timedelta(hours=1)),
+            ["hargreaves"],
+        )
+
+    def test_failed_providers_are_retried(self):
+        """A provider that was tried but not synced is due after the retry delay,
+        while the providers synced in the same run wait for their interval"""
+        self.assertEqual(self.tick(0, ["hargreaves"]), self.providers)
+        self.assertEqual(self.tick(RETRY_HOURS / 2, []), [])
+        self.assertEqual(self.tick(RETRY_HOURS, ["nutmeg"]), ["nutmeg"])
+        self.assertEqual(self.tick(RETRY_HOURS + 1, []), [])
+
+    def test_failed_runs_are_retried(self):
+        """A run that raises before syncing anything is retried after the delay"""
+        run = mock.Mock(side_effect=RuntimeError("The sheet is unreachable"))
+        with self.assertLogs(level="ERROR"):
+            self.scheduler.tick(self.providers, run, NOW)
+        self.assertEqual(self.scheduler.due(self.providers, NOW), [])
+        self.assertEqual(
+            self.scheduler.due(
+                self.providers, NOW + datetime.timedelta(hours=RETRY_HOURS)
+            ),
+            self.providers,
+        )
+
+    def test_locked_ticks_are_skipped(self):
+        """A tick while another run holds the lock runs nothing and is not an
+        attempt"""
+        run = mock.Mock()
+        with RunLock(self.scheduler.lock_path), self.assertLogs(level="WARNING"):
+            self.scheduler.tick(self.providers, run, NOW)
+        run.assert_not_called()
+        self.assertEqual(self.scheduler.due(self.providers, NOW), self.providers)
+
+
+class SyncLogTest(unittest.TestCase):
+    """The sync log keeps each provider's last sync time on disk"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "last_synced.json")
+
+    def test_sync_times_are_kept(self):
+        """Recorded times are read back by another log on the same file"""
+        SyncLog(self.path).record(["nutmeg", "shareworks"], NOW)
+        SyncLog(self.path).record(["shareworks"], NOW + datetime.timedelta(hours=1))
+
+        log = SyncLog(self.path)
+        self.assertEqual(log.get("nutmeg"), NOW)
+        self.assertEqual(log.get("shareworks"), NOW + datetime.timedelta(hours=1))
+        self.assertIsNone(log.get("hargreaves"))
+
+
+class RunLockTest(unittest.TestCase):
+    """Only one run can hold the run lock, unless it is stale"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "run.lock")
+
+    def test_lock_is_released(self):
+        """The lock file is removed when the run ends"""
+        with RunLock(self.path):
+            self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_lock_is_taken_over(self):
+        """A lock left behind by a crashed run is taken over"""
+        with open(self.path, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write("1 crashed\n")
+        stale = time.time() - STALE_LOCK_HOURS * 3600 - 60
+        os.utime(self.path, (stale, stale))
+
+        with self.assertLogs(level="WARNING"), RunLock(self.path):
+            self.assertGreater(os.path.getmtime(self.path), stale)
+
+
+class IterSequentialTest(unittest.TestCase):
+    """The sequential scrape quits the browser it shares between providers"""
+
+    def test_driver_is_quit(self):
+        """The shared driver is quit once the scrapes finish"""
+        driver = mock.MagicMock()
+        scraper = mock.Mock()
+        scraper.scrape_data.return_value = {"Transactions": []}
+        with mock.patch("utils.runner.create_driver", return_value=driver):
+            scrapes = list(iter_sequential({"nutmeg": scraper}, "lean"))
+
+        self.assertEqual([name for name, _, _ in scrapes], ["nutmeg"])
+        driver.quit.assert_called_once()
+
+    def test_driver_is_quit_when_the_run_stops(self):
+        """The shared driver is quit when the caller stops early"""
+        driver = mock.MagicMock()
+        scraper = mock.Mock()
+        scraper.scrape_data.return_value = {"Transactions": []}
+        with mock.patch("utils.runner.create_driver", return_value=driver):
+            scrapes = iter_sequential(
+                {"nutmeg": scraper, "shareworks": scraper}, "lean"
+            )
+            next(scrapes)
+            scrapes.close()
+
+        driver.quit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from cryptography.fernet import Fernet
+from selenium.webdriver.common.by import By
+
+from utils.sessions import SessionStore, drain_logins, log_in
+
+READY = (By.ID, "portfolio")
+
+COOKIES = [
+    {"name": "sid", "value": "abc", "domain": "example.com", "path": "/"},
+]
+
+
+class FakeDriver:
+    """A WebDriver that logs in when the login flow runs and only shows the ready
+    element to a logged in browser"""
+
+    def __init__(self):
+        self.cookies = []
+        self.logged_in = False
+        self.current_url = "about:blank"
+        self.visited = []
+
+    def execute_cdp_cmd(self, command, params):
+        """Set or return the browser's cookies"""
+        if command == "Network.setCookies":
+            self.cookies = list(params["cookies"])
+            self.logged_in = self.cookies == COOKIES
+            return {}
+        return {"cookies": [dict(cookie, session=True) for cookie in self.cookies]}
+
+    def get(self, url):
+        """Open a page, redirecting to the login page when not logged in"""
+        self.visited.append(url)
+        self.current_url = url if self.logged_in else "https://example.com/Login"
+
+    def find_elements(self, by, value):
+        """Return the ready element on a logged in page"""
+        return [object()] if self.logged_in and (by, value) == READY else []
+
+    def login(self):
+        """The provider's full login flow"""
+        self.cookies = list(COOKIES)
+        self.logged_in = True
+        self.current_url = "https://example.com/dashboard"
+
+
+class SessionStoreTest(unittest.TestCase):
+    """SessionStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = SessionStore(Fernet.generate_key(), self.directory)
+
+    def path(self, provider) -> str:
+        """Return the path of a provider's session file"""
+        return os.path.join(self.directory, provider + ".enc")
+
+    def test_round_trip(self):
+        """A saved session loads back with its cookies and page"""
+        self.store.save("nutmeg", COOKIES, "https://example.com/dashboard")
+        session = self.store.load("nutmeg")
+        self.assertEqual(session["cookies"], COOKIES)
+        self.assertEqual(session["url"], "https://example.com/dashboard")
+        self.assertIn("savedAt", session)
+
+    def test_saved_encrypted_for_the_owner(self):
+        """The session file is encrypted and only readable by its owner"""
+        self.store.save("nutmeg", COOKIES, "https://example.com/dashboard")
+        with open(self.path("nutmeg"), mode="rb") as filereader:
+            self.assertNotIn(b"sid", filereader.read())
+        self.assertEqual(stat.S_IMODE(os.stat(self.path("nutmeg")).st_mode), 0o600)
+
+    def test_missing_session(self):
+        """A provider without a saved session has none to load"""
+        self.assertIsNone(self.store.load("nutmeg"))
+
+    def test_corrupt_session_is_discarded(self):
+        """A session that cannot be decrypted is deleted rather than loaded"""
+        with open(self.path("nutmeg"), mode="wb") as filewriter:
+            filewriter.write(b"not a token")
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(self.store.load("nutmeg"))
+        self.assertFalse(os.path.exists(self.path("nutmeg")))
+
+    def test_other_key_is_discarded(self):
+        """A session saved with another key is unreadable"""
+        SessionStore(Fernet.generate_key(), self.directory).save(
+            "nutmeg", COOKIES, "https://example.com/dashboard"
+        )
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(self.store.load("nutmeg"))
+        self.assertFalse(os.path.exists(self.path("nutmeg")))
+
+
+class LogInTest(unittest.TestCase):
+    """log_in"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = SessionStore(Fernet.generate_key(), directory)
+        drain_logins()
+        self.addCleanup(drain_logins)
+
+    def log_in(self, driver, **options) -> tuple:
+        """Log the driver in and return whether the login was skipped and how many
+        times the full login ran"""
+        login = mock.Mock(side_effect=driver.login)
+        skipped = log_in(driver, self.store, "nutmeg", READY, login, **options)
+        return skipped, login.call_count
+
+    def test_first_login_saves_the_session(self):
+        """Without a saved session the full login runs and its session is saved"""
+        self.assertEqual(self.log_in(FakeDriver()), (False, 1))
+        self.assertEqual(self.store.load("nutmeg")["cookies"], COOKIES)
+        self.assertEqual(drain_logins(), {"nutmeg": "login"})
+
+    def test_valid_session_is_restored(self):
+        """A saved session that reaches the ready element skips the login"""
+        self.store.save("nutmeg", COOKIES, "https://example.com/dashboard")
+        driver = FakeDriver()
+        self.assertEqual(self.log_in(driver), (True, 0))
+        self.assertEqual(driver.visited, ["https://example.com/dashboard"])
+        self.assertEqual(drain_logins(), {"nutmeg": "restored"})
+
+    def test_probe_url(self):
+        """The session is probed on the given page instead of the saved one"""
+        self.store.save("nutmeg", COOKIES, "https://example.com/dashboard")
+        driver = FakeDriver()
+        self.assertEqual(
+            self.log_in(driver, probe_url="https://example.com/account"), (True, 0)
+        )
+        self.assertEqual(driver.visited, ["https://example.com/account"])
+
+    def test_expired_session_falls_back_to_login(self):
+        """A session redirected to the login page is replaced by a full login"""
+        expired = [dict(COOKIES[0], value="old")]
+        self.store.save("nutmeg", expired, "https://example.com/dashboard")
+        self.assertEqual(self.log_in(FakeDriver()), (False, 1))
+        self.assertEqual(self.store.load("nutmeg")["cookies"], COOKIES)
+        self.assertEqual(drain_logins(), {"nutmeg": "login"})
+
+    def test_probe_timeout_falls_back_to_login(self):
+        """A probe page that shows neither the ready element nor a login page in
+        time counts as expired"""
+        self.store.save("nutmeg", COOKIES, "https://example.com/dashboard")
+        driver = FakeDriver()
+        driver.find_elements = lambda by, value: []
+        driver.get = lambda url: setattr(driver, "current_url", url)
+        with mock.patch("utils.sessions.PROBE_TIMEOUT", 0):
+            self.assertEqual(self.log_in(driver), (False, 1))
+
+    def test_corrupt_session_falls_back_to_login(self):
+        """An unreadable session file is replaced by a full login"""
+        with open(
+            os.path.join(self.store.directory, "nutmeg.enc"), mode="wb"
+        ) as filewriter:
+            filewriter.write(b"not a token")
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(self.log_in(FakeDriver()), (False, 1))
+        self.assertEqual(self.store.load("nutmeg")["cookies"], COOKIES)
+
+    def test_without_a_store(self):
+        """Without a store the full login always runs and nothing is saved"""
+        driver = FakeDriver()
+        login = mock.Mock(side_effect=driver.login)
+        self.assertFalse(log_in(driver, None, "nutmeg", READY, login))
+        login.assert_called_once_with()
+        self.assertEqual(os.listdir(self.store.directory), [])
@@ -0,0 +1,97 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from main import run
+from utils.snapshots import SnapshotStore
+
+# Saving prunes the snapshots expired by the clock, so they are dated from now
+NOW = datetime.datetime.now()
+
+DATA = {
+    "transactions": [
+        {
+            "date": datetime.datetime(2024, 5, 1),
+            "transaction": "Deposit",
+            "pot": "Pot",
+            "amount": "10.00",
+        }
+    ],
+    "netContributions": "£1,000.00",
+    "currentValue": "£1,100.00",
+}
+
+
+def take_results(_secrets, results, _watermarks, **_options):
+    """Stand in for Moverperfect.insert_stream, taking the results unsynced"""
+    for _ in results:
+        pass
+    return {}, {}
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    """SnapshotStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = SnapshotStore(self.directory, ttl_hours=24)
+
+    def test_latest_snapshot_round_trips(self):
+        """The newest snapshot is returned with its dates decoded"""
+        self.store.save("nutmeg", {"old": True}, NOW - datetime.timedelta(hours=2))
+        self.store.save("nutmeg", DATA, NOW - datetime.timedelta(hours=1))
+        self.assertEqual(
+            self.store.latest("nutmeg", NOW),
+            (DATA, NOW - datetime.timedelta(hours=1)),
+        )
+
+    def test_expired_snapshots_are_not_returned(self):
+        """A snapshot older than the TTL is not fresh"""
+        self.store.save("nutmeg", DATA, NOW - datetime.timedelta(hours=25))
+        self.assertIsNone(self.store.latest("nutmeg", NOW))
+
+        self.store.save("nutmeg", DATA, NOW - datetime.timedelta(hours=5))
+        self.assertIsNotNone(self.store.latest("nutmeg", NOW))
+
+    def test_expired_snapshots_are_pruned(self):
+        """Saving a snapshot removes the provider's expired ones"""
+        self.store.save("nutmeg", DATA, NOW - datetime.timedelta(hours=25))
+        self.store.save("nutmeg", DATA, NOW)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, "nutmeg"))), 1)
+
+    def test_older_versions_are_not_replayed(self):
+        """Snapshots of version 1, which could hold the placeholder data of a
+        failed scrape, are never returned"""
+        path = self.store.save("shareworks", DATA, NOW - datetime.timedelta(hours=1))
+        with open(path, mode="r", encoding="UTF-8") as filereader:
+            snapshot = json.loads(filereader.read())
+        snapshot.update(version=1, data={"transactionData": 0, "sharePrice": 0})
+        with open(path, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write(json.dumps(snapshot))
+        self.assertIsNone(self.store.latest("shareworks", NOW))
+
+    def test_failed_scrapes_are_not_snapshotted(self):
+        """A run only snapshots the providers whose scrape succeeded"""
+        args = argparse.Namespace(
+            replay=False, pool=None, parallel=False, profile="lean", no_mirror=False
+        )
+        scrapes = [("nutmeg", DATA, None), ("shareworks", None, None)]
+        with mock.patch("main.iter_sequential", return_value=iter(scrapes)), mock.patch(
+            "main.Moverperfect.insert_stream", side_effect=take_results
+        ), contextlib.redirect_stdout(io.StringIO()):
+            run(args, {}, {"nutmeg": None, "shareworks": None}, self.store, None)
+
+        self.assertIsNotNone(self.store.latest("nutmeg"))
+        self.assertIsNone(self.store.latest("shareworks"))
+
+
+if __name__ == "__main__":
+    unittest.main()
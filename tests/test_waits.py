@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+
+from selenium.webdriver.common.by import By
+
+from utils.waits import QUIET_SECONDS, RowCountStable
+
+ROWS = (By.XPATH, "//tbody/tr")
+
+
+class FakeTable:
+    """A driver whose table has the given number of rows"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def find_elements(self, by, value):
+        """Return the table's rows"""
+        assert (by, value) == ROWS
+        return [object()] * self.rows
+
+
+class RowCountStableTest(unittest.TestCase):
+    """RowCountStable"""
+
+    def setUp(self):
+        self.now = 0.0
+        patcher = mock.patch("utils.waits.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.table = FakeTable()
+
+    def poll(self, condition, seconds) -> bool:
+        """Poll the condition after the given seconds"""
+        self.now += seconds
+        return condition(self.table)
+
+    def test_settles_once_the_count_is_quiet(self):
+        """The condition holds once the row count stops changing"""
+        condition = RowCountStable(ROWS)
+        self.table.rows = 5
+        self.assertFalse(self.poll(condition, 0))
+        self.table.rows = 10
+        self.assertFalse(self.poll(condition, QUIET_SECONDS))
+        self.assertFalse(self.poll(condition, QUIET_SECONDS / 2))
+        self.assertTrue(self.poll(condition, QUIET_SECONDS / 2))
+
+    def test_empty_table_does_not_settle(self):
+        """A table that has not rendered its rows yet is not settled"""
+        condition = RowCountStable(ROWS)
+        self.assertFalse(self.poll(condition, 0))
+        self.assertFalse(self.poll(condition, QUIET_SECONDS * 10))
+
+    def test_empty_table_can_be_allowed(self):
+        """With a minimum of zero an empty table settles"""
+        condition = RowCountStable(ROWS, 0)
+        self.assertFalse(self.poll(condition, 0))
+        self.assertTrue(self.poll(condition, QUIET_SECONDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from cryptography.fernet import Fernet
+
+from main import build_scrapers
+from utils.watermarks import WatermarkStore
+
+SECRETS = {
+    "NUTMEG_EMAIL": "email",
+    "NUTMEG_PASSWORD": "password",
+    "SHAREWORKS_HOST": "example.com",
+    "SHAREWORKS_USERNAME": "username",
+    "SHAREWORKS_PASSWORD": "password",
+    "HARGREAVES_USERNAME": "username",
+    "HARGREAVES_DOB": "01/01/70",
+    "HARGREAVES_PASSWORD": "password",
+    "HARGREAVES_SECRET_NUMBER": "123456",
+    "HARGREAVES_ACCOUNTS": ["01", "02"],
+    "STANDARDLIFE_USERNAME": "username",
+    "STANDARDLIFE_PASSWORD": "password",
+    "SESSION_KEY": Fernet.generate_key().decode(),
+}
+
+
+class WatermarkStoreTest(unittest.TestCase):
+    """WatermarkStore"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "watermarks.json")
+        self.store = WatermarkStore(self.path)
+
+    def test_unsynced_provider(self):
+        """A provider never synced has no watermark"""
+        self.assertIsNone(self.store.get("nutmeg"))
+
+    def test_watermarks_only_move_forward(self):
+        """An older date does not move the watermark back"""
+        self.store.advance("nutmeg", datetime.datetime(2024, 5, 2))
+        self.store.advance("nutmeg", datetime.datetime(2024, 5, 1))
+        self.assertEqual(self.store.get("nutmeg"), datetime.datetime(2024, 5, 2))
+
+    def test_accounts_are_kept_apart(self):
+        """Each account of a provider has its own watermark"""
+        self.store.advance("hargreaves", datetime.datetime(2024, 5, 2), "01")
+        self.assertEqual(
+            self.store.get("hargreaves", "01"), datetime.datetime(2024, 5, 2)
+        )
+        self.assertIsNone(self.store.get("hargreaves", "02"))
+
+    def test_unpickled_store_reads_the_same_file(self):
+        """A store sent to a worker process reads and advances the same file"""
+        copy = pickle.loads(pickle.dumps(self.store))
+        copy.advance("nutmeg", datetime.datetime(2024, 5, 2))
+        self.assertEqual(self.store.get("nutmeg"), datetime.datetime(2024, 5, 2))
+        self.assertIsNot(copy.lock, self.store.lock)
+
+    def test_scrapers_can_be_sent_to_worker_processes(self):
+        """Parallel mode pickles every scraper, with its watermarks and sessions"""
+        scrapers = build_scrapers(
+            SECRETS, capture=True, fast_path=True, watermarks=self.store
+        )
+        for name, scraper in scrapers.items():
+            with self.subTest(name):
+                copy = pickle.loads(pickle.dumps(scraper))
+                self.assertEqual(copy.watermarks.path, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
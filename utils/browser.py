@@ -0,0 +1,118 @@
+import contextlib
+import json
+import os
+import weakref
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+# Scraping profiles: "default" is a visible maximised browser, "lean" is headless
+# with images disabled and third-party trackers and consent assets blocked
+PROFILES = ("default", "lean")
+
+# URL patterns blocked with Network.setBlockedURLs in the lean profile
+BLOCKED_URLS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*omtrdc.net*",
+    "*demdex.net*",
+    "*adobedtm.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*optimizely.com*",
+    "*bat.bing.com*",
+    "*px.ads.linkedin.com*",
+    "*cookielaw.org*",
+    "*onetrust.com*",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+]
+
+# Blocked patterns a provider still needs, keyed by provider name
+PROVIDER_ALLOWLIST = {
+    # The Nutmeg login waits for and clicks the OneTrust accept button
+    "nutmeg": ["*cookielaw.org*", "*onetrust.com*"],
+}
+
+# The performance log events drained from each driver since its last network
+# report. The log can only be read once, so everything that needs the events
+# reads them through collect_events
+_EVENTS = weakref.WeakKeyDictionary()
+
+
+def driver_options(profile="default", user_data_dir=None):
+    """Return the Chrome options of a scraping profile, keeping the browser's
+    profile and HTTP cache in user_data_dir if one is given"""
+    options = ChromeOptions()
+
+    if user_data_dir is not None:
+        options.add_argument(f"--user-data-dir={os.path.abspath(user_data_dir)}")
+
+    if profile == "lean":
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,900")
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    else:
+        options.add_argument("--start-maximized")
+
+    # Record network events so each provider's transfer can be reported
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    return options
+
+
+def create_driver(profile="default"):
+    """Launch Chrome with the given scraping profile"""
+    return webdriver.Chrome(options=driver_options(profile))
+
+
+def prepare_driver(driver, profile, provider):
+    """Apply the provider's URL blocklist to the driver in the lean profile"""
+    if profile != "lean":
+        return
+
+    allowed = PROVIDER_ALLOWLIST.get(provider, [])
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd(
+        "Network.setBlockedURLs",
+        {"urls": [pattern for pattern in BLOCKED_URLS if pattern not in allowed]},
+    )
+
+
+def collect_events(driver) -> list:
+    """Drain the driver's performance log and return the DevTools messages logged
+    since its last network report"""
+    events = _EVENTS.setdefault(driver, [])
+
+    with contextlib.suppress(Exception):
+        for entry in driver.get_log("performance"):
+            events.append(json.loads(entry["message"])["message"])
+
+    return events
+
+
+def network_report(driver) -> dict:
+    """Summarise the network traffic since the last report: requests made, requests
+    blocked and bytes transferred"""
+    report = {"requests": 0, "blocked": 0, "bytes": 0}
+
+    for message in collect_events(driver):
+        if message["method"] == "Network.requestWillBeSent":
+            report["requests"] += 1
+        elif message["method"] == "Network.loadingFinished":
+            report["bytes"] += int(message["params"].get("encodedDataLength", 0))
+        elif message["method"] == "Network.loadingFailed":
+            if message["params"].get("blockedReason"):
+                report["blocked"] += 1
+
+    # Start the next report from an empty log
+    _EVENTS.pop(driver, None)
+    return report
@@ -0,0 +1,76 @@
+import base64
+import json
+import logging
+import re
+
+from selenium.common.exceptions import TimeoutException
+
+from utils.browser import collect_events
+from utils.waits import wait_for
+
+# Seconds to wait for a captured response before falling back to the DOM
+CAPTURE_TIMEOUT = 10
+
+
+def json_responses(driver, url_pattern) -> list:
+    """Return the decoded bodies of the JSON responses, with URLs matching the
+    pattern, that have finished loading since the driver's last network report"""
+    responses = {}
+    finished = set()
+
+    for message in collect_events(driver):
+        params = message["params"]
+        if message["method"] == "Network.responseReceived":
+            response = params["response"]
+            if "json" in response.get("mimeType", "") and re.search(
+                url_pattern, response["url"]
+            ):
+                responses[params["requestId"]] = response["url"]
+        elif message["method"] == "Network.loadingFinished":
+            finished.add(params["requestId"])
+
+    bodies = []
+    for request_id, url in responses.items():
+        if request_id not in finished:
+            continue
+        try:
+            result = driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id}
+            )
+            body = result["body"]
+            if result.get("base64Encoded"):
+                body = base64.b64decode(body).decode("UTF-8")
+            bodies.append(json.loads(body))
+        except Exception as exception:
+            # The body may have been evicted from the browser's buffer
+            logging.warning("Could not read the response from %s: %s", url, exception)
+    return bodies
+
+
+def wait_for_json(driver, label, url_pattern, timeout=CAPTURE_TIMEOUT) -> list:
+    """Wait until JSON responses with URLs matching the pattern have been captured
+    and return their decoded bodies, or an empty list if none arrive in time"""
+    try:
+        return wait_for(
+            driver,
+            label,
+            lambda d: json_responses(d, url_pattern),
+            timeout=timeout,
+        )
+    except TimeoutException:
+        return []
+
+
+def parse_captured(driver, label, url_pattern, parser):
+    """Parse the captured JSON responses with URLs matching the pattern. Returns
+    None, so the caller can fall back to the DOM, when no response was captured or
+    the parser does not recognise it"""
+    payloads = wait_for_json(driver, label, url_pattern)
+    if not payloads:
+        return None
+
+    try:
+        return parser(payloads)
+    except (AttributeError, KeyError, TypeError, ValueError) as exception:
+        logging.warning("Could not parse the captured %s: %s", label, exception)
+        return None
@@ -0,0 +1,419 @@
+import argparse
+import collections
+import contextlib
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+
+from utils.browser import driver_options
+
+# Where the daemon listens and main.py finds it by default
+DEFAULT_POOL_URL = "http://127.0.0.1:9230"
+
+# Sessions are replaced after this many leases, or once the JS heap of the page
+# they were left on grows past this many MiB
+DEFAULT_MAX_USES = 20
+DEFAULT_MAX_HEAP_MB = 512
+
+# Seconds between health checks of the idle sessions, and seconds after which a
+# lease that was never released is reclaimed
+HEALTH_CHECK_SECONDS = 60
+LEASE_TIMEOUT = 900
+
+# Each provider's Chrome profile, with its HTTP cache, is kept here across
+# recycles and daemon restarts
+PROFILES_DIRECTORY = "./browser_profiles"
+
+
+class PoolBusy(Exception):
+    """Raised when a provider's session is already leased"""
+
+
+class PooledSession:
+    """A warm Chrome session kept for one provider, with its own chromedriver"""
+
+    def __init__(self, provider, profile, directory):
+        """Launch Chrome for the provider with its persistent browser profile"""
+        self.provider = provider
+        self.profile = profile
+        self.driver = webdriver.Chrome(
+            options=driver_options(profile, os.path.join(directory, provider))
+        )
+        self.created_at = time.monotonic()
+        self.leased_at = None
+        self.uses = 0
+
+    def describe(self) -> dict:
+        """Return what a client needs to attach to the session"""
+        return {
+            "url": self.driver.service.service_url,
+            "sessionId": self.driver.session_id,
+            "capabilities": self.driver.caps,
+        }
+
+    def healthy(self) -> bool:
+        """Check the browser still answers WebDriver commands"""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def heap_mb(self) -> float:
+        """Return the MiB of JS heap used by the page the session is on"""
+        usage = self.driver.execute_cdp_cmd("Runtime.getHeapUsage", {})
+        return usage["usedSize"] / 2**20
+
+    def quit(self):
+        """Quit Chrome and its chromedriver"""
+        with contextlib.suppress(Exception):
+            self.driver.quit()
+
+
+class DriverPool:
+    """Warm Chrome sessions leased to the scrapers, one per provider"""
+
+    # The recycling limits, the sessions with their locks and each counter reported
+    # by metrics() are their own attributes
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        max_uses=DEFAULT_MAX_USES,
+        max_heap_mb=DEFAULT_MAX_HEAP_MB,
+        directory=PROFILES_DIRECTORY,
+    ):
+        """Recycle sessions after max_uses leases or past max_heap_mb of JS heap,
+        keeping the browser profiles in the directory"""
+        self.max_uses = max_uses
+        self.max_heap_mb = max_heap_mb
+        self.directory = directory
+        self.sessions = {}
+
+        # One lock per provider so a slow Chrome launch only holds up its own
+        # provider, and one guarding the sessions, locks and counters
+        self.provider_locks = collections.defaultdict(threading.Lock)
+        self.lock = threading.Lock()
+
+        # Counters reported by metrics()
+        self.counters = collections.Counter()
+        self.recycles = collections.Counter()
+        self.launch_seconds = 0.0
+
+    def lease(self, provider, profile) -> dict:
+        """Lease the provider's session, launching or replacing it if needed.
+        Returns what a client needs to attach to it"""
+        with self.__provider_lock(provider):
+            session = self.sessions.get(provider)
+            if session is not None and session.leased_at is not None:
+                self.__count("leasesRejected")
+                raise PoolBusy(f"The {provider} session is already leased")
+
+            # A session launched with another profile or no longer answering is
+            # replaced before it is handed out
+            if session is not None and session.profile != profile:
+                self.__recycle(session, "profile")
+                session = None
+            elif session is not None and not session.healthy():
+                self.__count("healthFailures")
+                self.__recycle(session, "health")
+                session = None
+
+            if session is None:
+                session = self.__launch(provider, profile)
+                self.__count("coldLeases")
+            else:
+                self.__count("warmLeases")
+
+            session.leased_at = time.monotonic()
+            session.uses += 1
+            return session.describe()
+
+    def release(self, provider):
+        """Take back the provider's session, recycling it if it has been used too
+        often, its heap has grown too large or it no longer answers"""
+        with self.__provider_lock(provider):
+            session = self.sessions.get(provider)
+            if session is None or session.leased_at is None:
+                return
+            session.leased_at = None
+            self.__count("releases")
+
+            reason = None
+            if session.uses >= self.max_uses:
+                reason = "uses"
+            elif not session.healthy():
+                self.__count("healthFailures")
+                reason = "health"
+            elif session.heap_mb() > self.max_heap_mb:
+                reason = "memory"
+
+            if reason is not None:
+                self.__recycle(session, reason)
+
+                # Launch the replacement in the background so it is warm by the
+                # next lease without holding up this release
+                threading.Thread(
+                    target=self.__replace,
+                    args=(provider, session.profile),
+                    daemon=True,
+                ).start()
+
+    def check(self):
+        """Recycle idle sessions that stopped answering and reclaim leases that were
+        never released"""
+        # Sessions are launched and recycled while the pool is checked
+        with self.lock:
+            providers = list(self.sessions)
+
+        for provider in providers:
+            lock = self.__provider_lock(provider)
+
+            # A provider being leased or launched is checked on the next pass
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                session = self.sessions.get(provider)
+                if session is None:
+                    continue
+                if session.leased_at is None:
+                    if not session.healthy():
+                        self.__count("healthFailures")
+                        self.__recycle(session, "health")
+                elif time.monotonic() - session.leased_at > LEASE_TIMEOUT:
+                    self.__recycle(session, "expired")
+            finally:
+                lock.release()
+
+    def metrics(self) -> dict:
+        """Return the pool's counters and the state of each session"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                **self.counters,
+                "recycles": dict(self.recycles),
+                "launchSeconds": round(self.launch_seconds, 3),
+                "sessions": {
+                    provider: {
+                        "profile": session.profile,
+                        "uses": session.uses,
+                        "leased": session.leased_at is not None,
+                        "ageSeconds": round(now - session.created_at),
+                    }
+                    for provider, session in self.sessions.items()
+                },
+            }
+
+    def close(self):
+        """Quit every session"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions = {}
+        for session in sessions:
+            session.quit()
+
+    def __provider_lock(self, provider) -> threading.Lock:
+        """Return the lock of a provider's session"""
+        with self.lock:
+            return self.provider_locks[provider]
+
+    def __count(self, name):
+        """Add one to a counter"""
+        with self.lock:
+            self.counters[name] += 1
+
+    def __launch(self, provider, profile) -> PooledSession:
+        """Launch a session for the provider, with its provider lock held"""
+        start = time.perf_counter()
+        session = PooledSession(provider, profile, self.directory)
+        with self.lock:
+            self.sessions[provider] = session
+            self.counters["launches"] += 1
+            self.launch_seconds += time.perf_counter() - start
+        return session
+
+    def __replace(self, provider, profile):
+        """Launch a replacement for a recycled session unless one was leased first"""
+        with self.__provider_lock(provider):
+            if provider in self.sessions:
+                return
+            try:
+                self.__launch(provider, profile)
+            except WebDriverException as exception:
+                logging.error(
+                    "Relaunching the %s session failed: %s", provider, exception
+                )
+
+    def __recycle(self, session, reason):
+        """Quit a session and forget it, with its provider lock held"""
+        session.quit()
+        with self.lock:
+            self.sessions.pop(session.provider, None)
+            self.recycles[reason] += 1
+
+
+class _PoolHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the pool's lease, release and metrics requests as JSON"""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the pool's metrics"""
+        if self.path == "/metrics":
+            self.__respond(200, self.server.pool.metrics())
+        else:
+            self.__respond(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Lease or release a provider's session"""
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        try:
+            if self.path == "/lease":
+                self.__respond(
+                    200, self.server.pool.lease(body["provider"], body["profile"])
+                )
+            elif self.path == "/release":
+                self.server.pool.release(body["provider"])
+                self.__respond(200, {})
+            else:
+                self.__respond(404, {"error": f"Unknown path {self.path}"})
+        except PoolBusy as exception:
+            self.__respond(409, {"error": str(exception)})
+        except (KeyError, WebDriverException) as exception:
+            self.__respond(500, {"error": str(exception)})
+
+    def __respond(self, status, body):
+        """Send a JSON response"""
+        payload = json.dumps(body).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep the requests out of the daemon's output"""
+
+
+class PooledDriver(webdriver.Remote):
+    """A driver attached to a Chrome session leased from the pool"""
+
+    def __init__(self, url, session_id, capabilities):
+        """Attach to the session with the given id on the chromedriver at url"""
+        self.__lease = (session_id, capabilities)
+        super().__init__(
+            command_executor=ChromeRemoteConnection(url), options=ChromeOptions()
+        )
+
+    def start_session(self, capabilities):
+        """Attach to the leased session instead of starting a new one"""
+        self.session_id, self.caps = self.__lease
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        """Send a Chrome DevTools Protocol command, as webdriver.Chrome does"""
+        return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})[
+            "value"
+        ]
+
+
+class PoolClient:
+    """Leases drivers from a running pool daemon"""
+
+    def __init__(self, url=DEFAULT_POOL_URL):
+        """Use the pool daemon listening at the given URL"""
+        self.url = url.rstrip("/")
+
+    @contextlib.contextmanager
+    def lease(self, provider, profile="default"):
+        """Lease the provider's session for the block and release it afterwards"""
+        lease = self.__request("/lease", {"provider": provider, "profile": profile})
+        driver = PooledDriver(lease["url"], lease["sessionId"], lease["capabilities"])
+        try:
+            yield driver
+        finally:
+            self.__request("/release", {"provider": provider})
+
+    def metrics(self) -> dict:
+        """Return the pool's metrics"""
+        return self.__request("/metrics")
+
+    def __request(self, path, body=None) -> dict:
+        """Send a request to the daemon and return its JSON response"""
+        request = urllib.request.Request(
+            self.url + path,
+            data=None if body is None else json.dumps(body).encode("UTF-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exception:
+            message = json.loads(exception.read()).get("error", exception.reason)
+            raise RuntimeError(f"Driver pool {path} failed: {message}") from exception
+
+
+def serve(pool, url=DEFAULT_POOL_URL):
+    """Serve the pool at the URL and health check it until interrupted"""
+    host, port = urllib.parse.urlsplit(url).netloc.split(":")
+    server = http.server.ThreadingHTTPServer((host, int(port)), _PoolHandler)
+    server.pool = pool
+
+    def health_checks():
+        while True:
+            time.sleep(HEALTH_CHECK_SECONDS)
+            pool.check()
+
+    threading.Thread(target=health_checks, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+
+
+def parse_args():
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(
+        description="Keep warm Chrome sessions for the scrapers to lease"
+    )
+    parser.add_argument("--url", default=DEFAULT_POOL_URL, help="address to serve on")
+    parser.add_argument(
+        "--max-uses",
+        type=int,
+        default=DEFAULT_MAX_USES,
+        help="leases before a session is replaced",
+    )
+    parser.add_argument(
+        "--max-heap-mb",
+        type=int,
+        default=DEFAULT_MAX_HEAP_MB,
+        help="MiB of JS heap after which a released session is replaced",
+    )
+    parser.add_argument(
+        "--profiles",
+        default=PROFILES_DIRECTORY,
+        help="directory the providers' browser profiles are kept in",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Run the pool daemon until interrupted"""
+    args = parse_args()
+    serve(DriverPool(args.max_uses, args.max_heap_mb, args.profiles), args.url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import concurrent.futures
+import logging
+
+import requests
+
+# Number of pages fetched at once over the pooled session
+DEFAULT_MAX_WORKERS = 4
+
+# Seconds allowed for each page
+REQUEST_TIMEOUT = 30
+
+
+def session_from_driver(driver, max_workers=DEFAULT_MAX_WORKERS) -> requests.Session:
+    """Return an HTTP session that carries the logged in driver's cookies and user
+    agent, with a connection pool sized for the concurrent fetches"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
+    for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie["domain"],
+            path=cookie.get("path", "/"),
+        )
+    return session
+
+
+def fetch_all(session, urls, max_workers=DEFAULT_MAX_WORKERS) -> dict:
+    """Fetch the pages concurrently and return their HTML keyed by URL. A page that
+    fails, or is redirected to a login page, maps to None"""
+
+    def fetch(url):
+        response = session.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        if "login" in response.url.lower():
+            raise requests.HTTPError(f"redirected to {response.url}")
+        return response.text
+
+    pages = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, url): url for url in urls}
+        for future in concurrent.futures.as_completed(futures):
+            url = futures[future]
+            try:
+                pages[url] = future.result()
+            except requests.RequestException as exception:
+                logging.warning("Could not fetch %s: %s", url, exception)
+                pages[url] = None
+    return pages
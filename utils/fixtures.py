@@ -0,0 +1,148 @@
+import calendar
+import functools
+import http.server
+import os
+import re
+import threading
+
+from lxml import html
+
+# When set, the scrapers save each page they extract data from into this directory
+RECORD_DIR_ENV = "UPDATE_FINANCE_RECORD_DIR"
+
+# Elements dropped from recorded pages, they carry tokens and tracking but no data
+DROPPED_TAGS = ("script", "noscript", "style", "link", "meta", "iframe", "object")
+
+# Text replaced in the attributes of recorded pages: email addresses and runs of
+# eight or more digits, such as account and reference numbers
+REDACTED_PATTERNS = [
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),
+    re.compile(r"\d{8,}"),
+]
+
+# Attributes read as text, masked like the text of the page
+TEXT_ATTRIBUTES = ("aria-label", "alt", "title", "placeholder")
+
+# The only words kept in the text of recorded pages, those the parsers read dates
+# from. The number following one of them, a day or a year, is kept too
+KEPT_WORDS = sorted(
+    {
+        word
+        for month in calendar.month_name[1:]
+        for word in (month, month[:3], month[:4])
+    }
+    | {"Day"}
+)
+
+# Every other letter is masked as x and every other digit as 0, so names, addresses,
+# postcodes, account numbers and amounts are removed but keep the shape the parsers
+# expect. Dates are kept whole
+MASKED_TEXT = re.compile(
+    r"(?P<date>\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2}|\d{1,2}-[^\W\d_]{3}-\d{4})"
+    + rf"|(?P<kept>(?i:\b(?:{'|'.join(KEPT_WORDS)})\b)(?:\s+\d{{1,4}}(?!\d))?)"
+    + r"|(?P<word>[^\W\d_]+)"
+    + r"|\d"
+)
+
+
+def start_recording(directory):
+    """Record the pages scraped by this process and the worker processes it starts"""
+    os.environ[RECORD_DIR_ENV] = os.path.abspath(directory)
+
+
+def record_page(driver, provider, page):
+    """Save the sanitized source of the driver's current document (the current
+    frame when switched into an iframe) if recording is on"""
+    directory = os.environ.get(RECORD_DIR_ENV)
+    if not directory:
+        return
+
+    folder = os.path.join(directory, provider)
+    os.makedirs(folder, exist_ok=True)
+    with open(
+        os.path.join(folder, page + ".html"), mode="w", encoding="UTF-8"
+    ) as filewriter:
+        filewriter.write(sanitize_html(driver.page_source))
+
+
+def sanitize_html(source: str) -> str:
+    """Strip scripts, comments and form values from a page source and mask its text,
+    keeping the structure and the dates the parsers read"""
+    document = html.fromstring(source)
+
+    # Dropping an element keeps the text that follows it
+    for element in list(document.iter()):
+        if isinstance(element, html.HtmlComment) or element.tag in DROPPED_TAGS:
+            element.drop_tree()
+
+    for element in document.iter():
+        if not isinstance(element.tag, str):
+            continue
+        if element.tag == "input":
+            element.attrib.pop("value", None)
+        for name in list(element.attrib):
+            if name.startswith("on") or name in ("href", "src", "action"):
+                del element.attrib[name]
+            elif name in TEXT_ATTRIBUTES:
+                element.attrib[name] = _mask(element.attrib[name])
+            else:
+                element.attrib[name] = _redact(element.attrib[name])
+        element.text = _mask(element.text)
+        element.tail = _mask(element.tail)
+
+    return html.tostring(document, encoding="unicode", doctype="<!DOCTYPE html>")
+
+
+def _mask(text):
+    """Mask the letters and digits of a text, except its dates"""
+    if not text:
+        return text
+    return MASKED_TEXT.sub(_mask_match, text)
+
+
+def _mask_match(match) -> str:
+    """Return the masked form of a date, word or digit matched in a text"""
+    if match["word"] is not None:
+        return "".join("X" if letter.isupper() else "x" for letter in match["word"])
+    if match["date"] is None and match["kept"] is None:
+        return "0"
+    return match[0]
+
+
+def _redact(text):
+    """Replace the identifying parts of an attribute value with REDACTED"""
+    if not text:
+        return text
+    for pattern in REDACTED_PATTERNS:
+        text = pattern.sub("REDACTED", text)
+    return text
+
+
+class FixtureServer:
+    """A local HTTP server that serves recorded or generated pages to a driver"""
+
+    def __init__(self, directory):
+        """Serve the files in the directory on a free local port"""
+        handler = functools.partial(_QuietHandler, directory=directory)
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path) -> str:
+        """Return the URL a fixture path is served at"""
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files without logging every request"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
@@ -0,0 +1,214 @@
+import concurrent.futures
+import contextlib
+import json
+import logging
+import threading
+import time
+
+from utils.browser import create_driver, network_report, prepare_driver
+from utils.sessions import drain_logins
+from utils.waits import drain_waits
+
+# Default number of providers scraped at once and seconds allowed for each
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 600
+
+# Each provider's seconds, requests and bytes in its last scrape with the default
+# profile, which the savings of the lean profile are reported against
+BASELINE_PATH = "./network_baseline.json"
+BASELINE_FIGURES = ("seconds", "requests", "bytes")
+
+
+def scrape_with_driver(name, scraper, driver, profile):
+    """Scrape a provider with an existing driver.
+    Returns the scraped data and a report of the seconds and traffic it took"""
+    start = time.perf_counter()
+    prepare_driver(driver, profile, name)
+
+    # Discard traffic, waits and logins logged before this provider started
+    network_report(driver)
+    drain_waits()
+    drain_logins()
+
+    data = scraper.scrape_data(driver)
+
+    report = network_report(driver)
+    report["profile"] = profile
+    report["seconds"] = time.perf_counter() - start
+    report["waits"] = drain_waits()
+    report["login"] = drain_logins().get(name, "none")
+    return data, report
+
+
+@contextlib.contextmanager
+def provider_driver(name, profile, pool=None):
+    """Yield a driver for a provider: its session leased from the pool if one is
+    given, otherwise a Chrome instance launched for it and quit afterwards"""
+    if pool is not None:
+        with pool.lease(name, profile) as driver:
+            yield driver
+        return
+
+    driver = create_driver(profile)
+    try:
+        yield driver
+    finally:
+        with contextlib.suppress(Exception):
+            driver.quit()
+
+
+def scrape_provider(name, scraper, timeout, profile, pool=None):
+    """Scrape a single provider in its own Chrome instance, or its pooled session.
+    Returns the scraped data and a report of the seconds and traffic it took"""
+    with provider_driver(name, profile, pool) as driver:
+        # Quitting the browser when the timeout passes makes the next WebDriver call
+        # fail, so the scraper returns None as a failed scrape instead of hanging.
+        # The pool replaces a quit session when it next checks it
+        watchdog = threading.Timer(timeout, driver.quit)
+        watchdog.start()
+        try:
+            return scrape_with_driver(name, scraper, driver, profile)
+        finally:
+            watchdog.cancel()
+
+
+def iter_sequential(scrapers, profile="default", pool=None):
+    """Scrape each provider in turn with one shared driver, or with each provider's
+    pooled session. Yields the name, scraped data and report of each provider as
+    soon as it finishes"""
+    if pool is not None:
+        for name, scraper in scrapers.items():
+            with provider_driver(name, profile, pool) as driver:
+                data, report = scrape_with_driver(name, scraper, driver, profile)
+            yield name, data, report
+        return
+
+    driver = create_driver(profile)
+    try:
+        for name, scraper in scrapers.items():
+            data, report = scrape_with_driver(name, scraper, driver, profile)
+            yield name, data, report
+    finally:
+        with contextlib.suppress(Exception):
+            driver.quit()
+
+
+def iter_parallel(
+    scrapers,
+    max_workers=DEFAULT_MAX_WORKERS,
+    timeout=DEFAULT_TIMEOUT,
+    profile="default",
+    pool=None,
+):
+    """Scrape the providers at the same time, each in its own worker process with
+    its own Chrome instance or pooled session. Yields the name, scraped data and
+    report of each provider as soon as it finishes, with None for the data and
+    report of a provider whose worker failed"""
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                scrape_provider, name, scraper, timeout, profile, pool
+            ): name
+            for name, scraper in scrapers.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                data, report = future.result()
+            except Exception as exception:
+                logging.error("%s scrape failed: %s", name, exception)
+                data, report = None, None
+            yield name, data, report
+
+
+def read_baseline(path=BASELINE_PATH) -> dict:
+    """Return the recorded default profile figures, keyed by provider name"""
+    try:
+        with open(path, mode="r", encoding="UTF-8") as filereader:
+            return json.loads(filereader.read())
+    except FileNotFoundError:
+        return {}
+
+
+def record_baseline(reports, path=BASELINE_PATH):
+    """Record the figures of the default profile reports as the baseline"""
+    baseline = read_baseline(path)
+    for name, report in reports.items():
+        if report.get("profile") == "default":
+            baseline[name] = {figure: report[figure] for figure in BASELINE_FIGURES}
+    with open(path, mode="w", encoding="UTF-8") as filewriter:
+        filewriter.write(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def format_savings(report, baseline) -> str:
+    """Format how much less time, requests and bytes a report took than its
+    provider's default profile baseline"""
+
+    def saved(figure):
+        difference = baseline[figure] - report[figure]
+        percent = 100 * difference / baseline[figure] if baseline[figure] else 0
+        return difference, percent
+
+    seconds, seconds_percent = saved("seconds")
+    requests, requests_percent = saved("requests")
+    transferred, bytes_percent = saved("bytes")
+    return (
+        f"saved {seconds:.1f}s ({seconds_percent:.0f}%), "
+        + f"{requests} requests ({requests_percent:.0f}%), "
+        + f"{transferred / 1024:.0f} KiB ({bytes_percent:.0f}%) "
+        + "against the default profile"
+    )
+
+
+def format_report(reports, baseline=None) -> str:
+    """Format the per-provider reports as one line per provider, followed by one
+    indented line per readiness wait and, for a provider scraped with another
+    profile than the default, what it saved against the baseline. Ends with a count
+    of the skipped logins"""
+    baseline = baseline or {}
+    lines = []
+    for name, report in reports.items():
+        waited = sum(seconds for _, seconds in report["waits"])
+        lines.append(
+            f"{name}: {report['seconds']:.1f}s, {report['requests']} requests, "
+            + f"{report['blocked']} blocked, {report['bytes'] / 1024:.0f} KiB, "
+            + f"{waited:.1f}s waiting, login {report['login']}"
+        )
+        lines.extend(
+            f"    {label}: {seconds:.2f}s" for label, seconds in report["waits"]
+        )
+        if report.get("profile", "default") != "default" and name in baseline:
+            lines.append(f"    {format_savings(report, baseline[name])}")
+
+    # How many of the providers that logged in could skip the login flow
+    logins = [report["login"] for report in reports.values()]
+    lines.append(
+        f"Logins skipped: {logins.count('restored')} of "
+        + f"{len(logins) - logins.count('none')}"
+    )
+    return "\n".join(lines)
+
+
+def format_stages(scraped_at, reports, sync_timings, synced_at, total) -> str:
+    """Format the timing of each stage of a streamed run: when each provider's
+    scrape finished and how long it took, then when its sheet sync finished and
+    how long that took, all in seconds from the start of the run"""
+    lines = []
+    for name, offset in sorted(scraped_at.items(), key=lambda item: item[1]):
+        line = f"{name}: scraped at {offset:.1f}s"
+        if name in reports:
+            line += f" ({reports[name]['seconds']:.1f}s)"
+        if name in synced_at:
+            line += f", synced at {synced_at[name]:.1f}s ({sync_timings[name]:.2f}s)"
+        else:
+            line += ", not synced"
+        lines.append(line)
+
+    # The sheet work left once the last scrape finished is what streaming could not
+    # overlap
+    scraping = max(scraped_at.values(), default=0.0)
+    lines.append(
+        f"Scraping finished at {scraping:.1f}s, sheets at {total:.1f}s, "
+        + f"{max(total - scraping, 0.0):.1f}s after the last scrape"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+import datetime
+import json
+import logging
+import os
+import random
+import time
+
+# Hours between scrapes of each provider in daemon mode. The Hargreaves fund prices
+# are refreshed through the day and overwritten in place, while every Nutmeg,
+# Shareworks and Standard Life sync adds a valuation row, so those are kept to one
+# a day, or one a week for the monthly pension payments
+DEFAULT_INTERVAL_HOURS = {
+    "nutmeg": 24,
+    "shareworks": 24,
+    "standardLife": 168,
+    "hargreaves": 4,
+}
+
+# Seconds between the daemon's checks for due providers, plus up to the jitter so
+# the portals do not see a request at the same second every day
+TICK_SECONDS = 300
+DEFAULT_JITTER_SECONDS = 600
+
+# Minimum hours before a provider whose scrape failed is tried again
+RETRY_HOURS = 1
+
+# Held by the run that is scraping and syncing, so runs started by cron or by hand
+# cannot overlap the daemon and insert the same rows twice
+RUN_LOCK_PATH = "./update_finance.lock"
+
+# Hours after which a lock left behind by a crashed run is taken over
+STALE_LOCK_HOURS = 2
+
+# When each provider was last synced, by the daemon or any other run
+SYNC_LOG_PATH = "./last_synced.json"
+
+
+class RunLocked(Exception):
+    """Raised when another run holds the run lock"""
+
+
+class RunLock:
+    """A lock file held for the length of a run"""
+
+    def __init__(self, path=RUN_LOCK_PATH):
+        """Use the lock file at the given path"""
+        self.path = path
+
+    def __enter__(self):
+        # Creating the file fails if it exists, so only one run can hold it
+        try:
+            descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self.__is_stale():
+                raise RunLocked(f"Another run holds {self.path}") from None
+            logging.warning("Taking over the stale run lock %s", self.path)
+            os.remove(self.path)
+            descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+
+        with os.fdopen(descriptor, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write(f"{os.getpid()} {datetime.datetime.now().isoformat()}\n")
+        return self
+
+    def __exit__(self, *exc_info):
+        os.remove(self.path)
+
+    def __is_stale(self) -> bool:
+        """Check whether the lock file is older than a run could take"""
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return True
+        return age > STALE_LOCK_HOURS * 3600
+
+
+class SyncLog:
+    """The time each provider was last synced to the sheets, kept in a JSON file so
+    a restarted daemon knows what runs started by cron or by hand have synced"""
+
+    def __init__(self, path=SYNC_LOG_PATH):
+        """Use the sync times saved at the given path"""
+        self.path = path
+
+    def __read(self) -> dict:
+        """Return the saved sync times as {provider: ISO datetime}"""
+        try:
+            with open(self.path, mode="r", encoding="UTF-8") as filereader:
+                return json.loads(filereader.read())
+        except FileNotFoundError:
+            return {}
+
+    def get(self, provider):
+        """Return when a provider was last synced, or None if it never has been"""
+        value = self.__read().get(provider)
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    def record(self, providers, synced_at=None):
+        """Record that the providers were synced at the given time, or now"""
+        synced_at = synced_at or datetime.datetime.now()
+        log = self.__read()
+        for provider in providers:
+            log[provider] = synced_at.isoformat()
+
+        # Write to a temporary file first so an interrupted run cannot leave a
+        # truncated file behind
+        temporary = self.path + ".tmp"
+        with open(temporary, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write(json.dumps(log, indent=2, sort_keys=True))
+        os.replace(temporary, self.path)
+
+
+class Scheduler:
+    """Decides which providers are due a scrape, from when each was last synced and
+    a scrape interval per provider"""
+
+    def __init__(self, interval_hours=None, lock_path=RUN_LOCK_PATH, sync_log=None):
+        """Check the providers against the intervals, given in hours per provider
+        on top of DEFAULT_INTERVAL_HOURS, and the times in the SyncLog, holding the
+        run lock at lock_path"""
+        self.intervals = {
+            provider: datetime.timedelta(hours=hours)
+            for provider, hours in {
+                **DEFAULT_INTERVAL_HOURS,
+                **(interval_hours or {}),
+            }.items()
+        }
+        self.lock_path = lock_path
+        self.sync_log = sync_log or SyncLog()
+
+        # When this daemon last started a run of each provider, so a failed provider
+        # is retried before its interval is up, but not on every tick
+        self.attempts = {}
+
+    def due(self, providers, now=None) -> list:
+        """Return the providers not synced within their interval, and not tried
+        within the retry delay"""
+        now = now or datetime.datetime.now()
+        retry = datetime.timedelta(hours=RETRY_HOURS)
+        return [
+            provider
+            for provider in providers
+            if now - (self.sync_log.get(provider) or datetime.datetime.min)
+            >= self.intervals[provider]
+            and now - self.attempts.get(provider, datetime.datetime.min)
+            >= min(retry, self.intervals[provider])
+        ]
+
+    def tick(self, providers, run, now=None):
+        """Call run with the due providers, holding the run lock. run records the
+        providers it synced in the SyncLog"""
+        due = self.due(providers, now)
+        if not due:
+            return
+
+        try:
+            with RunLock(self.lock_path):
+                for provider in due:
+                    self.attempts[provider] = now or datetime.datetime.now()
+                run(due)
+        except RunLocked as exception:
+            logging.warning("Skipping this tick: %s", exception)
+        except Exception:
+            logging.exception("Scheduled run of %s failed", ", ".join(due))
+
+    def run_forever(self, providers, run, jitter_seconds=DEFAULT_JITTER_SECONDS):
+        """Run the due providers on every tick, see tick"""
+        while True:
+            self.tick(providers, run)
+            time.sleep(TICK_SECONDS + random.uniform(0, jitter_seconds))
@@ -0,0 +1,143 @@
+import datetime
+import json
+import logging
+import os
+import threading
+
+from cryptography.fernet import Fernet, InvalidToken
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+# Seconds a restored session has to reach its ready element before it counts as
+# expired and the full login runs instead
+PROBE_TIMEOUT = 15
+
+# The login outcome of each provider since the last drain, "restored" when the
+# saved session was still valid and "login" when the full login flow ran
+_LOGINS = {}
+_LOGINS_LOCK = threading.Lock()
+
+# The fields of a CDP cookie that Network.setCookies accepts back
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite")
+
+
+class SessionStore:
+    """Saved browser sessions, one Fernet-encrypted file per provider"""
+
+    def __init__(self, key, directory="./sessions"):
+        """Use the given Fernet key to encrypt the sessions saved in the directory"""
+        self.key = key
+        self.directory = directory
+
+    def __path(self, provider) -> str:
+        """Return the path of a provider's session file"""
+        return os.path.join(self.directory, provider + ".enc")
+
+    def load(self, provider):
+        """Return a provider's saved session, or None if there is no usable one"""
+        try:
+            with open(self.__path(provider), mode="rb") as filereader:
+                token = filereader.read()
+            return json.loads(Fernet(self.key).decrypt(token))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError) as exception:
+            logging.warning("Discarding unreadable %s session: %s", provider, exception)
+            self.discard(provider)
+            return None
+
+    def save(self, provider, cookies, url):
+        """Encrypt and save a provider's cookies and the page the login landed on"""
+        session = {
+            "cookies": cookies,
+            "url": url,
+            "savedAt": datetime.datetime.now().isoformat(),
+        }
+        token = Fernet(self.key).encrypt(json.dumps(session).encode("UTF-8"))
+
+        # Sessions are credentials, so only the owner may read them
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor = os.open(
+            self.__path(provider), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(descriptor, mode="wb") as filewriter:
+            filewriter.write(token)
+
+    def discard(self, provider):
+        """Delete a provider's saved session"""
+        try:
+            os.remove(self.__path(provider))
+        except FileNotFoundError:
+            pass
+
+
+def log_in(driver, store, provider, ready_locator, login, *, probe_url=None):
+    """Restore the provider's saved session if it is still valid, otherwise run the
+    full login and save the new session.
+
+    :param driver: The WebDriver instance used for browser automation.
+    :param store: The SessionStore, or None to always run the full login.
+    :param provider: The provider name the session is saved under.
+    :param ready_locator: An element only shown to a logged in user on the probe page.
+    :param login: Runs the provider's full login flow.
+    :param probe_url: The page probed to check the session, by default the page the
+        last full login landed on.
+    :return: True if the login was skipped.
+    """
+    session = store.load(provider) if store is not None else None
+
+    if session is not None:
+        if _probe(driver, session, ready_locator, probe_url):
+            _record(provider, "restored")
+            return True
+        store.discard(provider)
+
+    login()
+    _record(provider, "login")
+
+    if store is not None:
+        store.save(provider, _saved_cookies(driver), driver.current_url)
+    return False
+
+
+def _probe(driver, session, ready_locator, probe_url) -> bool:
+    """Load the saved cookies and return True if the probe page shows the ready
+    element rather than redirecting to a login page"""
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": session["cookies"]})
+    driver.get(probe_url or session["url"])
+
+    try:
+        WebDriverWait(driver, PROBE_TIMEOUT).until(
+            lambda d: d.find_elements(*ready_locator)
+            or "login" in d.current_url.lower()
+        )
+    except TimeoutException:
+        return False
+    return "login" not in driver.current_url.lower()
+
+
+def _saved_cookies(driver) -> list:
+    """Return the driver's cookies in the form Network.setCookies accepts"""
+    cookies = []
+    for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]:
+        saved = {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+
+        # Session cookies have no expiry, but are kept until the session is probed
+        if not cookie.get("session") and cookie.get("expires", -1) > 0:
+            saved["expires"] = cookie["expires"]
+        cookies.append(saved)
+    return cookies
+
+
+def _record(provider, outcome):
+    """Record how a provider's login went"""
+    with _LOGINS_LOCK:
+        _LOGINS[provider] = outcome
+
+
+def drain_logins() -> dict:
+    """Return the login outcomes recorded since the last drain and clear them"""
+    with _LOGINS_LOCK:
+        logins = dict(_LOGINS)
+        _LOGINS.clear()
+    return logins
@@ -0,0 +1,101 @@
+import datetime
+import json
+import os
+
+# Bumped whenever the shape of the scraped data changes, so replays never feed the
+# middleware data it no longer understands. Version 1 snapshots could hold the
+# placeholder data of failed scrapes
+SNAPSHOT_VERSION = 2
+
+# Hours a snapshot stays fresh enough to replay
+DEFAULT_TTL_HOURS = 24
+
+# Snapshot file names are their creation time, so they sort oldest first
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+class SnapshotStore:
+    """Versioned snapshots of the scraped data, one JSON file per provider and run"""
+
+    def __init__(self, directory="./snapshots", ttl_hours=DEFAULT_TTL_HOURS):
+        """Keep the snapshots in the directory, fresh for the given number of hours"""
+        self.directory = directory
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+
+    def save(self, provider, data, created_at=None) -> str:
+        """Save a provider's scraped data and return the snapshot's path. Snapshots
+        of the provider that have expired are removed"""
+        created_at = created_at or datetime.datetime.now()
+        folder = os.path.join(self.directory, provider)
+        os.makedirs(folder, exist_ok=True)
+
+        path = os.path.join(folder, created_at.strftime(TIMESTAMP_FORMAT) + ".json")
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "provider": provider,
+            "createdAt": created_at.isoformat(),
+            "data": data,
+        }
+        with open(path, mode="w", encoding="UTF-8") as filewriter:
+            filewriter.write(json.dumps(snapshot, default=_encode, indent=2))
+
+        self.prune(provider)
+        return path
+
+    def latest(self, provider, now=None):
+        """Return the data and creation time of a provider's newest fresh snapshot
+        of the current version, or None if there is none"""
+        now = now or datetime.datetime.now()
+        for path in reversed(self.__paths(provider)):
+            snapshot = self.__read(path)
+            if snapshot is None or snapshot["version"] != SNAPSHOT_VERSION:
+                continue
+            created_at = datetime.datetime.fromisoformat(snapshot["createdAt"])
+            if now - created_at > self.ttl:
+                return None
+            return snapshot["data"], created_at
+        return None
+
+    def prune(self, provider, now=None):
+        """Remove a provider's snapshots that are older than the TTL"""
+        now = now or datetime.datetime.now()
+        for path in self.__paths(provider):
+            created_at = datetime.datetime.strptime(
+                os.path.basename(path)[: -len(".json")], TIMESTAMP_FORMAT
+            )
+            if now - created_at > self.ttl:
+                os.remove(path)
+
+    def __paths(self, provider) -> list:
+        """Return the paths of a provider's snapshots, oldest first"""
+        folder = os.path.join(self.directory, provider)
+        if not os.path.isdir(folder):
+            return []
+        return [
+            os.path.join(folder, name)
+            for name in sorted(os.listdir(folder))
+            if name.endswith(".json")
+        ]
+
+    @staticmethod
+    def __read(path):
+        """Return a snapshot file's contents, or None if it cannot be read"""
+        try:
+            with open(path, mode="r", encoding="UTF-8") as filereader:
+                return json.loads(filereader.read(), object_hook=_decode)
+        except (OSError, ValueError):
+            return None
+
+
+def _encode(value):
+    """Encode the values JSON has no type for, such as Nutmeg's transaction dates"""
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot snapshot a {type(value).__name__}")
+
+
+def _decode(value: dict):
+    """Decode the values encoded by _encode"""
+    if "__datetime__" in value:
+        return datetime.datetime.fromisoformat(value["__datetime__"])
+    return value
@@ -0,0 +1,112 @@
+import threading
+import time
+
+from selenium.webdriver.support.wait import WebDriverWait
+
+# Seconds between polls of a readiness condition
+POLL_SECONDS = 0.1
+
+# Seconds a page must stay unchanged before it counts as settled
+QUIET_SECONDS = 0.5
+
+# The waits recorded since the last drain, as (label, seconds) pairs
+_WAITS = []
+_WAITS_LOCK = threading.Lock()
+
+# Installs a MutationObserver on the current document (or frame) the first time
+# it runs and returns the milliseconds since the DOM last changed
+_MILLISECONDS_SINCE_MUTATION = """
+if (window.__lastMutation === undefined) {
+    window.__lastMutation = Date.now();
+    new MutationObserver(() => { window.__lastMutation = Date.now(); }).observe(
+        document, {childList: true, subtree: true, attributes: true,
+                   characterData: true}
+    );
+}
+return Date.now() - window.__lastMutation;
+"""
+
+# Returns the number of resources the page has finished loading, or -1 while the
+# document itself is still loading
+_FINISHED_RESOURCES = """
+if (document.readyState !== "complete") {
+    return -1;
+}
+return performance.getEntriesByType("resource").length;
+"""
+
+
+def wait_for(driver, label, condition, timeout=20):
+    """Wait until the condition holds on the driver and record how long it took.
+    Returns the condition's result"""
+    start = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(
+            condition
+        )
+    finally:
+        with _WAITS_LOCK:
+            _WAITS.append((label, time.perf_counter() - start))
+
+
+def drain_waits() -> list:
+    """Return the waits recorded since the last drain and clear them"""
+    with _WAITS_LOCK:
+        waits = list(_WAITS)
+        _WAITS.clear()
+    return waits
+
+
+def document_ready(driver) -> bool:
+    """Condition: the current document has finished loading"""
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+class DomSettled:
+    """Condition: the current document has not changed for a quiet period"""
+
+    def __init__(self, quiet=QUIET_SECONDS):
+        self.quiet = quiet
+
+    def __call__(self, driver) -> bool:
+        return driver.execute_script(_MILLISECONDS_SINCE_MUTATION) >= self.quiet * 1000
+
+
+class NetworkIdle:
+    """Condition: the document has loaded and no further resources have finished
+    loading for a quiet period"""
+
+    def __init__(self, quiet=QUIET_SECONDS):
+        self.quiet = quiet
+        self.count = None
+        self.since = None
+
+    def __call__(self, driver) -> bool:
+        count = driver.execute_script(_FINISHED_RESOURCES)
+        now = time.monotonic()
+        if count < 0 or count != self.count:
+            self.count = count
+            self.since = now
+            return False
+        return now - self.since >= self.quiet
+
+
+class RowCountStable:
+    """Condition: the number of elements matching the locator has reached the
+    minimum and not changed for a quiet period"""
+
+    def __init__(self, locator, minimum=1, quiet=QUIET_SECONDS):
+        self.locator = locator
+        self.minimum = minimum
+        self.quiet = quiet
+        self.count = None
+        self.since = None
+
+    def __call__(self, driver) -> bool:
+        rows = driver.find_elements(*self.locator)
+        now = time.monotonic()
+        if len(rows) != self.count:
+            self.count = len(rows)
+            self.since = now
+            return False
+        return len(rows) >= self.minimum and now - self.since >= self.quiet
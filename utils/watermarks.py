@@ -0,0 +1,58 @@
+import datetime
+import json
+import os
+import threading
+
+# The account a provider's watermark is kept under when it has only one
+DEFAULT_ACCOUNT = "default"
+
+
+class WatermarkStore:
+    """The date of the latest transaction synced to the sheets, kept per provider
+    and account in a JSON file"""
+
+    def __init__(self, path="./watermarks.json"):
+        """Use the watermarks saved at the given path"""
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        """Leave the lock out when the store is pickled for a parallel worker"""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """Give an unpickled store its own lock"""
+        self.__init__(state["path"])
+
+    def __read(self) -> dict:
+        """Return the saved watermarks as {provider: {account: ISO date}}"""
+        try:
+            with open(self.path, mode="r", encoding="UTF-8") as filereader:
+                return json.loads(filereader.read())
+        except FileNotFoundError:
+            return {}
+
+    def get(self, provider, account=DEFAULT_ACCOUNT):
+        """Return the watermark of a provider's account as a datetime, or None if it
+        has never been synced"""
+        with self.lock:
+            value = self.__read().get(provider, {}).get(str(account))
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    def advance(self, provider, date, account=DEFAULT_ACCOUNT):
+        """Move a provider's watermark forward to the given date. A date before the
+        current watermark is ignored"""
+        with self.lock:
+            watermarks = self.__read()
+            accounts = watermarks.setdefault(provider, {})
+            current = accounts.get(str(account))
+            if current and datetime.datetime.fromisoformat(current) >= date:
+                return
+            accounts[str(account)] = date.date().isoformat()
+
+            # Write to a temporary file first so an interrupted run cannot leave a
+            # truncated file behind
+            temporary = self.path + ".tmp"
+            with open(temporary, mode="w", encoding="UTF-8") as filewriter:
+                filewriter.write(json.dumps(watermarks, indent=2, sort_keys=True))
+            os.replace(temporary, self.path)